@@ -1,6 +1,8 @@
 $(document).ready(function() {
   var steps = [];
   var index = -1;
+  // Board currently drawn, updated in place when the canvas size did not change
+  var displayed = null;
   const logElement = document.getElementById("log");
   var play = false;
 
@@ -51,6 +53,13 @@ $(document).ready(function() {
           socket.emit("identify", JSON.stringify({
               "identifier": "__GUI__" + Date.now()
           }));
+          // Multi-game host: follow the match given in the page address (index.html?match=<id>)
+          match = new URLSearchParams(window.location.search).get("match");
+          if (match !== null) {
+              socket.emit("watch", JSON.stringify({
+                  "match": match
+              }));
+          }
           $("#status")[0].innerHTML = 'Connected';
           $("#status")[0].style = 'color:green';
           $("#connect").unbind();
@@ -58,16 +67,28 @@ $(document).ready(function() {
 
       socket.on("play", (...args) => {
           json = JSON.parse(args[0]);
-          if (!json.rep) json = JSON.parse(json);
-          if (json.rep && json.rep.env) {
+          if (typeof json === "string") json = JSON.parse(json);
+          convertedGrid = null;
+          if (json.delta) {
+              // Delta update: only the changed cells, applied to the last board received
+              last = steps[steps.length - 1];
+              if (last && last.step == json.base_step) {
+                  convertedGrid = applyDelta(last, json);
+              } else {
+                  console.log("Delta from step " + json.base_step + " ignored, waiting for the next snapshot");
+              }
+          } else if (json.rep && json.rep.env) {
               current_step = json.step + "/" + json.max_step
               convertedGrid = convertToGridData({
                   "board": json.rep.env,
                   "scores": json.scores,
                   "next_player": json.next_player,
                   "players": json.players,
-                  "current_step": current_step
+                  "current_step": current_step,
+                  "step": json.step
               });
+          }
+          if (convertedGrid) {
               console.log(json);
               steps.push(convertedGrid);
               index = steps.length - 1;
@@ -327,6 +348,49 @@ $(document).ready(function() {
 
       $("#steps").html(current_step);
 
+      if (displayed && displayed.width == canvas.width && displayed.height == canvas.height) {
+          updateGrid(gridData, next_player);
+      } else {
+          redrawGrid(gridData, next_player);
+      }
+      displayed = {
+          "gridData": gridData,
+          "next_player": next_player,
+          "width": canvas.width,
+          "height": canvas.height
+      };
+
+      const blackCircles = scores['B'] || 0;
+      score_balls("black", blackCircles);
+      const whiteCircles = scores['W'] || 0;
+      score_balls("white", whiteCircles);
+  }
+
+  function isPlayable(value, next_player) {
+      // 1 = black, 2 = white: the marbles of an interactive player to move can be selected
+      if (value !== 1 && value !== 2) return false;
+      return Boolean(next_player && next_player.player_type == "interactive" && next_player.piece_type == (value === 1 ? "B" : "W"));
+  }
+
+  function updateGrid(gridData, next_player) {
+      // Only the hexagons whose marble or playability changed since the last drawing are updated
+      for (let row = 0; row < gridData.length; row++) {
+          for (let col = 0; col < gridData[row].length; col++) {
+              const value = gridData[row][col];
+              const previous = displayed.gridData[row][col];
+              const playable = isPlayable(value, next_player);
+              if (value === 0 || (value === previous && playable === isPlayable(previous, displayed.next_player))) continue;
+
+              hexagon = document.getElementById("hexa_" + row + "_" + col);
+              hexagon.classList.toggle("playable", playable);
+              ball = document.getElementById("ball_" + row + "_" + col);
+              if (ball) ball.remove();
+              if (value !== 3) addBall(col, row, value === 1 ? "black" : "white");
+          }
+      }
+  }
+
+  function redrawGrid(gridData, next_player) {
 
       canvas.innerHTML = ""
 
@@ -372,13 +436,7 @@ $(document).ready(function() {
               // Draw hexagon border for values different from 0
 
               if (value !== 0) {
-                  if (value === 1) {
-                      drawHexagon(x, y, col, row, next_player && next_player.player_type == "interactive" && next_player.piece_type == "B");
-                  } else if (value === 2) {
-                      drawHexagon(x, y, col, row, next_player && next_player.player_type == "interactive" && next_player.piece_type == "W");
-                  } else {
-                      drawHexagon(x, y, col, row);
-                  }
+                  drawHexagon(x, y, col, row, isPlayable(value, next_player));
 
                   // Draw circle inside the hexagon
                   if (value !== 3) {
@@ -388,15 +446,6 @@ $(document).ready(function() {
               }
           }
       }
-
-
-      const blackCircles = scores['B'] || 0;
-      score_balls("black", blackCircles);
-      const whiteCircles = scores['W'] || 0;
-      score_balls("white", whiteCircles);
-
-
-
   }
 
   $("#next").click(function() {
@@ -413,81 +462,115 @@ $(document).ready(function() {
       }
   });
 
+  // Board coordinates ("i_j") to grid coordinates ([row, col])
+  const boardToGrid = {
+      '0_4': [0, 6],
+      '1_3': [0, 5],
+      '2_2': [0, 4],
+      '3_1': [0, 3],
+      '4_0': [0, 2],
+      '1_5': [1, 6],
+      '2_4': [1, 5],
+      '3_3': [1, 4],
+      '4_2': [1, 3],
+      '5_1': [1, 2],
+      '6_0': [1, 1],
+      '2_6': [2, 7],
+      '3_5': [2, 6],
+      '4_4': [2, 5],
+      '5_3': [2, 4],
+      '6_2': [2, 3],
+      '7_1': [2, 2],
+      '8_0': [2, 1],
+      '3_7': [3, 7],
+      '4_6': [3, 6],
+      '5_5': [3, 5],
+      '6_4': [3, 4],
+      '7_3': [3, 3],
+      '8_2': [3, 2],
+      '9_1': [3, 1],
+      '10_0': [3, 0],
+      '4_8': [4, 8],
+      '5_7': [4, 7],
+      '6_6': [4, 6],
+      '7_5': [4, 5],
+      '8_4': [4, 4],
+      '9_3': [4, 3],
+      '10_2': [4, 2],
+      '11_1': [4, 1],
+      '12_0': [4, 0],
+      '6_8': [5, 7],
+      '7_7': [5, 6],
+      '8_6': [5, 5],
+      '9_5': [5, 4],
+      '10_4': [5, 3],
+      '11_3': [5, 2],
+      '12_2': [5, 1],
+      '13_1': [5, 0],
+      '8_8': [6, 7],
+      '9_7': [6, 6],
+      '10_6': [6, 5],
+      '11_5': [6, 4],
+      '12_4': [6, 3],
+      '13_3': [6, 2],
+      '14_2': [6, 1],
+      '10_8': [7, 6],
+      '11_7': [7, 5],
+      '12_6': [7, 4],
+      '13_5': [7, 3],
+      '14_4': [7, 2],
+      '15_3': [7, 1],
+      '12_8': [8, 6],
+      '13_7': [8, 5],
+      '14_6': [8, 4],
+      '15_5': [8, 3],
+      '16_4': [8, 2]
+  };
+
+  function gridCoordinates(key) {
+      // Serialized board key "(i, j)" to grid coordinates
+      return boardToGrid[key.substring(1, key.length - 1).replace(/, /g, "_")];
+  }
+
+  function realScores(players, scores) {
+      score_w = 0;
+      score_b = 0;
+      for (i = 0; i < players.length; i++) {
+          if (players[i].piece_type == "W") score_w = -scores[players[i].id];
+          if (players[i].piece_type == "B") score_b = -scores[players[i].id];
+      }
+      return {
+          "W": score_w,
+          "B": score_b
+      };
+  }
+
+  function applyDelta(previous, delta) {
+      // Board of a delta update: the previous board, with the changed cells replaced
+      let gridData = previous.gridData.map(row => row.slice());
+      for (let key in delta.changes) {
+          let piece = delta.changes[key];
+          let new_coord = gridCoordinates(key);
+          gridData[new_coord[0]][new_coord[1]] = piece === null ? 3 : (piece["piece_type"] == "W" ? 2 : 1);
+      }
+      return {
+          "gridData": gridData,
+          "scores": realScores(previous.players, delta.scores),
+          "next_player": delta.next_player,
+          "players": previous.players,
+          "current_step": delta.step + "/" + delta.max_step,
+          "step": delta.step
+      };
+  }
+
   function convertToGridData(board) {
       scores = board["scores"]
       next_player = board["next_player"]
       players = board["players"]
       current_step = board["current_step"]
+      step = board["step"]
       board = board["board"]
 
-      conversion = {
-          '0_4': [0, 6],
-          '1_3': [0, 5],
-          '2_2': [0, 4],
-          '3_1': [0, 3],
-          '4_0': [0, 2],
-          '1_5': [1, 6],
-          '2_4': [1, 5],
-          '3_3': [1, 4],
-          '4_2': [1, 3],
-          '5_1': [1, 2],
-          '6_0': [1, 1],
-          '2_6': [2, 7],
-          '3_5': [2, 6],
-          '4_4': [2, 5],
-          '5_3': [2, 4],
-          '6_2': [2, 3],
-          '7_1': [2, 2],
-          '8_0': [2, 1],
-          '3_7': [3, 7],
-          '4_6': [3, 6],
-          '5_5': [3, 5],
-          '6_4': [3, 4],
-          '7_3': [3, 3],
-          '8_2': [3, 2],
-          '9_1': [3, 1],
-          '10_0': [3, 0],
-          '4_8': [4, 8],
-          '5_7': [4, 7],
-          '6_6': [4, 6],
-          '7_5': [4, 5],
-          '8_4': [4, 4],
-          '9_3': [4, 3],
-          '10_2': [4, 2],
-          '11_1': [4, 1],
-          '12_0': [4, 0],
-          '6_8': [5, 7],
-          '7_7': [5, 6],
-          '8_6': [5, 5],
-          '9_5': [5, 4],
-          '10_4': [5, 3],
-          '11_3': [5, 2],
-          '12_2': [5, 1],
-          '13_1': [5, 0],
-          '8_8': [6, 7],
-          '9_7': [6, 6],
-          '10_6': [6, 5],
-          '11_5': [6, 4],
-          '12_4': [6, 3],
-          '13_3': [6, 2],
-          '14_2': [6, 1],
-          '10_8': [7, 6],
-          '11_7': [7, 5],
-          '12_6': [7, 4],
-          '13_5': [7, 3],
-          '14_4': [7, 2],
-          '15_3': [7, 1],
-          '12_8': [8, 6],
-          '13_7': [8, 5],
-          '14_6': [8, 4],
-          '15_5': [8, 3],
-          '16_4': [8, 2]
-      }
-
-
-      score_w = 0;
-      score_b = 0;
-
       for (i = 0; i < players.length; i++) {
 
           if (typeof players[i] === 'string' || players[i] instanceof String) {
@@ -497,14 +580,8 @@ $(document).ready(function() {
               pt = Object.entries(board).filter(e => e[1]["owner_id"] == players[i].id)[0][1].piece_type
               players[i]["piece_type"] = pt
           }
-
-          if (players[i].piece_type == "W") score_w = -scores[players[i].id];
-          if (players[i].piece_type == "B") score_b = -scores[players[i].id];
-      }
-      real_scores = {
-          "W": score_w,
-          "B": score_b
       }
+      real_scores = realScores(players, scores)
 
       const gridData = [
           [0, 0, 3, 3, 3, 3, 3, 0, 0],
@@ -518,9 +595,8 @@ $(document).ready(function() {
           [0, 0, 3, 3, 3, 3, 3, 0, 0],
       ];
       for (let key in board) {
-          new_key = key.substring(1, key.length - 1).replace(/, /g, "_");
           obj = board[key];
-          let new_coord = conversion[new_key];
+          let new_coord = gridCoordinates(key);
           gridData[new_coord[0]][new_coord[1]] = obj["piece_type"]
       }
 
@@ -538,7 +614,8 @@ $(document).ready(function() {
           "scores": real_scores,
           "next_player": next_player,
           "players": players,
-          "current_step": current_step
+          "current_step": current_step,
+          "step": step
       };
   }
 
@@ -564,6 +641,7 @@ $(document).ready(function() {
 
       canvas.width = window.innerWidth;
       canvas.height = window.innerHeight;
+      displayed = null;
       drawGrid(steps[index] || defaultGridData);
   }
 
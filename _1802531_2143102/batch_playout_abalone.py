@@ -0,0 +1,323 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Batch simulator advancing many independent Abalone games in lockstep with NumPy.
+
+The K games are stored as arrays (K x 61 cells, lost marbles, colour to move, step).
+Moves are encoded as in PlayoutBoardAbalone (rear cell * 6 + direction). The legality
+of a move only depends on the contents of the 6 cells of its line (the rear marble and
+the next 5 cells), read as a base-4 pattern: the rules of
+GameStateAbalone.detect_conflict are evaluated once per pattern into CODE_TABLE, and
+checking moves is then a gather and a table lookup for all the games at once.
+
+Random playouts draw a few candidate moves per game and keep the first legal one,
+which is uniform over the legal moves; only the games where no candidate was legal
+check their 366 moves.
+
+Usage:
+    python -m _1802531_2143102.batch_playout_abalone --validate 20
+    python -m _1802531_2143102.batch_playout_abalone -k 4096 --plies 20
+"""
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from .board_tables_abalone import N_CELLS, N_DIRECTIONS, RAYS
+from .playout_board_abalone import CENTER_DISTANCE, MAX_MARBLES_MOVED, N_MOVES, PlayoutBoardAbalone
+from .symmetry_abalone import BLACK, EMPTY, WHITE
+
+# Content of the extra column standing for "off the board"
+OFF = 3
+OFF_CELL = N_CELLS
+# Cells read to check a move: the rear marble, then up to 5 cells ahead (3 own + 2 opponent marbles, then the next cell)
+LINE_LENGTH = 2 * MAX_MARBLES_MOVED
+
+# LINES[cell, direction, k]: k-th cell of the line starting at `cell` (OFF_CELL past the edge)
+LINES = np.full((N_CELLS, N_DIRECTIONS, LINE_LENGTH), OFF_CELL, dtype=np.int16)
+for _cell in range(N_CELLS):
+    for _direction in range(N_DIRECTIONS):
+        _line = ((_cell,) + RAYS[_cell][_direction])[:LINE_LENGTH]
+        LINES[_cell, _direction, :len(_line)] = _line
+LINES = LINES.reshape(N_MOVES, LINE_LENGTH)
+
+CENTER_DISTANCES = np.array(CENTER_DISTANCE)
+
+
+def _line_code(me: int, line: tuple) -> int:
+    # Same walk as PlayoutBoardAbalone.push_code, over the contents of a line
+    if line[0] != me:
+        return 0
+    own = 1
+    opponent = 0
+    for content in line[1:]:
+        if content == EMPTY or content == OFF:
+            return own | opponent << 2
+        if content == me:
+            if opponent:
+                return 0
+            own += 1
+            if own > MAX_MARBLES_MOVED:
+                return 0
+        else:
+            opponent += 1
+            if opponent >= own:
+                return 0
+    return 0
+
+# CODE_TABLE[colour to move, line pattern]: 0 if the move is illegal, else own marbles | opponent marbles << 2
+CODE_TABLE = np.zeros((3, 4 ** LINE_LENGTH), dtype=np.uint8)
+for _pattern in range(4 ** LINE_LENGTH):
+    _line = tuple(_pattern // 4 ** k % 4 for k in range(LINE_LENGTH))
+    for _me in (WHITE, BLACK):
+        CODE_TABLE[_me, _pattern] = _line_code(_me, _line)
+
+
+class BatchBoardAbalone():
+    """
+    K games in progress, advanced together.
+
+    Attributes:
+        cells    (np.ndarray) : (K x 62) EMPTY, WHITE or BLACK, last column OFF
+        lost     (np.ndarray) : (K x 3) marbles lost, indexed by colour (column 0 unused)
+        to_move  (np.ndarray) : (K) colour to move
+        step     (np.ndarray) : (K) moves played since the start of each game
+        max_step (int)        : step at which the games end
+        max_lost (int)        : number of lost marbles at which a game ends
+    """
+
+    def __init__(self, cells: np.ndarray, lost: np.ndarray, to_move: np.ndarray, step: np.ndarray,
+                 max_step: int = 50, max_lost: int = 6) -> None:
+        self.cells = cells
+        self.lost = lost
+        self.to_move = to_move
+        self.step = step
+        self.max_step = max_step
+        self.max_lost = max_lost
+
+    @classmethod
+    def from_boards(cls, boards: List[PlayoutBoardAbalone]) -> "BatchBoardAbalone":
+        """
+        Stack compact boards into a batch.
+        """
+        cells = np.full((len(boards), N_CELLS + 1), OFF, dtype=np.int8)
+        cells[:, :N_CELLS] = np.array([list(board.cells) for board in boards], dtype=np.int8)
+        return cls(cells,
+                   np.array([board.lost for board in boards], dtype=np.int16),
+                   np.array([board.to_move for board in boards], dtype=np.int8),
+                   np.array([board.step for board in boards], dtype=np.int16),
+                   boards[0].max_step, boards[0].max_lost)
+
+    @classmethod
+    def repeat(cls, board: PlayoutBoardAbalone, n_games: int) -> "BatchBoardAbalone":
+        """
+        Batch of `n_games` copies of a board.
+        """
+        return cls.from_boards([board]).take(np.zeros(n_games, dtype=np.intp))
+
+    def take(self, games: np.ndarray) -> "BatchBoardAbalone":
+        """
+        Batch of the selected games (copied).
+        """
+        return BatchBoardAbalone(self.cells[games], self.lost[games], self.to_move[games], self.step[games],
+                                 self.max_step, self.max_lost)
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def done(self) -> np.ndarray:
+        return (self.step >= self.max_step) | (self.lost[:, WHITE] >= self.max_lost) | \
+               (self.lost[:, BLACK] >= self.max_lost)
+
+    def legal_codes(self) -> np.ndarray:
+        """
+        Check every move of every game.
+
+        Returns:
+            np.ndarray: (K x 366) 0 for illegal moves, else own marbles | opponent marbles << 2
+        """
+        return self.move_codes(np.arange(len(self))[:, None], np.arange(N_MOVES)[None, :])
+
+    def move_codes(self, games: np.ndarray, moves: np.ndarray) -> np.ndarray:
+        """
+        Check moves of selected games (`games` and `moves` are broadcast together).
+
+        Returns:
+            np.ndarray: codes of the moves (see legal_codes)
+        """
+        patterns = np.zeros(np.broadcast_shapes(games.shape, moves.shape), dtype=np.int16)
+        for k in range(LINE_LENGTH):
+            patterns += self.cells[games, LINES[moves, k]] * np.int16(4 ** k)
+        return CODE_TABLE[self.to_move[games], patterns]
+
+    def random_moves(self, rng: np.random.Generator, n_candidates: int = 16) -> np.ndarray:
+        """
+        Draw a legal move per game uniformly, by rejection sampling of candidate moves.
+
+        Returns:
+            np.ndarray: (K) moves, -1 for games that are over or have no legal move
+        """
+        games = np.arange(len(self))
+        candidates = rng.integers(0, N_MOVES, size=(len(self), n_candidates))
+        codes = self.move_codes(games[:, None], candidates)
+        legal = codes > 0
+        moves = candidates[games, legal.argmax(axis=1)]
+
+        missing = np.nonzero(~legal.any(axis=1))[0]
+        if len(missing):
+            missing_games = self.take(missing)
+            moves[missing] = missing_games.select_moves(missing_games.legal_codes(), rng)
+        moves[self.done()] = -1
+        return moves
+
+    def select_moves(self, codes: np.ndarray, rng: np.random.Generator, greedy: bool = False) -> np.ndarray:
+        """
+        Draw a legal move per game, uniformly, or among the moves pushing an opponent marble
+        off the board when there are some and `greedy` is set.
+
+        Returns:
+            np.ndarray: (K) moves, -1 for games that are over or have no legal move
+        """
+        keys = rng.random(codes.shape)
+        if greedy:
+            own = codes & 3
+            opponent = codes >> 2
+            target = LINES[np.arange(N_MOVES)[None, :], own + opponent]
+            keys += ((opponent > 0) & (target == OFF_CELL)) * 2.0
+        keys[codes == 0] = -1.0
+        moves = keys.argmax(axis=1)
+        moves[(keys.max(axis=1) < 0) | self.done()] = -1
+        return moves
+
+    def make(self, moves: np.ndarray) -> None:
+        """
+        Play one legal move per game in place (games with move -1 are left unchanged).
+        """
+        games = np.nonzero(moves >= 0)[0]
+        moves = moves[games]
+        lines = LINES[moves].astype(np.intp)
+        codes = self.move_codes(games, moves)
+        own = (codes & 3).astype(np.intp)
+        opponent = (codes >> 2).astype(np.intp)
+        me = self.to_move[games]
+        front = np.where(opponent > 0, 3 - me, me).astype(np.int8)
+
+        self.cells[games, lines[:, 0]] = EMPTY
+        pushing = opponent > 0
+        self.cells[games[pushing], lines[pushing, own[pushing]]] = me[pushing]
+        target = lines[np.arange(len(games)), own + opponent]
+        self.cells[games, target] = front
+        fallen = target == OFF_CELL
+        np.add.at(self.lost, (games[fallen], front[fallen]), 1)
+        self.cells[:, OFF_CELL] = OFF
+
+        self.to_move[games] = 3 - me
+        self.step[games] += 1
+
+    def results(self) -> np.ndarray:
+        """
+        Outcome of each game for White if it stopped now (see PlayoutBoardAbalone.result).
+        """
+        cells = self.cells[:, :N_CELLS]
+        distance = ((cells == WHITE) * CENTER_DISTANCES).sum(axis=1) - ((cells == BLACK) * CENTER_DISTANCES).sum(axis=1)
+        lost_difference = self.lost[:, BLACK] - self.lost[:, WHITE]
+        by_distance = np.where(distance < 0, 1.0, np.where(distance > 0, 0.0, 0.5))
+        return np.where(lost_difference > 0, 1.0, np.where(lost_difference < 0, 0.0, by_distance))
+
+    def playout(self, rng: np.random.Generator, max_plies: int, greedy: bool = False) -> np.ndarray:
+        """
+        Play random moves in every game until they are over or `max_plies` moves were played.
+
+        Returns:
+            np.ndarray: (K) outcome of each game for White
+        """
+        for _ in range(max_plies):
+            if greedy:
+                moves = self.select_moves(self.legal_codes(), rng, greedy)
+            else:
+                moves = self.random_moves(rng)
+            if (moves < 0).all():
+                break
+            self.make(moves)
+        return self.results()
+
+
+def validate(n_games: int, seed: int = 0) -> int:
+    """
+    Compare the successors computed by the batch simulator with GameStateAbalone.generator
+    over the positions of random games.
+
+    Returns:
+        int: number of positions checked
+
+    Raises:
+        AssertionError: at the first position where they differ
+    """
+    import random
+    from board_abalone import BoardAbalone, INITIAL_BOARDS
+    from game_state_abalone import GameStateAbalone
+    from player_abalone import PlayerAbalone
+    from seahorse.game.game_layout.board import Piece
+    from .symmetry_abalone import PIECE_CONTENTS, typed_cells_from_env
+
+    rng = random.Random(seed)
+    n_positions = 0
+    for game in range(n_games):
+        players = [PlayerAbalone("W", "validate_W"), PlayerAbalone("B", "validate_B")]
+        initial_board = INITIAL_BOARDS["classic" if game % 2 == 0 else "alien"]
+        pieces = {WHITE: Piece(piece_type="W", owner=players[0]), BLACK: Piece(piece_type="B", owner=players[1])}
+        env = {}
+        for i, line in enumerate(initial_board):
+            for j, content in enumerate(line):
+                if content in pieces:
+                    env[(i, j)] = pieces[content]
+        state = GameStateAbalone({player.get_id(): 0 for player in players}, players[0], players,
+                                 BoardAbalone(env=env, dim=[17, 9]), step=0)
+
+        while not state.is_done():
+            actions = list(state.generate_possible_actions())
+            expected = set()
+            for action in actions:
+                next_state = action.get_next_game_state()
+                lost = [0, 0, 0]
+                for player in next_state.players:
+                    lost[PIECE_CONTENTS[player.get_piece_type()]] = -next_state.scores[player.get_id()]
+                expected.add((typed_cells_from_env(next_state.get_rep().get_env()), tuple(lost)))
+
+            batch = BatchBoardAbalone.from_boards([PlayoutBoardAbalone.from_state(state)])
+            moves = np.nonzero(batch.legal_codes()[0])[0]
+            successors = batch.take(np.zeros(len(moves), dtype=np.intp))
+            successors.make(moves)
+            found = {(bytes(successors.cells[k, :N_CELLS].astype(np.uint8)), tuple(int(x) for x in successors.lost[k]))
+                     for k in range(len(moves))}
+            assert found == expected, f"Successors differ at step {state.get_step()} of game {game}"
+            n_positions += 1
+
+            state = rng.choice(actions).get_next_game_state()
+    return n_positions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="batch_playout_abalone.py",
+                                     description="Validate or benchmark the batch Abalone simulator.")
+    parser.add_argument("--validate", type=int, default=0, help="Number of random games to validate against the generator")
+    parser.add_argument("-k", "--games", type=int, default=1024, help="Number of games simulated together")
+    parser.add_argument("--plies", type=int, default=20, help="Moves played per playout")
+    parser.add_argument("--greedy", action="store_true", help="Prefer moves pushing an opponent marble off")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    if args.validate:
+        print("Positions validated: ", validate(args.validate, args.seed))
+
+    from board_abalone import INITIAL_BOARDS
+    from .symmetry_abalone import typed_cells_from_grid
+    board = PlayoutBoardAbalone(bytearray(typed_cells_from_grid(INITIAL_BOARDS["classic"])), WHITE, [0, 0, 0], 0)
+    batch = BatchBoardAbalone.repeat(board, args.games)
+    begin = time.time()
+    results = batch.playout(np.random.default_rng(args.seed), args.plies, args.greedy)
+    elapsed = time.time() - begin
+    print("Playouts: ", args.games, " time: ", elapsed, " playouts/s: ", args.games / elapsed,
+          " White score: ", results.mean())
@@ -0,0 +1,166 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Precomputed tables over the 61 playable cells of the Abalone board.
+
+Cells are numbered 0..60 in row-major order of the 17x9 board coordinates used by
+BoardAbalone, so that per-cell information (neighbours, distances, lines) can be
+looked up in flat tuples instead of being recomputed from coordinates.
+"""
+from board_abalone import BoardAbalone
+
+# Same order as in GameStateAbalone.generator
+DIRECTIONS = [(-1, -1), (1, -1), (-1, 1), (1, 1), (2, 0), (-2, 0)]
+N_DIRECTIONS = len(DIRECTIONS)
+OPPOSITE_DIRECTION = (3, 2, 1, 0, 5, 4)
+# One direction per axis of the hexagonal grid
+AXIS_DIRECTIONS = (3, 2, 4)
+
+BOARD_DIMENSIONS = (17, 9)
+CENTER = (8, 4)
+
+# Cell contents, from the point of view of the evaluated player
+EMPTY = 0
+OWN = 1
+OPPONENT = 2
+
+CELLS = tuple((i, j) for i in range(BOARD_DIMENSIONS[0]) for j in range(BOARD_DIMENSIONS[1])
+              if not BoardAbalone.FORBIDDEN_MASK[i][j])
+N_CELLS = len(CELLS)
+CELL_INDEX = {cell: index for index, cell in enumerate(CELLS)}
+
+# NEIGHBOURS[cell][direction]: index of the neighbouring cell, -1 if off the board
+NEIGHBOURS = tuple(tuple(CELL_INDEX.get((i + n_i, j + n_j), -1) for n_i, n_j in DIRECTIONS) for i, j in CELLS)
+
+# RAYS[cell][direction]: cells met when walking from `cell` (excluded) in `direction` until the edge
+def _ray(cell: int, direction: int) -> tuple:
+    ray = []
+    cell = NEIGHBOURS[cell][direction]
+    while cell != -1:
+        ray.append(cell)
+        cell = NEIGHBOURS[cell][direction]
+    return tuple(ray)
+
+RAYS = tuple(tuple(_ray(cell, direction) for direction in range(N_DIRECTIONS)) for cell in range(len(CELLS)))
+
+# Number of steps to the center (0 at the center, 4 on the rim)
+RING = tuple(max(abs(CENTER[1] - j), (abs(CENTER[0] - i) + abs(CENTER[1] - j)) // 2) for i, j in CELLS)
+
+# Number of steps before falling off the board (0 on the rim)
+RIM_DISTANCE = tuple(4 - ring for ring in RING)
+
+
+def lines_of_length(length: int) -> tuple:
+    """
+    Every straight segment of `length` consecutive cells, along the three axes.
+
+    Returns:
+        tuple[tuple[int]]: segments, as tuples of cell indices
+    """
+    segments = []
+    for cell in range(N_CELLS):
+        for direction in AXIS_DIRECTIONS:
+            segment = [cell]
+            while len(segment) < length and segment[-1] != -1:
+                segment.append(NEIGHBOURS[segment[-1]][direction])
+            if segment[-1] != -1:
+                segments.append(tuple(segment))
+    return tuple(segments)
+
+
+def segments_by_cell(segments: tuple) -> tuple:
+    """
+    Index segments by the cells they contain.
+
+    Returns:
+        tuple[tuple[int]]: for each cell, the indices of the segments containing it
+    """
+    by_cell = [[] for _ in range(N_CELLS)]
+    for index, segment in enumerate(segments):
+        for cell in segment:
+            by_cell[cell].append(index)
+    return tuple(tuple(indices) for indices in by_cell)
+
+
+# Neighbours of each cell that come before it in the cell numbering
+LOWER_NEIGHBOURS = tuple(tuple(neighbour for neighbour in NEIGHBOURS[cell] if neighbour != -1 and neighbour < cell)
+                         for cell in range(N_CELLS))
+
+
+def component_roots(cells: list, content: int) -> list:
+    """
+    Union-find over the precomputed adjacency: label the connected groups of cells holding `content`.
+
+    Args:
+        cells (list[int]): EMPTY, OWN or OPPONENT for each cell
+        content (int): content of the cells to group
+
+    Returns:
+        list[int]: for each cell, the root cell of its group (-1 for cells not holding `content`)
+    """
+    parent = [-1] * N_CELLS
+    for cell in range(N_CELLS):
+        if cells[cell] != content:
+            continue
+        parent[cell] = cell
+        for neighbour in LOWER_NEIGHBOURS[cell]:
+            if parent[neighbour] == -1:
+                continue
+            root = neighbour
+            while parent[root] != root:
+                parent[root] = parent[parent[root]]
+                root = parent[root]
+            own_root = cell
+            while parent[own_root] != own_root:
+                own_root = parent[own_root]
+            if root != own_root:
+                parent[root] = own_root
+    for cell in range(N_CELLS):
+        if parent[cell] != -1:
+            root = cell
+            while parent[root] != root:
+                root = parent[root]
+            parent[cell] = root
+    return parent
+
+
+def component_sizes(cells: list, content: int) -> dict:
+    """
+    Size of each connected group of cells holding `content`.
+
+    Returns:
+        dict[int, int]: root cell -> number of cells in its group
+    """
+    sizes = {}
+    for root in component_roots(cells, content):
+        if root != -1:
+            sizes[root] = sizes.get(root, 0) + 1
+    return sizes
+
+
+def cells_from_env(env: dict, player_id: int) -> list:
+    """
+    Convert a board environment to a list of cell contents, from a player's point of view.
+
+    Args:
+        env (dict[Tuple[int], Piece]): the board environment
+        player_id (int): ID of the player whose marbles are OWN
+
+    Returns:
+        list[int]: EMPTY, OWN or OPPONENT for each cell
+    """
+    cells = [EMPTY] * N_CELLS
+    for position, piece in env.items():
+        cells[CELL_INDEX[position]] = OWN if piece.get_owner_id() == player_id else OPPONENT
+    return cells
+
+
+def cell_changes(parent_cells: list, child_cells: list) -> list:
+    """
+    List the cells whose content differs between two boards.
+
+    Returns:
+        list[Tuple[int, int, int]]: (cell, old content, new content)
+    """
+    return [(cell, old, new) for cell, (old, new) in enumerate(zip(parent_cells, child_cells)) if old != new]
@@ -0,0 +1,165 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Delta-based state updates, broadcast by the game master to its listeners.
+
+By default the master sends the full GameStateAbalone.to_json payload (board, players,
+scores) after every move. With the delta protocol an update carries only the move, the
+cells it changed and the new scores. A full snapshot is sent first, then every
+`snapshot_every` steps, and whenever the previous update is not the previous step, so
+that a listener that missed updates resynchronizes on the next snapshot.
+
+Payloads (serialized like the full states, pieces with their to_json):
+    snapshot: the full state payload, with "snapshot": true
+    delta:    {"delta": true, "step", "max_step", "base_step" (step of the update it applies to),
+               "move": {"from": [i, j], "to": [i, j]} or null if it could not be identified,
+               "changes": {"(i, j)": piece, or null if the cell was emptied},
+               "scores", "next_player"}
+The GUI (GUI/main.js) applies deltas to its local board, and DeltaDecoderAbalone expands
+them back to full payloads, e.g. for recorded games (see game_analysis_abalone).
+"""
+from typing import Dict, Optional
+
+from seahorse.game.game_state import GameState
+
+from .move_encoding_abalone import light_action
+from .move_index_abalone import IllegalMoveError, LegalMoveIndexAbalone
+from .playout_board_abalone import PlayoutBoardAbalone
+
+# Steps between two full snapshots
+DEFAULT_SNAPSHOT_EVERY = 20
+
+
+class DeltaOutOfSyncError(ValueError):
+    """
+    Raised when a delta does not apply to the last payload decoded.
+    """
+    pass
+
+
+def board_changes(previous: GameState, state: GameState) -> Dict[str, object]:
+    """
+    Cells whose content differs between two states, keyed like the serialized board.
+
+    Returns:
+        dict[str, Piece]: "(i, j)" -> piece now on the cell, None if it was emptied
+    """
+    previous_env = previous.get_rep().get_env()
+    env = state.get_rep().get_env()
+    changes = {}
+    for position, piece in env.items():
+        previous_piece = previous_env.get(position)
+        if previous_piece is None or previous_piece.get_type() != piece.get_type():
+            changes[str(position)] = piece
+    for position in previous_env:
+        if position not in env:
+            changes[str(position)] = None
+    return changes
+
+
+def played_move(previous: GameState, state: GameState) -> Optional[dict]:
+    """
+    Light action ({'from', 'to'}) leading from a state to the next one, None if no legal move does.
+    """
+    if hasattr(previous, "legal_move_index"):
+        move_index = previous.legal_move_index()
+    else:
+        move_index = LegalMoveIndexAbalone.from_state(previous)
+    try:
+        return light_action(move_index.find_move(PlayoutBoardAbalone.from_state(state)))
+    except IllegalMoveError:
+        return None
+
+
+def snapshot_payload(state: GameState) -> dict:
+    payload = state.to_json()
+    payload["snapshot"] = True
+    return payload
+
+
+def delta_payload(previous: GameState, state: GameState) -> dict:
+    return {"delta": True,
+            "step": state.get_step(),
+            "max_step": state.max_step,
+            "base_step": previous.get_step(),
+            "move": played_move(previous, state),
+            "changes": board_changes(previous, state),
+            "scores": state.get_scores(),
+            "next_player": state.next_player}
+
+
+class DeltaEncoderAbalone():
+    """
+    Encodes the successive states of a game as snapshots and deltas.
+
+    Attributes:
+        snapshot_every     (int)       : steps between two full snapshots
+        previous           (GameState) : last state encoded, None before the first one
+        last_snapshot_step (int)       : step of the last snapshot
+    """
+
+    def __init__(self, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY) -> None:
+        self.snapshot_every = max(1, snapshot_every)
+        self.previous = None
+        self.last_snapshot_step = None
+
+    def encode(self, state: GameState) -> dict:
+        """
+        Payload of the update to `state`: a delta from the last state encoded, or a snapshot.
+        """
+        previous = self.previous
+        self.previous = state
+        if previous is None or state.get_step() != previous.get_step() + 1 or \
+           state.get_step() - self.last_snapshot_step >= self.snapshot_every:
+            self.last_snapshot_step = state.get_step()
+            return snapshot_payload(state)
+        return delta_payload(previous, state)
+
+    def reset(self) -> None:
+        """
+        Send a snapshot next, e.g. when a listener connects.
+        """
+        self.previous = None
+
+
+class DeltaDecoderAbalone():
+    """
+    Expands a stream of snapshots and deltas (as decoded from JSON) back to full state payloads.
+
+    Attributes:
+        state (dict) : last full payload, None before the first snapshot
+    """
+
+    def __init__(self) -> None:
+        self.state = None
+
+    def apply(self, payload: dict) -> dict:
+        """
+        Returns:
+            dict: the full payload of the update (the payload itself if it is not a delta)
+
+        Raises:
+            DeltaOutOfSyncError: if the delta does not apply to the last payload
+        """
+        if not payload.get("delta"):
+            self.state = payload
+            return payload
+        if self.state is None or self.state["step"] != payload["base_step"]:
+            last_step = None if self.state is None else self.state["step"]
+            raise DeltaOutOfSyncError(f"delta from step {payload['base_step']} received after step {last_step}")
+
+        env = dict(self.state["rep"]["env"])
+        for position, piece in payload["changes"].items():
+            if piece is None:
+                env.pop(position, None)
+            else:
+                env[position] = piece
+        state = dict(self.state)
+        state.pop("snapshot", None)
+        state["rep"] = {**self.state["rep"], "env": env}
+        for key in ("step", "max_step", "scores", "next_player", "remaining_time"):
+            if key in payload:
+                state[key] = payload[key]
+        self.state = state
+        return state
@@ -0,0 +1,567 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Feature-based evaluation of Abalone positions.
+
+Features are registered in FEATURE_REGISTRY with a default weight. Each feature
+works on a list of cell contents (see board_tables_abalone.cells_from_env) and
+supports both a full computation (accumulate) and an incremental update from the
+list of cells changed by a move (update). Piece-square features have their table
+multiplied by their weight once, when the evaluator is built. During a search,
+IncrementalEvaluationAbalone updates the accumulators of each node from those of its parent.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from seahorse.game.game_state import GameState
+from seahorse.utils.custom_exceptions import MethodNotImplementedError
+
+from .board_tables_abalone import EMPTY, OWN, OPPONENT, N_CELLS, N_DIRECTIONS, NEIGHBOURS, OPPOSITE_DIRECTION, \
+                                  RAYS, RING, RIM_DISTANCE, cell_changes, cells_from_env, \
+                                  component_sizes, lines_of_length, segments_by_cell
+
+FEATURE_REGISTRY = OrderedDict()
+
+
+def register_feature(feature_class):
+    """
+    Class decorator adding a feature to the registry, under its name.
+    """
+    FEATURE_REGISTRY[feature_class.name] = feature_class
+    return feature_class
+
+
+def default_weights() -> Dict[str, float]:
+    """
+    Returns:
+        dict[str, float]: default weight of every registered feature, in registry order
+    """
+    return {name: feature_class.default_weight for name, feature_class in FEATURE_REGISTRY.items()}
+
+
+def feature_digest(names) -> str:
+    """
+    Digest of the definitions (name and version) of some registered features, which
+    identifies the feature values cached or the weights tuned for them.
+    """
+    key = ",".join("{}:{}".format(name, FEATURE_REGISTRY[name].version) for name in names)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+class FeatureAbalone():
+    """
+    Base class of an evaluation feature. Values are always given as
+    (evaluated player) - (opponent).
+
+    Attributes:
+        name           (str)   : name of the feature in the registry and weights file
+        default_weight (float) : weight used when the weights file does not mention the feature
+        version        (int)   : bumped whenever the definition of the feature changes
+        symmetric      (bool)  : whether the value is invariant under the symmetries of the board,
+                                 as required to share cached values between symmetric positions
+        antisymmetric  (bool)  : whether the value changes sign when evaluated for the opponent,
+                                 as required to reuse cached values computed for the other player
+    """
+    name = None
+    default_weight = 0.0
+    version = 1
+    symmetric = True
+    antisymmetric = True
+
+    def accumulate(self, cells: List[int], scores: Tuple[float, float]):
+        """
+        Full computation of the feature accumulator for a board.
+
+        Args:
+            cells (list[int]): EMPTY, OWN or OPPONENT for each cell
+            scores (Tuple[float, float]): scores of the evaluated player and of the opponent
+        """
+        raise MethodNotImplementedError()
+
+    def update(self, accumulator, changes: List[Tuple[int, int, int]], cells: List[int], scores: Tuple[float, float]):
+        """
+        Incremental update of an accumulator after a move. Recomputes by default.
+
+        Args:
+            accumulator: accumulator of the parent board
+            changes (list[Tuple[int, int, int]]): (cell, old content, new content) of the changed cells
+            cells (list[int]): cell contents after the move
+            scores (Tuple[float, float]): scores after the move
+        """
+        return self.accumulate(cells, scores)
+
+    def value(self, accumulator) -> float:
+        """
+        Feature value of an accumulator.
+        """
+        return accumulator
+
+
+@register_feature
+class ScoresFeature(FeatureAbalone):
+    """
+    Score difference (favors opponent marbles out).
+    """
+    name = "scores"
+    default_weight = 1.0
+
+    def accumulate(self, cells, scores):
+        return scores[0] - scores[1]
+
+    def update(self, accumulator, changes, cells, scores):
+        return scores[0] - scores[1]
+
+
+class PieceSquareFeature(FeatureAbalone):
+    """
+    Sum (or average, if `average`) of a per-cell table over the marbles of each player.
+
+    The accumulator is [own sum, opponent sum, own count, opponent count].
+    """
+    table = ()
+    average = False
+
+    def accumulate(self, cells, scores):
+        table = self.table
+        accumulator = [0.0, 0.0, 0, 0]
+        for cell in range(N_CELLS):
+            content = cells[cell]
+            if content != EMPTY:
+                accumulator[content - 1] += table[cell]
+                accumulator[content + 1] += 1
+        return accumulator
+
+    def update(self, accumulator, changes, cells, scores):
+        table = self.table
+        accumulator = accumulator.copy()
+        for cell, old, new in changes:
+            if old != EMPTY:
+                accumulator[old - 1] -= table[cell]
+                accumulator[old + 1] -= 1
+            if new != EMPTY:
+                accumulator[new - 1] += table[cell]
+                accumulator[new + 1] += 1
+        return accumulator
+
+    def value(self, accumulator):
+        own_sum, opponent_sum, own_count, opponent_count = accumulator
+        if not self.average:
+            return own_sum - opponent_sum
+        own = own_sum / own_count if own_count else 0
+        opponent = opponent_sum / opponent_count if opponent_count else 0
+        return own - opponent
+
+
+class SegmentFeature(FeatureAbalone):
+    """
+    Number of segments of cells entirely occupied by each player.
+
+    The accumulator is [own count, opponent count]. Updates only revisit the
+    segments containing a changed cell.
+    """
+    segments = ()
+    by_cell = ()
+
+    def accumulate(self, cells, scores):
+        accumulator = [0, 0]
+        for segment in self.segments:
+            content = cells[segment[0]]
+            if content != EMPTY and all(cells[cell] == content for cell in segment):
+                accumulator[content - 1] += 1
+        return accumulator
+
+    def update(self, accumulator, changes, cells, scores):
+        old_contents = {cell: old for cell, old, _ in changes}
+        touched = set()
+        for cell in old_contents:
+            touched.update(self.by_cell[cell])
+
+        accumulator = accumulator.copy()
+        for index in touched:
+            segment = self.segments[index]
+            old = [old_contents.get(cell, cells[cell]) for cell in segment]
+            if old[0] != EMPTY and all(content == old[0] for content in old):
+                accumulator[old[0] - 1] -= 1
+            content = cells[segment[0]]
+            if content != EMPTY and all(cells[cell] == content for cell in segment):
+                accumulator[content - 1] += 1
+        return accumulator
+
+    def value(self, accumulator):
+        return accumulator[0] - accumulator[1]
+
+
+@register_feature
+class CenterControlFeature(PieceSquareFeature):
+    """
+    Negated average number of steps from the marbles to the center (hexagonal distance,
+    the same for all the symmetric images of a cell).
+    """
+    name = "center_control"
+    default_weight = 0.9
+    version = 2
+    table = tuple(-distance for distance in RING)
+    average = True
+
+
+@register_feature
+class ClusteringFeature(SegmentFeature):
+    """
+    Cohesion of the marbles of each player: number of pairs of adjacent marbles
+    plus the size of the largest connected group.
+
+    The accumulator is [own pairs, opponent pairs, own largest group, opponent largest group].
+    Pairs are updated incrementally, groups are recomputed with a union-find.
+    """
+    name = "clustering"
+    default_weight = 0.1
+    version = 2
+    segments = lines_of_length(2)
+    by_cell = segments_by_cell(segments)
+
+    def accumulate(self, cells, scores):
+        return SegmentFeature.accumulate(self, cells, scores) + self.largest_groups(cells)
+
+    def update(self, accumulator, changes, cells, scores):
+        return SegmentFeature.update(self, accumulator[:2], changes, cells, scores) + self.largest_groups(cells)
+
+    def value(self, accumulator):
+        return accumulator[0] + accumulator[2] - accumulator[1] - accumulator[3]
+
+    @staticmethod
+    def largest_groups(cells: List[int]) -> List[int]:
+        return [max(component_sizes(cells, OWN).values(), default=0),
+                max(component_sizes(cells, OPPONENT).values(), default=0)]
+
+
+@register_feature
+class EdgeDangerFeature(PieceSquareFeature):
+    """
+    Number of marbles sitting on the rim of the board.
+    """
+    name = "edge_danger"
+    table = tuple(1 if distance == 0 else 0 for distance in RIM_DISTANCE)
+
+
+@register_feature
+class FormationFeature(SegmentFeature):
+    """
+    Number of lines of three marbles, the strongest pushing formation.
+    """
+    name = "formation"
+    segments = lines_of_length(3)
+    by_cell = segments_by_cell(segments)
+
+
+def ejection_rays() -> tuple:
+    """
+    For every rim cell and every direction leading off the board from it, the cells
+    read to know whether a marble there can be pushed off: the rim cell itself, then
+    up to 5 cells inward (at most 2 more pushed marbles and 3 pushing marbles).
+
+    Returns:
+        tuple[tuple[int]]: rays, as tuples of cell indices starting with the rim cell
+    """
+    rays = []
+    for cell in range(N_CELLS):
+        if RIM_DISTANCE[cell] != 0:
+            continue
+        for direction in range(N_DIRECTIONS):
+            if NEIGHBOURS[cell][direction] == -1:
+                rays.append((cell,) + RAYS[cell][OPPOSITE_DIRECTION[direction]][:5])
+    return tuple(rays)
+
+EJECTION_RAYS = ejection_rays()
+RIM_CELLS = tuple(cell for cell in range(N_CELLS) if RIM_DISTANCE[cell] == 0)
+EJECTION_RAYS_BY_VICTIM = tuple(tuple(index for index, ray in enumerate(EJECTION_RAYS) if ray[0] == cell)
+                                for cell in range(N_CELLS))
+
+
+@register_feature
+class PushDangerFeature(FeatureAbalone):
+    """
+    Number of marbles that the other player could push off the board on the next ply,
+    read from the precomputed ejection rays instead of generating moves.
+
+    A rim marble can be pushed off along a ray if it heads a line of m < 3 marbles of
+    its colour followed by more than m (and at most 3 would do) marbles of the other colour,
+    which is the sumito rule encoded in GameStateAbalone.detect_conflict.
+
+    The accumulator is [status of each ray, [own count, opponent count]], where the status
+    of a ray is the content of its rim cell if that marble is threatened along it, EMPTY otherwise.
+    """
+    name = "push_danger"
+    default_weight = -0.5
+    rays = EJECTION_RAYS
+    by_cell = segments_by_cell(EJECTION_RAYS)
+    rays_by_victim = EJECTION_RAYS_BY_VICTIM
+
+    @staticmethod
+    def ray_status(cells: List[int], ray: tuple) -> int:
+        victim = cells[ray[0]]
+        if victim == EMPTY:
+            return EMPTY
+        length = len(ray)
+        n_pushed = 1
+        while n_pushed < length and cells[ray[n_pushed]] == victim:
+            n_pushed += 1
+        if n_pushed >= 3:
+            return EMPTY
+        pusher = OWN + OPPONENT - victim
+        n_pushing = 0
+        index = n_pushed
+        while index < length and n_pushing <= n_pushed and cells[ray[index]] == pusher:
+            n_pushing += 1
+            index += 1
+        return victim if n_pushing > n_pushed else EMPTY
+
+    def victim_status(self, statuses: List[int], cell: int) -> int:
+        for index in self.rays_by_victim[cell]:
+            if statuses[index] != EMPTY:
+                return statuses[index]
+        return EMPTY
+
+    def accumulate(self, cells, scores):
+        statuses = [self.ray_status(cells, ray) for ray in self.rays]
+        counts = [0, 0]
+        for cell in RIM_CELLS:
+            status = self.victim_status(statuses, cell)
+            if status != EMPTY:
+                counts[status - 1] += 1
+        return [statuses, counts]
+
+    def update(self, accumulator, changes, cells, scores):
+        touched = set()
+        for cell, _, _ in changes:
+            touched.update(self.by_cell[cell])
+        if not touched:
+            return accumulator
+
+        statuses, counts = accumulator[0].copy(), accumulator[1].copy()
+        victims = {self.rays[index][0] for index in touched}
+        previous = {cell: self.victim_status(statuses, cell) for cell in victims}
+        for index in touched:
+            statuses[index] = self.ray_status(cells, self.rays[index])
+        for cell in victims:
+            if previous[cell] != EMPTY:
+                counts[previous[cell] - 1] -= 1
+            status = self.victim_status(statuses, cell)
+            if status != EMPTY:
+                counts[status - 1] += 1
+        return [statuses, counts]
+
+    def value(self, accumulator):
+        return accumulator[1][0] - accumulator[1][1]
+
+
+class EvaluatorAbalone():
+    """
+    Weighted sum of registered features.
+
+    Attributes:
+        weights      (dict[str, float]) : weight of each feature, features weighted 0 are skipped
+        features     (list[FeatureAbalone]) : active features
+        square_table (list[float])      : sum of the weighted tables of the active non-averaged
+                                          piece-square features, evaluated in a single pass
+        timing       (bool)             : if True, time each feature (piece-square tables are then
+                                          evaluated separately)
+        feature_times (dict[str, list]) : [number of computations, total time (s)] per feature
+    """
+
+    def __init__(self, weights: Dict[str, float] = None, timing: bool = False) -> None:
+        self.weights = default_weights()
+        if weights is not None:
+            self.weights.update(weights)
+        self.timing = timing
+        self.feature_times = {}
+
+        self.features = [FEATURE_REGISTRY[name]() for name, weight in self.weights.items()
+                         if weight != 0 and name in FEATURE_REGISTRY]
+
+        # Precompile the weighted piece-square tables into a single table
+        self.square_table = [0.0] * N_CELLS
+        self.other_features = []
+        for feature in self.features:
+            if isinstance(feature, PieceSquareFeature) and not feature.average and not timing:
+                weight = self.weights[feature.name]
+                for cell in range(N_CELLS):
+                    self.square_table[cell] += weight * feature.table[cell]
+            else:
+                self.other_features.append(feature)
+        if not any(self.square_table):
+            self.square_table = None
+
+    def evaluate(self, cells: List[int], scores: Tuple[float, float]) -> float:
+        """
+        Full evaluation of a board.
+
+        Args:
+            cells (list[int]): EMPTY, OWN or OPPONENT for each cell
+            scores (Tuple[float, float]): scores of the evaluated player and of the opponent
+
+        Returns:
+            float: weighted sum of the active features
+        """
+        value = 0.0
+        square_table = self.square_table
+        if square_table is not None:
+            for cell in range(N_CELLS):
+                content = cells[cell]
+                if content == OWN:
+                    value += square_table[cell]
+                elif content == OPPONENT:
+                    value -= square_table[cell]
+
+        weights = self.weights
+        if not self.timing:
+            for feature in self.other_features:
+                value += weights[feature.name] * feature.value(feature.accumulate(cells, scores))
+            return value
+
+        for feature in self.other_features:
+            begin = time.perf_counter()
+            value += weights[feature.name] * feature.value(feature.accumulate(cells, scores))
+            self.record_time(feature.name, time.perf_counter() - begin)
+        return value
+
+    def evaluate_state(self, state: GameState, player_id: int) -> float:
+        """
+        Full evaluation of a game state from a player's point of view.
+        """
+        cells = cells_from_env(state.get_rep().get_env(), player_id)
+        return self.evaluate(cells, self.state_scores(state, player_id))
+
+    def feature_values(self, state: GameState, player_id: int) -> List[float]:
+        """
+        Unweighted values of every registered feature, in registry order.
+        """
+        cells = cells_from_env(state.get_rep().get_env(), player_id)
+        scores = self.state_scores(state, player_id)
+        values = []
+        for feature_class in FEATURE_REGISTRY.values():
+            feature = feature_class()
+            values.append(feature.value(feature.accumulate(cells, scores)))
+        return values
+
+    def accumulate(self, cells: List[int], scores: Tuple[float, float]) -> list:
+        """
+        Full computation of the accumulators of the active features.
+        """
+        return [feature.accumulate(cells, scores) for feature in self.features]
+
+    def update(self, accumulators: list, changes: List[Tuple[int, int, int]], cells: List[int],
+               scores: Tuple[float, float]) -> list:
+        """
+        Incremental update of the accumulators of the active features after a move.
+        """
+        if not self.timing:
+            return [feature.update(accumulator, changes, cells, scores)
+                    for feature, accumulator in zip(self.features, accumulators)]
+
+        updated = []
+        for feature, accumulator in zip(self.features, accumulators):
+            begin = time.perf_counter()
+            updated.append(feature.update(accumulator, changes, cells, scores))
+            self.record_time(feature.name, time.perf_counter() - begin)
+        return updated
+
+    @property
+    def symmetric(self) -> bool:
+        """
+        Whether evaluations are invariant under the symmetries of the board (all active features are).
+        """
+        return all(feature.symmetric for feature in self.features)
+
+    @property
+    def antisymmetric(self) -> bool:
+        """
+        Whether evaluations for the two players are opposite (all active features are).
+        """
+        return all(feature.antisymmetric for feature in self.features)
+
+    def evaluate_accumulators(self, accumulators: list) -> float:
+        """
+        Weighted sum of the features of a set of accumulators.
+        """
+        weights = self.weights
+        return sum(weights[feature.name] * feature.value(accumulator)
+                   for feature, accumulator in zip(self.features, accumulators))
+
+    @staticmethod
+    def state_scores(state: GameState, player_id: int) -> Tuple[float, float]:
+        """
+        Scores of a player and of its opponent in a game state.
+        """
+        own_score = state.scores[player_id]
+        opponent_score = next(score for pid, score in state.scores.items() if pid != player_id)
+        return own_score, opponent_score
+
+    def record_time(self, name: str, seconds: float) -> None:
+        entry = self.feature_times.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def timing_report(self) -> Dict[str, dict]:
+        """
+        Returns:
+            dict[str, dict]: number of computations, total and mean time per feature
+        """
+        return {name: {"calls": calls, "total_s": total, "mean_us": 1e6 * total / calls if calls else 0.0}
+                for name, (calls, total) in self.feature_times.items()}
+
+
+class IncrementalEvaluationAbalone():
+    """
+    Evaluation of the nodes of a search from the accumulators of their parent.
+
+    A node is a list [parent node, state, cells, accumulators]; its cells and accumulators
+    are computed on first use only, by updating those of its parent with the cells changed
+    by the move (the root is accumulated in full). A node whose value is found in the
+    transposition table thus costs nothing, and an interior node is updated at most once.
+    Evaluators without incremental updates (see NTupleEvaluatorAbalone) evaluate every node in full.
+
+    Attributes:
+        evaluator   (EvaluatorAbalone) : evaluator of the nodes
+        player_id   (int)              : ID of the player the nodes are evaluated for
+        incremental (bool)             : whether the evaluator supports incremental updates
+    """
+
+    def __init__(self, evaluator, player_id: int) -> None:
+        self.evaluator = evaluator
+        self.player_id = player_id
+        self.incremental = isinstance(evaluator, EvaluatorAbalone)
+
+    @staticmethod
+    def node(state: GameState, parent: list = None) -> list:
+        """
+        Node of a state reached from a parent node (None for the root).
+        """
+        return [parent, state, None, None]
+
+    def accumulators(self, node: list) -> list:
+        """
+        Accumulators of a node, updated from its parent's on first use.
+        """
+        if node[3] is None:
+            parent, state = node[0], node[1]
+            evaluator = self.evaluator
+            cells = cells_from_env(state.get_rep().get_env(), self.player_id)
+            scores = evaluator.state_scores(state, self.player_id)
+            if parent is None:
+                accumulators = evaluator.accumulate(cells, scores)
+            else:
+                parent_accumulators = self.accumulators(parent)
+                accumulators = evaluator.update(parent_accumulators, cell_changes(parent[2], cells), cells, scores)
+            node[0], node[2], node[3] = None, cells, accumulators
+        return node[3]
+
+    def evaluate(self, node: list) -> float:
+        """
+        Value of the state of a node.
+        """
+        if not self.incremental:
+            return self.evaluator.evaluate_state(node[1], self.player_id)
+        return self.evaluator.evaluate_accumulators(self.accumulators(node))
@@ -0,0 +1,354 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Streaming analysis of recorded Abalone games.
+
+Recorded games (as written by the seahorse StateRecorder, one JSON list of
+states per file, or one JSON state per line) are read lazily, replayed through
+GameStateAbalone.convert_light_action_to_action, and summarized one game at a
+time so that memory use does not grow with the number of files analyzed.
+
+Usage:
+    python -m _1802531_2143102.game_analysis_abalone records/*.json -w 4
+"""
+import argparse
+import heapq
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from game_state_abalone import GameStateAbalone
+from my_player import MyPlayer
+
+from .delta_protocol_abalone import DeltaDecoderAbalone
+from .replay_abalone import find_light_action, restore
+
+
+def iter_recorded_states(path: str) -> Iterator[dict]:
+    """
+    Lazily yield the successive state dictionaries stored in a record file.
+
+    Both a JSON list of states and JSON lines (one state per line) are accepted.
+    States that were serialized twice (JSON strings holding JSON) are decoded again,
+    and games recorded with delta updates are expanded back to full states.
+
+    Args:
+        path (str): path to the record file
+
+    Yields:
+        dict: the JSON representation of each recorded game state
+    """
+    with open(path, "r") as record_file:
+        first_char = record_file.read(1)
+        while first_char.isspace():
+            first_char = record_file.read(1)
+        record_file.seek(0)
+
+        if first_char == "[":
+            states = json.load(record_file)
+        else:
+            states = (json.loads(line) for line in record_file if line.strip())
+
+        decoder = DeltaDecoderAbalone()
+        for state in states:
+            while isinstance(state, str):
+                state = json.loads(state)
+            yield decoder.apply(state)
+
+
+def parse_position(key: str) -> Tuple[int, int]:
+    """
+    Convert a serialized board key such as "(3, 5)" back to a tuple.
+    """
+    i, j = key.strip("()").split(",")
+    return int(i), int(j)
+
+
+def recorded_board(state: dict) -> Dict[Tuple[int, int], str]:
+    """
+    Extract a {position: piece_type} mapping from a recorded state.
+    """
+    return {parse_position(key): piece["piece_type"] for key, piece in state["rep"]["env"].items()}
+
+
+def recorded_player_types(state: dict) -> Dict[str, str]:
+    """
+    Map each recorded player id (as a string) to its piece type.
+
+    Players serialized as bare ids are resolved through the owner of their pieces,
+    the same way the GUI does it.
+    """
+    player_types = {}
+    for player in state["players"]:
+        if isinstance(player, dict):
+            player_types[str(player["id"])] = player["piece_type"]
+        else:
+            for piece in state["rep"]["env"].values():
+                if str(piece.get("owner_id")) == str(player):
+                    player_types[str(player)] = piece["piece_type"]
+                    break
+    return player_types
+
+
+def recorded_remaining_times(state: dict) -> Dict[str, float]:
+    """
+    Map each piece type to the remaining time of its player, when the record holds it.
+    """
+    remaining_times = {}
+    for player in state["players"]:
+        if isinstance(player, dict) and isinstance(player.get("time_limit"), (int, float)):
+            remaining_times[player["piece_type"]] = player["time_limit"]
+    return remaining_times
+
+
+def recorded_mover(state: dict) -> str:
+    """
+    Piece type of the player to move in a recorded state. White always opens.
+    """
+    next_player = state.get("next_player")
+    if isinstance(next_player, dict) and "piece_type" in next_player:
+        return next_player["piece_type"]
+    return "W" if state["step"] % 2 == 0 else "B"
+
+
+def build_game_state(state: dict, players: Dict[str, MyPlayer]) -> GameStateAbalone:
+    """
+    Rebuild a GameStateAbalone from a recorded state, using the given players
+    (one per piece type) as owners of the pieces.
+    """
+    player_types = recorded_player_types(state)
+    scores = {player_types[player_id]: score for player_id, score in state["scores"].items()}
+    return restore((recorded_board(state), scores, state["step"], recorded_mover(state)), players)
+
+
+def replay_game(states: Iterator[dict], players: Dict[str, MyPlayer]) -> Iterator[Tuple[dict, GameStateAbalone, Optional[dict]]]:
+    """
+    Replay a recorded game through convert_light_action_to_action.
+
+    Yields:
+        (dict, GameStateAbalone, dict): the recorded state, the replayed state and the
+                                        light action that led to it (None for the first state)
+    """
+    states = iter(states)
+    first = next(states, None)
+    if first is None:
+        return
+    current_state = build_game_state(first, players)
+    yield first, current_state, None
+
+    for recorded in states:
+        if recorded["step"] == current_state.get_step():
+            continue
+        data, action = find_light_action(current_state, recorded_board(recorded))
+        current_state = action.get_next_game_state()
+        yield recorded, current_state, data
+
+
+def analyse_game(path: str, n_swings: int = 5) -> dict:
+    """
+    Replay one record file and summarize it.
+
+    Evaluations are those of MyPlayer.compute_state_heuristic from White's point of view.
+
+    Returns:
+        dict: summary of the game, or {"path", "error"} if the record cannot be replayed
+    """
+    players = {"W": MyPlayer("W", name="replay_W"), "B": MyPlayer("B", name="replay_B")}
+    evaluator = players["W"]
+    think_times = []
+    swings = []
+    config = "unknown"
+    previous_value = None
+    previous_times = {}
+    recorded = None
+    state = None
+
+    try:
+        for recorded, state, data in replay_game(iter_recorded_states(path), players):
+            if data is None and state.get_step() == 0:
+                evaluator.detect_board_configuration(state)
+                config = evaluator.board_config
+
+            remaining_times = recorded_remaining_times(recorded)
+            if data is not None:
+                mover = "W" if state.get_step() % 2 == 1 else "B"
+                if mover in remaining_times and mover in previous_times:
+                    think_time = previous_times[mover] - remaining_times[mover]
+                    if think_time >= 0:
+                        think_times.append(think_time)
+            previous_times.update(remaining_times)
+
+            value = evaluator.compute_state_heuristic(state)
+            if previous_value is not None:
+                swing = (abs(value - previous_value), state.get_step(), data["from"], data["to"], previous_value, value)
+                if len(swings) < n_swings:
+                    heapq.heappush(swings, swing)
+                else:
+                    heapq.heappushpop(swings, swing)
+            previous_value = value
+    except (ValueError, KeyError) as error:
+        return {"path": path, "error": str(error)}
+
+    if state is None:
+        return {"path": path, "error": "empty record"}
+
+    scores = {piece_type: state.scores[player.get_id()] for piece_type, player in players.items()}
+    if scores["W"] > scores["B"]:
+        winner = "W"
+    elif scores["B"] > scores["W"]:
+        winner = "B"
+    else:
+        winner = None
+
+    return {
+        "path": path,
+        "config": config,
+        "winner": winner,
+        "length": state.get_step(),
+        "margin": abs(scores["W"] - scores["B"]),
+        "think_times": think_times,
+        "swings": [{"path": path, "swing": s[0], "step": s[1], "from": s[2], "to": s[3],
+                    "value_before": s[4], "value_after": s[5]} for s in sorted(swings, reverse=True)],
+    }
+
+
+class RecordStatistics():
+    """
+    Streaming aggregation of game summaries produced by analyse_game.
+
+    Attributes:
+        n_games       (int)             : number of games successfully analyzed
+        errors        (list[dict])      : records that could not be replayed
+        results       (dict[dict[int]]) : win/draw counts by configuration then colour
+        total_length  (int)             : sum of game lengths, in steps
+        margins       (dict[int, int])  : score margin distribution
+        think_times   (list[float])     : running [count, sum, max] of per-step think times
+        swings        (list[tuple])     : largest evaluation swings seen so far (min-heap)
+    """
+
+    def __init__(self, n_swings: int = 20) -> None:
+        self.n_games = 0
+        self.errors = []
+        self.results = {}
+        self.total_length = 0
+        self.margins = {}
+        self.think_times = [0, 0.0, 0.0]
+        self.n_swings = n_swings
+        self.swings = []
+
+    def add(self, summary: dict) -> None:
+        """
+        Fold one game summary into the statistics.
+        """
+        if "error" in summary:
+            self.errors.append(summary)
+            return
+
+        self.n_games += 1
+        self.total_length += summary["length"]
+        self.margins[summary["margin"]] = self.margins.get(summary["margin"], 0) + 1
+
+        results = self.results.setdefault(summary["config"], {"games": 0, "W": 0, "B": 0, "draw": 0})
+        results["games"] += 1
+        results[summary["winner"] or "draw"] += 1
+
+        for think_time in summary["think_times"]:
+            self.think_times[0] += 1
+            self.think_times[1] += think_time
+            self.think_times[2] = max(self.think_times[2], think_time)
+
+        for swing in summary["swings"]:
+            entry = (swing["swing"], swing["path"], swing["step"], swing)
+            if len(self.swings) < self.n_swings:
+                heapq.heappush(self.swings, entry)
+            else:
+                heapq.heappushpop(self.swings, entry)
+
+    def report(self) -> dict:
+        """
+        Returns:
+            dict: JSON-serializable summary of all games seen so far
+        """
+        win_rates = {}
+        for config, results in self.results.items():
+            win_rates[config] = {
+                "games": results["games"],
+                "W": results["W"] / results["games"],
+                "B": results["B"] / results["games"],
+                "draw": results["draw"] / results["games"],
+            }
+
+        n_think, total_think, max_think = self.think_times
+        return {
+            "games": self.n_games,
+            "errors": len(self.errors),
+            "win_rates": win_rates,
+            "average_length": self.total_length / self.n_games if self.n_games else 0,
+            "margin_distribution": dict(sorted(self.margins.items())),
+            "think_time": {"steps": n_think,
+                           "average": total_think / n_think if n_think else None,
+                           "max": max_think if n_think else None},
+            "largest_swings": [entry[3] for entry in sorted(self.swings, reverse=True)],
+        }
+
+
+def analyse_records(paths: Iterable[str], workers: int = os.cpu_count(), n_swings: int = 20,
+                    max_pending: int = 64) -> RecordStatistics:
+    """
+    Analyze record files in parallel and aggregate the results.
+
+    At most max_pending files are in flight at any time, so that an arbitrarily
+    long list of paths is consumed lazily.
+
+    Args:
+        paths (Iterable[str]): record files
+        workers (int): number of worker processes (1 analyzes in-process)
+        n_swings (int): number of largest evaluation swings to report
+
+    Returns:
+        RecordStatistics: the aggregated statistics
+    """
+    statistics = RecordStatistics(n_swings=n_swings)
+
+    if workers <= 1:
+        for path in paths:
+            statistics.add(analyse_game(path, n_swings))
+        return statistics
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for path in paths:
+            pending.append(executor.submit(analyse_game, path, n_swings))
+            if len(pending) >= max_pending:
+                statistics.add(pending.pop(0).result())
+        for future in pending:
+            statistics.add(future.result())
+    return statistics
+
+
+def iter_record_paths(inputs: List[str]) -> Iterator[str]:
+    """
+    Expand the command line inputs: files are used as is, directories are walked for .json files.
+    """
+    for name in inputs:
+        if os.path.isdir(name):
+            for root, _, files in os.walk(name):
+                for file in sorted(files):
+                    if file.endswith(".json") or file.endswith(".jsonl"):
+                        yield os.path.join(root, file)
+        else:
+            yield name
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="game_analysis_abalone.py",
+                                     description="Aggregate statistics over recorded Abalone games.")
+    parser.add_argument("records", nargs="+", help="Record files or directories of record files")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("-s", "--swings", type=int, default=20, help="Number of largest evaluation swings to report")
+    args = parser.parse_args()
+
+    statistics = analyse_records(iter_record_paths(args.records), workers=args.workers, n_swings=args.swings)
+    print(json.dumps(statistics.report(), indent=2))
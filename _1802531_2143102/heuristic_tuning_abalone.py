@@ -0,0 +1,198 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Texel-style tuning of the weights of MyPlayer.compute_state_heuristic.
+
+Feature vectors are extracted once per record file (in parallel, with a process
+pool) and cached on disk as .npz files next to their outcome labels. Tuning then
+loads the whole feature matrix and fits the weights by minimizing the squared error
+between the game outcome and sigmoid(K * heuristic), using vectorized gradient steps.
+
+Usage:
+    python -m _1802531_2143102.heuristic_tuning_abalone records/ -c feature_cache/
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from my_player import MyPlayer, DEFAULT_HEURISTIC_WEIGHTS, HEURISTIC_WEIGHTS_PATH
+from .evaluator_abalone import feature_digest
+from .game_analysis_abalone import iter_record_paths, iter_recorded_states, replay_game
+
+FEATURES = tuple(DEFAULT_HEURISTIC_WEIGHTS)
+# Identifies the definitions of the features, in the cache keys and the weights file
+FEATURES_DIGEST = feature_digest(FEATURES)
+
+
+def extract_game_features(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Replay a record file and extract the heuristic features of every position,
+    from White's point of view, along with the final outcome of the game.
+
+    Returns:
+        (np.ndarray, np.ndarray): (n_positions x n_features) feature matrix and
+                                  outcome vector (1 White wins, 0.5 draw, 0 Black wins)
+    """
+    players = {"W": MyPlayer("W", name="tuning_W"), "B": MyPlayer("B", name="tuning_B")}
+    evaluator = players["W"]
+    rows = []
+    state = None
+    for _, state, _ in replay_game(iter_recorded_states(path), players):
+        rows.append(evaluator.compute_heuristic_features(state))
+
+    features = np.array(rows, dtype=np.float32).reshape(-1, len(FEATURES))
+    if state is None:
+        return features, np.zeros(0, dtype=np.float32)
+
+    margin = state.scores[players["W"].get_id()] - state.scores[players["B"].get_id()]
+    outcome = 1.0 if margin > 0 else 0.0 if margin < 0 else 0.5
+    return features, np.full(len(rows), outcome, dtype=np.float32)
+
+
+def cache_path(cache_dir: str, path: str) -> str:
+    """
+    Name of the cache file of a record file, keyed by its path, size and modification time,
+    and by the definitions of the features.
+    """
+    stat = os.stat(path)
+    key = "{}:{}:{}:{}".format(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, FEATURES_DIGEST)
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".npz")
+
+
+def cache_game_features(path: str, cache_dir: str) -> str:
+    """
+    Extract the features of a record file unless they are already cached.
+
+    Returns:
+        str: path to the cache file, or None if the record cannot be replayed
+    """
+    cached = cache_path(cache_dir, path)
+    if not os.path.exists(cached):
+        try:
+            features, outcomes = extract_game_features(path)
+        except (ValueError, KeyError):
+            return None
+        tmp = cached + ".tmp.npz"
+        np.savez(tmp, features=features, outcomes=outcomes)
+        os.replace(tmp, cached)
+    return cached
+
+
+def load_dataset(paths: Iterable[str], cache_dir: str, workers: int = os.cpu_count()) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build the feature matrix of all record files, extracting missing features in parallel.
+
+    Returns:
+        (np.ndarray, np.ndarray): feature matrix and outcome vector
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = list(paths)
+    if workers <= 1:
+        cached_files = [cache_game_features(path, cache_dir) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            cached_files = list(executor.map(cache_game_features, paths, [cache_dir] * len(paths), chunksize=16))
+
+    features, outcomes = [], []
+    for cached in cached_files:
+        if cached is None:
+            continue
+        with np.load(cached) as data:
+            features.append(data["features"])
+            outcomes.append(data["outcomes"])
+    if not features:
+        return np.zeros((0, len(FEATURES)), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    return np.concatenate(features), np.concatenate(outcomes)
+
+
+def prediction_error(weights: np.ndarray, features: np.ndarray, outcomes: np.ndarray, k: float) -> float:
+    """
+    Mean squared error between outcomes and sigmoid(k * features . weights).
+    """
+    predictions = 1.0 / (1.0 + np.exp(-k * (features @ weights)))
+    return float(np.mean((outcomes - predictions) ** 2))
+
+
+def tune_weights(features: np.ndarray, outcomes: np.ndarray, initial_weights: np.ndarray, k: float = 1.0,
+                 learning_rate: float = 0.01, iterations: int = 2000, batch_size: int = None) -> np.ndarray:
+    """
+    Fit the heuristic weights with Adam steps on the outcome-prediction error.
+
+    Args:
+        features (np.ndarray): (n_positions x n_features) feature matrix
+        outcomes (np.ndarray): outcome of the game each position comes from
+        initial_weights (np.ndarray): starting weights
+        k (float): sigmoid scaling constant
+        learning_rate (float): Adam step size
+        iterations (int): number of gradient steps
+        batch_size (int): positions sampled per step, the whole matrix if None
+
+    Returns:
+        np.ndarray: the tuned weights
+    """
+    features = features.astype(np.float64)
+    outcomes = outcomes.astype(np.float64)
+    weights = initial_weights.astype(np.float64).copy()
+    first_moment = np.zeros_like(weights)
+    second_moment = np.zeros_like(weights)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    rng = np.random.default_rng(0)
+
+    for t in range(1, iterations + 1):
+        if batch_size is not None and batch_size < len(outcomes):
+            rows = rng.integers(0, len(outcomes), batch_size)
+            x, y = features[rows], outcomes[rows]
+        else:
+            x, y = features, outcomes
+
+        predictions = 1.0 / (1.0 + np.exp(-k * (x @ weights)))
+        residuals = (predictions - y) * predictions * (1.0 - predictions)
+        gradient = (2.0 * k / len(y)) * (x.T @ residuals)
+
+        first_moment = beta1 * first_moment + (1 - beta1) * gradient
+        second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+        step = first_moment / (1 - beta1 ** t) / (np.sqrt(second_moment / (1 - beta2 ** t)) + epsilon)
+        weights -= learning_rate * step
+
+    return weights
+
+
+def save_weights(weights: np.ndarray, path: str = HEURISTIC_WEIGHTS_PATH) -> None:
+    """
+    Write the weights file loaded by MyPlayer at startup, tagged with the digest of the features.
+    """
+    with open(path, "w") as weights_file:
+        json.dump({"features": FEATURES_DIGEST,
+                   "weights": {name: float(weight) for name, weight in zip(FEATURES, weights)}}, weights_file, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="heuristic_tuning_abalone.py",
+                                     description="Tune the heuristic weights of MyPlayer on recorded games.")
+    parser.add_argument("records", nargs="+", help="Record files or directories of record files")
+    parser.add_argument("-c", "--cache", default="feature_cache", help="Directory of the cached feature files")
+    parser.add_argument("-o", "--output", default=HEURISTIC_WEIGHTS_PATH, help="Weights file to write")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("-k", type=float, default=1.0, help="Sigmoid scaling constant")
+    parser.add_argument("-i", "--iterations", type=int, default=2000, help="Number of gradient steps")
+    parser.add_argument("--lr", type=float, default=0.01, help="Learning rate")
+    parser.add_argument("-b", "--batch-size", type=int, default=None, help="Positions sampled per gradient step")
+    args = parser.parse_args()
+
+    features, outcomes = load_dataset(iter_record_paths(args.records), args.cache, workers=args.workers)
+    print("Positions:", len(outcomes))
+
+    initial_weights = np.array([DEFAULT_HEURISTIC_WEIGHTS[name] for name in FEATURES])
+    print("Initial error:", prediction_error(initial_weights, features, outcomes, args.k))
+    weights = tune_weights(features, outcomes, initial_weights, k=args.k, learning_rate=args.lr,
+                           iterations=args.iterations, batch_size=args.batch_size)
+    print("Tuned error:", prediction_error(weights, features, outcomes, args.k))
+    print("Tuned weights:", dict(zip(FEATURES, weights.tolist())))
+
+    save_weights(weights, args.output)
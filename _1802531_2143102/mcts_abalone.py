@@ -0,0 +1,164 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Monte-Carlo Tree Search (UCT) over PlayoutBoardAbalone.
+
+The tree is a node pool of flat arrays indexed by node number: the children of a
+node are allocated together when it is expanded, so a node only stores its first
+child and number of children. No per-node Python object is created, and positions
+are never stored: each iteration replays the moves from the root on a copy of the
+root board. Once the pool is full, leaves are no longer expanded but the playouts go
+on from the existing tree until the time budget is spent.
+
+Speed: on CPython 3.11, from the classic opening with 20-ply playouts, the search runs
+about 5,500 playouts/s (bare playouts about 11,000/s), short of tens of thousands. A ply
+costs a few microseconds of interpreted code (about 5 rejected draws, push_code and make),
+which bounds a 20-ply playout near 60 us whatever the tree does. BatchBoardAbalone only
+passes 10,000 playouts/s with batches of 1,000 games or more, that is 1,000 playouts per
+leaf, which would starve the tree of iterations, so it is not used here.
+"""
+import math
+import random
+import time
+from array import array
+
+from .move_encoding_abalone import NULL_MOVE
+from .playout_board_abalone import PlayoutBoardAbalone
+from .symmetry_abalone import WHITE
+
+ROOT = 0
+
+
+class NodePoolAbalone():
+    """
+    Search tree stored as parallel arrays.
+
+    Attributes:
+        parent      (array[int])   : parent node, -1 for the root
+        move        (array[int])   : encoded move leading to the node
+        mover       (array[int])   : colour of the player who played that move
+        first_child (array[int])   : first child node, -1 if the node is not expanded
+        n_children  (array[int])   : number of children
+        visits      (array[int])   : number of playouts through the node
+        wins        (array[float]) : sum of the playout outcomes for the mover
+        max_nodes   (int)          : number of nodes allocated at most
+        full        (bool)         : whether an expansion was refused because the pool is full
+    """
+
+    def __init__(self, root_mover: int, max_nodes: int = 2_000_000) -> None:
+        self.parent = array('i', [-1])
+        self.move = array('H', [NULL_MOVE])
+        self.mover = array('b', [root_mover])
+        self.first_child = array('i', [-1])
+        self.n_children = array('i', [0])
+        self.visits = array('i', [0])
+        self.wins = array('d', [0.0])
+        self.max_nodes = max_nodes
+        self.full = False
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def expand(self, node: int, moves: list, mover: int) -> bool:
+        """
+        Allocate the children of a node, one per move.
+
+        Returns:
+            bool: False if the pool has no room left for them (the node stays a leaf)
+        """
+        n_moves = len(moves)
+        if len(self.parent) + n_moves > self.max_nodes:
+            self.full = True
+            return False
+        self.first_child[node] = len(self.parent)
+        self.n_children[node] = n_moves
+        self.parent.extend([node] * n_moves)
+        self.move.extend(moves)
+        self.mover.extend([mover] * n_moves)
+        self.first_child.extend([-1] * n_moves)
+        self.n_children.extend([0] * n_moves)
+        self.visits.extend([0] * n_moves)
+        self.wins.extend([0.0] * n_moves)
+        return True
+
+    def select_child(self, node: int, exploration: float) -> int:
+        """
+        Child maximising the UCB1 bound, unvisited children first.
+        """
+        first = self.first_child[node]
+        last = first + self.n_children[node]
+        scale = exploration * math.sqrt(math.log(self.visits[node] or 1))
+        sqrt = math.sqrt
+        best_child = first
+        best_bound = float('-inf')
+        for child, child_visits, child_wins in zip(range(first, last), self.visits[first:last], self.wins[first:last]):
+            if child_visits == 0:
+                return child
+            bound = child_wins / child_visits + scale / sqrt(child_visits)
+            if bound > best_bound:
+                best_bound = bound
+                best_child = child
+        return best_child
+
+    def backpropagate(self, node: int, white_result: float) -> None:
+        """
+        Add the outcome of a playout (for White) to the nodes from `node` up to the root.
+        """
+        while node != -1:
+            self.visits[node] += 1
+            self.wins[node] += white_result if self.mover[node] == WHITE else 1.0 - white_result
+            node = self.parent[node]
+
+    def best_move(self) -> int:
+        """
+        Move of the most visited child of the root, -1 if the root was not expanded.
+        """
+        first = self.first_child[ROOT]
+        if first == -1 or self.n_children[ROOT] == 0:
+            return -1
+        best_child = max(range(first, first + self.n_children[ROOT]), key=self.visits.__getitem__)
+        return self.move[best_child]
+
+
+def search(board: PlayoutBoardAbalone, time_budget: float, exploration: float = 1.4, playout_plies: int = 20,
+           max_nodes: int = 2_000_000, rng: random.Random = None) -> tuple:
+    """
+    Run MCTS iterations from `board` until the time budget is spent. The tree grows up to
+    `max_nodes` nodes (tree.full tells whether it reached that limit), then the playouts
+    go on from its leaves.
+
+    Returns:
+        (int, NodePoolAbalone, int): the best move (-1 if there is none), the tree and the number of playouts
+    """
+    rng = rng or random.Random()
+    deadline = time.time() + time_budget
+    tree = NodePoolAbalone(3 - board.to_move, max_nodes)
+    n_playouts = 0
+
+    while True:
+        if n_playouts % 64 == 0 and n_playouts and time.time() > deadline:
+            break
+
+        # Selection
+        simulation = board.copy()
+        node = ROOT
+        while tree.n_children[node]:
+            node = tree.select_child(node, exploration)
+            simulation.make(tree.move[node])
+
+        # Expansion, once a leaf has been visited (the root is expanded at once), while the pool has room
+        if not tree.full and not simulation.is_done() and (tree.visits[node] or node == ROOT) and \
+           tree.first_child[node] == -1:
+            moves = simulation.legal_moves()
+            if moves:
+                rng.shuffle(moves)
+                if tree.expand(node, moves, simulation.to_move):
+                    node = tree.first_child[node]
+                    simulation.make(tree.move[node])
+
+        # Simulation and backpropagation
+        tree.backpropagate(node, simulation.playout(rng, playout_plies))
+        n_playouts += 1
+
+    return tree.best_move(), tree, n_playouts
@@ -0,0 +1,207 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Memory accounting of the player's caches.
+
+The caches are sized explicitly with sys.getsizeof, on a sample of their entries:
+    - the transposition table: its dictionaries, string keys and float values;
+    - the cached action sets: every state reachable from the current one through
+      action sets already computed (GameState.get_possible_actions caches them), i.e.
+      the tree of states retained by the current state;
+    - the successor cache of the search, if enabled.
+A ceiling on these bytes is enforced by shrinking the transposition table, whose
+maximum size is capped so that it stays under the ceiling until the next move. The cap
+is recomputed from the configured size at each move, so the table grows back when the
+other caches shrink. The resident
+set size (current and peak) of the process is reported alongside, and the Python heap
+can be measured exactly with tracemalloc, at the cost of slower allocations.
+"""
+import itertools
+import os
+import sys
+import tracemalloc
+from typing import Optional
+
+from seahorse.game.game_state import GameState
+
+from .successor_cache_abalone import SuccessorCacheAbalone
+from .transposition_table_abalone import TranspositionTableAbalone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Number of entries sized per dictionary, the others being assumed of the same size
+SAMPLE_SIZE = 64
+MEGABYTE = 2 ** 20
+
+
+def table_bytes(table: TranspositionTableAbalone) -> int:
+    """
+    Bytes used by the in-memory entries of a transposition table (the mapped file excluded).
+    """
+    total = 0
+    for generation in table.generations:
+        total += sys.getsizeof(generation)
+        if generation:
+            sample = list(itertools.islice(generation.items(), SAMPLE_SIZE))
+            sample_bytes = sum(sys.getsizeof(state_hash) + sys.getsizeof(state_value)
+                               for state_hash, state_value in sample)
+            total += sample_bytes * len(generation) // len(sample)
+    return total
+
+
+def state_bytes(state: GameState) -> int:
+    """
+    Bytes owned by a game state: the state, its board and board dictionary, and its scores.
+    Pieces and players are shared between states and not counted.
+    """
+    board = state.get_rep()
+    return sys.getsizeof(state) + sys.getsizeof(state.__dict__) + sys.getsizeof(board) + \
+           sys.getsizeof(board.__dict__) + sys.getsizeof(board.get_env()) + sys.getsizeof(state.scores)
+
+
+def cached_actions_bytes(state: GameState) -> int:
+    """
+    Bytes of the states retained through cached action sets, from `state` down.
+    """
+    total = 0
+    pending = [state]
+    seen = {id(state)}
+    while pending:
+        actions = getattr(pending.pop(), "_possible_actions", None)
+        if not actions:
+            continue
+        total += sys.getsizeof(actions)
+        for action in actions:
+            next_state = action.get_next_game_state()
+            if id(next_state) not in seen:
+                seen.add(id(next_state))
+                total += sys.getsizeof(action) + state_bytes(next_state)
+                pending.append(next_state)
+    return total
+
+
+def successor_cache_bytes(cache: SuccessorCacheAbalone) -> int:
+    """
+    Bytes of the successor lists of a successor cache, sized on a sample of them.
+    """
+    total = sys.getsizeof(cache.entries)
+    sample = list(itertools.islice(cache.entries.values(), SAMPLE_SIZE))
+    if sample:
+        sample_bytes = 0
+        for transitions in sample:
+            sample_bytes += sys.getsizeof(transitions)
+            for transition in transitions:
+                action, next_state = transition
+                sample_bytes += sys.getsizeof(transition) + sys.getsizeof(action) + state_bytes(next_state)
+        total += sample_bytes * len(cache) // len(sample)
+    return total
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    Current resident set size of the process, None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Peak resident set size of the process, None where the resource module is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryAccountantAbalone():
+    """
+    Measures the player's caches after each move and keeps them under a ceiling.
+
+    Attributes:
+        ceiling     (int)  : bytes the caches may use at most, None for no ceiling
+        trace       (bool) : whether the Python heap is measured with tracemalloc
+        last_report (dict) : report of the last move, see measure
+    """
+
+    def __init__(self, ceiling: int = None, trace: bool = False) -> None:
+        self.ceiling = ceiling
+        self.trace = trace
+        self.last_report = {}
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def measure(self, table: TranspositionTableAbalone, state: GameState = None,
+                successor_cache: SuccessorCacheAbalone = None) -> dict:
+        """
+        Returns:
+            dict: bytes used by the transposition table ("transposition_table", with its mapped
+                  file apart in "transposition_table_file"), by the states retained through cached
+                  action sets ("cached_actions") and by the successor cache ("successor_cache"),
+                  current and peak RSS ("rss", "peak_rss") and, if traced, current and peak
+                  Python heap ("traced", "traced_peak")
+        """
+        report = {"transposition_table": table_bytes(table),
+                  "transposition_table_entries": len(table),
+                  "transposition_table_file": len(table.file_map) if table.file_map is not None else 0,
+                  "cached_actions": cached_actions_bytes(state) if state is not None else 0,
+                  "successor_cache": successor_cache_bytes(successor_cache) if successor_cache is not None else 0,
+                  "rss": rss_bytes(),
+                  "peak_rss": peak_rss_bytes()}
+        if self.trace:
+            report["traced"], report["traced_peak"] = tracemalloc.get_traced_memory()
+        return report
+
+    def enforce(self, table: TranspositionTableAbalone, report: dict) -> int:
+        """
+        Cap the size of the transposition table, from its configured size, so that it stays under
+        the ceiling until the next move, and shrink it if the caches exceed the ceiling.
+
+        Returns:
+            int: number of table entries dropped
+        """
+        if self.ceiling is None or len(table) == 0:
+            table.max_table_size = table.configured_size
+            return 0
+        other_bytes = report["cached_actions"] + report["successor_cache"]
+        entry_bytes = report["transposition_table"] / len(table)
+        max_entries = int(max(0, self.ceiling - other_bytes) // entry_bytes)
+        table.max_table_size = min(table.configured_size, max_entries)
+        if report["transposition_table"] + other_bytes <= self.ceiling:
+            return 0
+        return table.shrink(max_entries)
+
+    def account(self, table: TranspositionTableAbalone, state: GameState = None,
+                successor_cache: SuccessorCacheAbalone = None) -> dict:
+        """
+        Measure the caches, then enforce the ceiling.
+
+        Returns:
+            dict: the report of measure, with the number of table entries dropped ("dropped_entries")
+        """
+        report = self.measure(table, state, successor_cache)
+        report["dropped_entries"] = self.enforce(table, report)
+        self.last_report = report
+        return report
+
+    @staticmethod
+    def summary(report: dict) -> str:
+        """
+        One-line summary of a report, in megabytes.
+        """
+        def megabytes(n_bytes: Optional[int]) -> str:
+            return "n/a" if n_bytes is None else f"{n_bytes / MEGABYTE:.1f}"
+        return (f"table {megabytes(report['transposition_table'])} MB "
+                f"({report['transposition_table_entries']} entries, {report['dropped_entries']} dropped), "
+                f"cached actions {megabytes(report['cached_actions'])} MB, "
+                f"successor cache {megabytes(report['successor_cache'])} MB, "
+                f"rss {megabytes(report['rss'])} MB, peak rss {megabytes(report['peak_rss'])} MB")
@@ -0,0 +1,68 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Compact integer encoding of moves.
+
+A move fits in 16 bits, so that move lists can be stored in array('H') buffers and
+moves used as small hashable keys (killer and history tables, opening books):
+
+    bits 0-8   : move index, rear cell * 6 + direction (as in PlayoutBoardAbalone and
+                 BatchBoardAbalone); the direction is an index of DIRECTIONS
+    bits 9-10  : group length, number of own marbles moved (1 to 3)
+    bits 11-12 : push count, number of opponent marbles pushed (0 to 2)
+    bit  13    : broadside flag (always 0: GameStateAbalone only generates inline moves)
+
+Bits 9 to 12 are the push code returned by PlayoutBoardAbalone.push_code, so a move
+is encoded as move index | push code << 9. Moves are generated encoded by
+PlayoutBoardAbalone.legal_moves, and light actions are encoded by a lookup in the legal
+moves of the position (LegalMoveIndexAbalone.validate).
+"""
+from array import array
+from typing import Iterable, Tuple
+
+from .board_tables_abalone import CELLS, DIRECTIONS, N_DIRECTIONS
+
+MOVE_INDEX_MASK = (1 << 9) - 1
+CODE_SHIFT = 9
+LENGTH_SHIFT = 9
+PUSHED_SHIFT = 11
+BROADSIDE_SHIFT = 13
+NULL_MOVE = 0xFFFF
+
+
+def decode_move(move: int) -> Tuple[int, int, int, int, bool]:
+    """
+    Returns:
+        (int, int, int, int, bool): cell, direction, group length, push count and broadside flag of a move
+    """
+    cell, direction = divmod(move & MOVE_INDEX_MASK, N_DIRECTIONS)
+    return cell, direction, move >> LENGTH_SHIFT & 3, move >> PUSHED_SHIFT & 3, bool(move >> BROADSIDE_SHIFT & 1)
+
+
+def move_index(move: int) -> int:
+    return move & MOVE_INDEX_MASK
+
+
+def push_code(move: int) -> int:
+    """
+    Push code of a move (own marbles | opponent marbles << 2, see PlayoutBoardAbalone.push_code).
+    """
+    return move >> CODE_SHIFT & 15
+
+
+def light_action(move: int) -> dict:
+    """
+    Light action ({'from', 'to'}) of a move, for GameStateAbalone.convert_light_action_to_action.
+    """
+    cell, direction = divmod(move & MOVE_INDEX_MASK, N_DIRECTIONS)
+    i, j = CELLS[cell]
+    n_i, n_j = DIRECTIONS[direction]
+    return {'from': (i, j), 'to': (i + n_i, j + n_j)}
+
+
+def move_list(moves: Iterable[int] = ()) -> array:
+    """
+    Compact buffer of moves.
+    """
+    return array('H', moves)
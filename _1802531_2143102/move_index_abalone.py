@@ -0,0 +1,148 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Index of the legal moves of a position, for validating incoming actions.
+
+The legal moves are generated once per position with PlayoutBoardAbalone and stored
+by move index (rear cell * 6 + direction), so that a light action ({'from', 'to'})
+from the GUI or a remote player is validated with a dictionary lookup, and an action
+checked by the game master by comparing its board with at most a few replayed moves,
+instead of enumerating and building every successor state. Rejected actions come
+with the reason they are illegal.
+"""
+from typing import Tuple
+
+from seahorse.game.game_state import GameState
+
+from .board_tables_abalone import CELLS, CELL_INDEX, DIRECTIONS, N_DIRECTIONS, RAYS
+from .move_encoding_abalone import MOVE_INDEX_MASK, decode_move
+from .playout_board_abalone import MAX_MARBLES_MOVED, PlayoutBoardAbalone
+from .symmetry_abalone import EMPTY
+
+
+class IllegalMoveError(ValueError):
+    """
+    Raised when an action is not a legal move of the position; the message gives the reason.
+    """
+    pass
+
+
+class LegalMoveIndexAbalone():
+    """
+    Legal moves of a position.
+
+    Attributes:
+        board (PlayoutBoardAbalone) : compact board of the position
+        moves (dict[int, int])      : move index -> encoded move (see move_encoding_abalone), for every legal move
+    """
+
+    def __init__(self, board: PlayoutBoardAbalone) -> None:
+        self.board = board
+        self.moves = {move & MOVE_INDEX_MASK: move for move in board.legal_moves()}
+
+    @classmethod
+    def from_state(cls, state: GameState) -> "LegalMoveIndexAbalone":
+        return cls(PlayoutBoardAbalone.from_state(state))
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def validate(self, data: dict) -> int:
+        """
+        Validate a light action.
+
+        Returns:
+            int: the encoded move
+
+        Raises:
+            IllegalMoveError: if the action is not a legal move, with the reason
+        """
+        try:
+            (i, j), (to_i, to_j) = tuple(data['from']), tuple(data['to'])
+        except (KeyError, TypeError, ValueError):
+            raise IllegalMoveError(f"malformed action {data!r}: expected {{'from': (i, j), 'to': (i, j)}}")
+        if (i, j) not in CELL_INDEX:
+            raise IllegalMoveError(f"{(i, j)} is not a cell of the board")
+        direction = (to_i - i, to_j - j)
+        if direction not in DIRECTIONS:
+            raise IllegalMoveError(f"{(to_i, to_j)} is not a neighbour of {(i, j)}")
+
+        move = self.moves.get(CELL_INDEX[(i, j)] * N_DIRECTIONS + DIRECTIONS.index(direction))
+        if move is None:
+            raise IllegalMoveError(self.rejection_reason(CELL_INDEX[(i, j)], DIRECTIONS.index(direction)))
+        return move
+
+    def is_legal(self, data: dict) -> bool:
+        try:
+            self.validate(data)
+        except IllegalMoveError:
+            return False
+        return True
+
+    def rejection_reason(self, cell: int, direction: int) -> str:
+        """
+        Why the move of the marble line starting at `cell` in `direction` is illegal
+        (replays the rules of PlayoutBoardAbalone.push_code).
+        """
+        cells = self.board.cells
+        me = self.board.to_move
+        if cells[cell] == EMPTY:
+            return "there is no marble on the starting cell"
+        if cells[cell] != me:
+            return "the marble on the starting cell belongs to the opponent"
+        own = 1
+        opponent = 0
+        for next_cell in RAYS[cell][direction]:
+            content = cells[next_cell]
+            if content == EMPTY:
+                break
+            if content == me:
+                if opponent:
+                    return "a marble of the player to move blocks the pushed marbles"
+                own += 1
+                if own > MAX_MARBLES_MOVED:
+                    return f"more than {MAX_MARBLES_MOVED} marbles would move in line"
+            else:
+                opponent += 1
+                if opponent >= own:
+                    return f"{opponent} opponent marble(s) cannot be pushed by {own}"
+        return "the move is not legal"
+
+    def find_move(self, next_board: PlayoutBoardAbalone) -> int:
+        """
+        Legal move leading to a board. Only the moves whose rear cell is vacated by the
+        player to move are replayed.
+
+        Returns:
+            int: the encoded move
+
+        Raises:
+            IllegalMoveError: if no legal move leads to the board
+        """
+        board = self.board
+        me = board.to_move
+        for cell, content in enumerate(board.cells):
+            if content != me or next_board.cells[cell] == me:
+                continue
+            for direction in range(N_DIRECTIONS):
+                move = self.moves.get(cell * N_DIRECTIONS + direction)
+                if move is None:
+                    continue
+                undo = board.make(move)
+                same = board.cells == next_board.cells and board.lost == next_board.lost and \
+                       board.to_move == next_board.to_move and board.step == next_board.step
+                board.unmake(undo)
+                if same:
+                    return move
+        raise IllegalMoveError("no legal move leads to this state")
+
+    def moved_positions(self, move: int) -> Tuple[Tuple[int, int], ...]:
+        """
+        Positions of the marbles moved by a legal move (own marbles first, then pushed ones),
+        as detect_conflict returns them.
+        """
+        cell, direction, length, pushed, _ = decode_move(move)
+        i, j = CELLS[cell]
+        n_i, n_j = DIRECTIONS[direction]
+        return tuple((i + k * n_i, j + k * n_j) for k in range(length + pushed))
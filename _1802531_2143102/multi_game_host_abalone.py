@@ -0,0 +1,443 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Host of many concurrent Abalone matches in one process.
+
+Each match is a coroutine on a single asyncio event loop, playing the role of a
+MasterAbalone: it asks the player to move for an action, checks it with the legal move
+index of the state, charges the player's time and decides the winners as MasterAbalone
+does. Players are loaded from their modules (MyPlayer, like main_abalone.py) in worker
+processes, and their compute_action runs there, so the event loop never blocks on a
+search. Each worker is a single-process pool and a match stays on the same worker from
+start to end, so that its players keep their caches (transposition table, ...) between
+moves. At most one match per worker is played at a time; the others wait their turn.
+A player who runs out of time may still be searching: its worker process is then
+terminated and replaced, so that the next match does not wait behind it.
+
+Spectators connect to a single port (socket.io, like the seahorse GameMaster) and
+follow the match of their choice with GUI/index.html?match=<match id>; the updates of a
+match are sent to its spectators only, as full states or with the delta protocol of
+delta_protocol_abalone. GET /matches lists the matches and their results.
+
+Matches file: one match per line, "white_player.py black_player.py [classic|alien]",
+blank lines and lines starting with # ignored.
+
+Usage (see main_abalone.py):
+    python main_abalone.py -t host_games --matches league.txt --workers 8 -p 16001
+"""
+import asyncio
+import inspect
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from os.path import basename, dirname, splitext
+from typing import Callable, Dict, List, Tuple
+
+import socketio
+from aiohttp import web
+
+from board_abalone import INITIAL_BOARDS
+from master_abalone import final_winners
+from player_abalone import PlayerAbalone
+
+from .delta_protocol_abalone import DEFAULT_SNAPSHOT_EVERY, DeltaEncoderAbalone, snapshot_payload
+from .replay_abalone import find_light_action, restore, snapshot
+
+PIECE_TYPES = ("W", "B")
+# Time limit of each player in (s), as in main_abalone.py
+DEFAULT_TIME_LIMIT = 15 * 60
+# Seconds a player may exceed its time credit, for the transfer of the move from its worker
+TIME_TOLERANCE = 1.0
+
+# Players of the matches played by a worker process: match id -> {piece type: player}
+_match_players = {}
+
+
+def load_player_class(path: str) -> type:
+    """
+    MyPlayer class of a player module, imported from its file like main_abalone.py does.
+    """
+    folder = dirname(path)
+    if folder not in sys.path:
+        sys.path.append(folder)
+    return __import__(splitext(basename(path))[0], fromlist=[None]).MyPlayer
+
+
+def player_name(path: str, piece_type: str) -> str:
+    return splitext(basename(path))[0] + ("_1" if piece_type == "W" else "_2")
+
+
+def initial_snapshot(config: str) -> tuple:
+    """
+    Snapshot (see replay_abalone.snapshot) of the starting position of a board configuration.
+    """
+    initial_board = INITIAL_BOARDS[config]
+    board = {(i, j): PIECE_TYPES[content - 1] for i, row in enumerate(initial_board)
+             for j, content in enumerate(row) if content in (1, 2)}
+    return board, {"W": 0, "B": 0}, 0, "W"
+
+
+def compute_move(match_id: str, player_paths: Dict[str, str], time_limit: float, state_snapshot: tuple,
+                 remaining_time: float) -> Tuple[dict, float]:
+    """
+    Worker process side: have the player to move compute its action. The players of the
+    match are created on its first move and kept until release_match.
+
+    Returns:
+        (dict, float): the board reached ({position: piece type}) and the time spent in compute_action in (s)
+    """
+    players = _match_players.get(match_id)
+    if players is None:
+        players = {piece_type: load_player_class(path)(piece_type, name=player_name(path, piece_type),
+                                                       time_limit=time_limit)
+                   for piece_type, path in player_paths.items()}
+        _match_players[match_id] = players
+
+    state = restore(state_snapshot, players)
+    begin = time.perf_counter()
+    action = state.next_player.compute_action(current_state=state, remaining_time=remaining_time)
+    elapsed = time.perf_counter() - begin
+    return snapshot(action.get_next_game_state())[0], elapsed
+
+
+def release_match(match_id: str) -> None:
+    """
+    Worker process side: drop the players of a finished match, stopping their pondering process if any.
+    """
+    for player in _match_players.pop(match_id, {}).values():
+        if getattr(player, "ponderer", None) is not None:
+            player.ponderer.close()
+
+
+def terminate_worker(worker: ProcessPoolExecutor) -> None:
+    """
+    Stop a worker at once, even in the middle of a move (shutdown alone waits for the move to end).
+    """
+    processes = list((worker._processes or {}).values())
+    worker.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def read_match_list(path: str) -> List[Tuple[str, str, str]]:
+    """
+    Read a matches file.
+
+    Returns:
+        list[tuple]: (white player path, black player path, board configuration) of each match
+    """
+    matches = []
+    with open(path, "r") as match_file:
+        for line in match_file:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            config = fields[2] if len(fields) > 2 else "classic"
+            if len(fields) not in (2, 3) or config not in INITIAL_BOARDS:
+                raise ValueError(f"invalid match line in {path}: {line.strip()!r}")
+            matches.append((fields[0], fields[1], config))
+    return matches
+
+
+class HostedMatchAbalone():
+    """
+    State of a hosted match.
+
+    Attributes:
+        match_id       (str)                : identifier of the match, unique in the host
+        config         (str)                : starting board configuration, "classic" or "alien"
+        player_paths   (dict[str, str])     : piece type -> module of the player
+        time_limit     (float)              : time credit of each player in (s)
+        players        (dict[str, PlayerAbalone]) : piece type -> stand-in of the player in the host
+        state          (GameStateAbalone)   : current state of the match
+        remaining_time (dict[str, float])   : piece type -> remaining time credit in (s)
+        status         (str)                : "pending", "running", "done" or "cancelled"
+        reason         (str)                : why the match was cancelled
+        winners        (list[str])          : piece types of the winners, once finished
+        worker         (int)                : worker playing the match
+        encoder        (DeltaEncoderAbalone): encoder of the updates sent to the spectators, None for full states
+    """
+
+    def __init__(self, match_id: str, white_path: str, black_path: str, config: str = "classic",
+                 time_limit: float = DEFAULT_TIME_LIMIT, delta_updates: bool = False,
+                 snapshot_every: int = DEFAULT_SNAPSHOT_EVERY) -> None:
+        self.match_id = match_id
+        self.config = config
+        self.player_paths = {"W": white_path, "B": black_path}
+        self.time_limit = time_limit
+        self.players = {piece_type: PlayerAbalone(piece_type, name=player_name(path, piece_type))
+                        for piece_type, path in self.player_paths.items()}
+        self.state = restore(initial_snapshot(config), self.players)
+        self.remaining_time = dict.fromkeys(PIECE_TYPES, time_limit)
+        self.status = "pending"
+        self.reason = None
+        self.winners = []
+        self.worker = None
+        self.encoder = DeltaEncoderAbalone(snapshot_every) if delta_updates else None
+
+    def scores(self) -> Dict[str, float]:
+        """
+        Scores by piece type.
+        """
+        return {player.get_piece_type(): self.state.scores[player.get_id()] for player in self.state.players}
+
+    def play_payload(self) -> dict:
+        """
+        Update of the current state for the spectators: full state or delta.
+        """
+        if self.encoder is None:
+            payload = self.state.to_json()
+        else:
+            payload = self.encoder.encode(self.state)
+        payload["remaining_time"] = {self.players[piece_type].get_id(): remaining
+                                     for piece_type, remaining in self.remaining_time.items()}
+        return payload
+
+    def done_payload(self) -> dict:
+        """
+        End of the match for the spectators, in the format of the seahorse GameMaster.
+        """
+        return {"players": [{"id": player.get_id(), "name": player.get_name()} for player in self.state.players],
+                "scores": self.state.get_scores(),
+                "winners_id": [self.players[piece_type].get_id() for piece_type in self.winners],
+                "status": self.status}
+
+    def result(self) -> dict:
+        return {"match": self.match_id, "config": self.config, "players": dict(self.player_paths),
+                "status": self.status, "reason": self.reason, "step": self.state.get_step(),
+                "scores": self.scores(), "winners": list(self.winners),
+                "remaining_time": dict(self.remaining_time)}
+
+
+class MultiGameHostAbalone():
+    """
+    Plays matches concurrently on the running event loop, their moves computed by worker processes.
+
+    Attributes:
+        matches        (dict[str, HostedMatchAbalone]) : matches by id, in the order they were added
+        workers        (list[ProcessPoolExecutor])     : single-process pools computing the moves
+        worker_load    (list[int])                     : number of matches being played by each worker, until
+                                                         the worker is free again
+        context        (BaseContext)                   : multiprocessing context of the workers
+        time_tolerance (float)                         : seconds a player may exceed its time credit
+        delta_updates  (bool)                          : whether spectators receive deltas
+        snapshot_every (int)                           : steps between two full snapshots with deltas
+        server         (MatchServerAbalone)            : server of the spectators, None if headless
+    """
+
+    def __init__(self, workers: int = os.cpu_count(), time_tolerance: float = TIME_TOLERANCE,
+                 delta_updates: bool = False, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY) -> None:
+        self.context = multiprocessing.get_context("spawn")
+        self.matches = {}
+        self.workers = [self.new_worker() for _ in range(max(1, workers))]
+        self.worker_load = [0] * len(self.workers)
+        self.time_tolerance = time_tolerance
+        self.delta_updates = delta_updates
+        self.snapshot_every = snapshot_every
+        self.server = None
+        self.slots = None
+
+    def new_worker(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=1, mp_context=self.context)
+
+    def replace_worker(self, worker: int) -> None:
+        """
+        Terminate a worker process that may still be busy (e.g. with a move that timed out) and start a new one.
+        """
+        terminate_worker(self.workers[worker])
+        self.workers[worker] = self.new_worker()
+
+    def add_match(self, white_path: str, black_path: str, config: str = "classic",
+                  time_limit: float = DEFAULT_TIME_LIMIT, match_id: str = None) -> HostedMatchAbalone:
+        """
+        Add a match, played by the next call to run.
+        """
+        if match_id is None:
+            match_id = str(len(self.matches))
+        if match_id in self.matches:
+            raise ValueError(f"duplicate match id {match_id!r}")
+        match = HostedMatchAbalone(match_id, white_path, black_path, config, time_limit,
+                                   self.delta_updates, self.snapshot_every)
+        self.matches[match_id] = match
+        return match
+
+    async def run(self, on_done: Callable[[HostedMatchAbalone], None] = None) -> List[HostedMatchAbalone]:
+        """
+        Play all the pending matches, at most one per worker at a time.
+
+        Args:
+            on_done (callable): called with each match as soon as it is finished
+
+        Returns:
+            list[HostedMatchAbalone]: the matches played
+        """
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(len(self.workers))
+        pending = [match for match in self.matches.values() if match.status == "pending"]
+        await asyncio.gather(*(self.play_match(match, on_done) for match in pending))
+        return pending
+
+    async def play_match(self, match: HostedMatchAbalone, on_done: Callable[[HostedMatchAbalone], None] = None) -> None:
+        """
+        Play a match to its end on the least loaded worker, once a worker is free (see run).
+        """
+        async with self.slots:
+            match.worker = self.worker_load.index(min(self.worker_load))
+            self.worker_load[match.worker] += 1
+            match.status = "running"
+            print(f"Match {match.match_id} ({match.config}): {match.players['W'].get_name()} (W) "
+                  f"vs {match.players['B'].get_name()} (B) on worker {match.worker}")
+            try:
+                await self.publish(match, "play")
+                while match.status == "running" and not match.state.is_done():
+                    await self.step(match)
+                    await self.publish(match, "play")
+                if match.status == "running":
+                    match.status = "done"
+                    match.winners = [player.get_piece_type()
+                                     for player in final_winners(match.state, match.state.get_scores())]
+            finally:
+                await asyncio.get_running_loop().run_in_executor(self.workers[match.worker], release_match,
+                                                                 match.match_id)
+                self.worker_load[match.worker] -= 1
+        print(f"Match {match.match_id} {match.status}: scores {match.scores()}, winners {match.winners}"
+              + (f" ({match.reason})" if match.reason else ""))
+        await self.publish(match, "done")
+        if on_done is not None:
+            on_done(match)
+
+    async def step(self, match: HostedMatchAbalone) -> None:
+        """
+        Play the next move of a match. A player whose compute_action raises, who runs out of
+        time or whose action is illegal is disqualified, as by the seahorse GameMaster.
+        Timing out leaves the move running in the worker, which is replaced.
+        """
+        piece_type = match.state.next_player.get_piece_type()
+        remaining_time = match.remaining_time[piece_type]
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.workers[match.worker], compute_move, match.match_id, match.player_paths,
+                                      match.time_limit, snapshot(match.state), remaining_time)
+        try:
+            next_board, elapsed = await asyncio.wait_for(future, remaining_time + self.time_tolerance)
+        except asyncio.TimeoutError:
+            self.replace_worker(match.worker)
+            return self.disqualify(match, piece_type, "time credit expired")
+        except BrokenProcessPool as error:
+            self.replace_worker(match.worker)
+            return self.disqualify(match, piece_type, f"worker process died ({error})")
+        except Exception as error:
+            return self.disqualify(match, piece_type, f"compute_action raised {error!r}")
+
+        match.remaining_time[piece_type] -= elapsed
+        if match.remaining_time[piece_type] + self.time_tolerance < 0:
+            return self.disqualify(match, piece_type, "time credit expired")
+        try:
+            _, action = find_light_action(match.state, next_board)
+        except ValueError:
+            return self.disqualify(match, piece_type, "action not permitted")
+        match.state = action.get_next_game_state()
+
+    def disqualify(self, match: HostedMatchAbalone, piece_type: str, reason: str) -> None:
+        match.status = "cancelled"
+        match.reason = f"{match.players[piece_type].get_name()} disqualified: {reason}"
+        match.winners = [other for other in PIECE_TYPES if other != piece_type]
+
+    async def publish(self, match: HostedMatchAbalone, event: str) -> None:
+        """
+        Send a "play" or "done" event of a match to its spectators, if served.
+        """
+        if self.server is not None:
+            payload = match.play_payload() if event == "play" else match.done_payload()
+            await self.server.emit(match.match_id, event, payload)
+
+    def results(self) -> List[dict]:
+        return [match.result() for match in self.matches.values()]
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.shutdown(cancel_futures=True)
+
+
+class MatchServerAbalone():
+    """
+    socket.io server of the spectators of a multi-game host, on a single port.
+
+    A spectator joins a match by sending a "watch" event ({"match": match id}); it is sent
+    the current state of the match, then every update of it.
+
+    Attributes:
+        host     (MultiGameHostAbalone) : the host whose matches are served
+        hostname (str)                  : address the server listens on
+        port     (int)                  : port the server listens on
+        sio      (socketio.AsyncServer) : the socket.io server
+        app      (web.Application)      : the aiohttp application serving it
+        runner   (web.AppRunner)        : runner of the application, once started
+    """
+
+    def __init__(self, host: MultiGameHostAbalone, hostname: str = "localhost", port: int = 16001) -> None:
+        self.host = host
+        self.hostname = hostname
+        self.port = port
+        self.sio = socketio.AsyncServer(async_mode="aiohttp", cors_allowed_origins="*")
+        self.app = web.Application()
+        self.sio.attach(self.app)
+        self.app.router.add_get("/matches", self.list_matches)
+        self.runner = None
+        host.server = self
+
+        @self.sio.on("watch")
+        async def watch(sid: str, data: str) -> None:
+            match = self.host.matches.get(str(json.loads(data).get("match")))
+            if match is None:
+                return
+            entered = self.sio.enter_room(sid, match.match_id)
+            # A coroutine in recent python-socketio versions only
+            if inspect.isawaitable(entered):
+                await entered
+            # Full state first: the deltas that follow apply to it
+            payload = snapshot_payload(match.state)
+            await self.sio.emit("play", json.dumps(payload, default=lambda x: x.to_json()), to=sid)
+            if match.status in ("done", "cancelled"):
+                await self.sio.emit("done", json.dumps(match.done_payload(), default=lambda x: x.to_json()), to=sid)
+
+    async def list_matches(self, request: web.Request) -> web.Response:
+        return web.json_response(self.host.results())
+
+    async def start(self) -> None:
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.hostname, self.port).start()
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def emit(self, match_id: str, event: str, payload: dict) -> None:
+        await self.sio.emit(event, json.dumps(payload, default=lambda x: x.to_json()), to=match_id)
+
+
+async def host_matches(host: MultiGameHostAbalone, hostname: str = None, port: int = None) -> List[dict]:
+    """
+    Play the matches of a host, serving their spectators on hostname:port unless port is None.
+
+    Returns:
+        list[dict]: the results of the matches
+    """
+    server = None
+    if port is not None:
+        server = MatchServerAbalone(host, hostname, port)
+        await server.start()
+        print(f"Serving {len(host.matches)} matches on {hostname}:{port}: "
+              f"open GUI/index.html?match=<id> to watch one, http://{hostname}:{port}/matches to list them")
+    try:
+        await host.run()
+    finally:
+        if server is not None:
+            await server.stop()
+    return host.results()
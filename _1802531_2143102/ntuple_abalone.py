@@ -0,0 +1,206 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+N-tuple network evaluation.
+
+A set of fixed cell tuples (straight lines of 4 cells and triangles of 3 mutually
+adjacent cells) is laid over the board. The contents of the cells of a tuple (EMPTY,
+OWN or OPPONENT) form a base-3 pattern indexing a weight table, and the evaluation
+is the sum of the weights of the patterns of all the tuples, plus the score difference.
+Tuples that are images of one another under a symmetry of the board share their table,
+so all the tables live in a single flat array of doubles.
+
+The pattern index of each tuple is kept in an accumulator and updated in place when
+cells change (make), and restored by applying the changes backwards (unmake), so that
+a move only touches the tuples containing one of its (at most three) changed cells.
+"""
+import hashlib
+import os
+from array import array
+from typing import List, Tuple
+
+from seahorse.game.game_state import GameState
+
+from .board_tables_abalone import NEIGHBOURS, N_CELLS, N_DIRECTIONS, cells_from_env, lines_of_length
+from .symmetry_abalone import SYMMETRIES
+
+N_CONTENTS = 3
+# Weights written by td_training_abalone and read by MyPlayer
+NTUPLE_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ntuple_weights.bin")
+
+
+def _triangles() -> tuple:
+    triangles = []
+    seen = set()
+    for cell in range(N_CELLS):
+        for first in range(N_DIRECTIONS):
+            for second in range(first + 1, N_DIRECTIONS):
+                a = NEIGHBOURS[cell][first]
+                b = NEIGHBOURS[cell][second]
+                if a != -1 and b != -1 and b in NEIGHBOURS[a] and frozenset((cell, a, b)) not in seen:
+                    seen.add(frozenset((cell, a, b)))
+                    triangles.append((cell, a, b))
+    return tuple(triangles)
+
+
+def _symmetric_groups(shapes: tuple) -> Tuple[tuple, tuple]:
+    # Order the tuples by orbit under the board symmetries: the images of the first tuple of an
+    # orbit, with their cells in the same order, share its table
+    tuples = []
+    groups = []
+    seen = set()
+    n_groups = 0
+    for shape in shapes:
+        for representative in shape:
+            if frozenset(representative) in seen:
+                continue
+            group = n_groups
+            n_groups += 1
+            for symmetry in SYMMETRIES:
+                image = tuple(symmetry[cell] for cell in representative)
+                if frozenset(image) not in seen:
+                    seen.add(frozenset(image))
+                    tuples.append(image)
+                    groups.append(group)
+    return tuple(tuples), tuple(groups)
+
+TUPLES, TUPLE_GROUPS = _symmetric_groups((lines_of_length(4), _triangles()))
+N_TUPLES = len(TUPLES)
+
+# Offset of the table of each group in the flat weight array, and offset of the table of each tuple
+_group_sizes = {}
+for _tuple, _group in zip(TUPLES, TUPLE_GROUPS):
+    _group_sizes[_group] = N_CONTENTS ** len(_tuple)
+GROUP_OFFSETS = []
+N_WEIGHTS = 0
+for _group in sorted(_group_sizes):
+    GROUP_OFFSETS.append(N_WEIGHTS)
+    N_WEIGHTS += _group_sizes[_group]
+TUPLE_OFFSETS = tuple(GROUP_OFFSETS[group] for group in TUPLE_GROUPS)
+
+# CELL_TUPLES[cell]: (tuple, power of 3 of the cell in the tuple's pattern) for each tuple containing the cell
+_cell_tuples = [[] for _ in range(N_CELLS)]
+for _index, _tuple in enumerate(TUPLES):
+    for _position, _cell in enumerate(_tuple):
+        _cell_tuples[_cell].append((_index, N_CONTENTS ** _position))
+CELL_TUPLES = tuple(tuple(entries) for entries in _cell_tuples)
+
+
+class NTupleEvaluatorAbalone():
+    """
+    N-tuple network over the board, from the point of view of the evaluated player.
+
+    Accumulators are [array of the flat weight index of each tuple, sum of their weights].
+
+    Attributes:
+        weights      (array[float]) : flat weight tables of all the tuple groups
+        score_weight (float)        : weight of the score difference
+        symmetric    (bool)         : False: a tuple mapped onto itself in reverse by a symmetry reads
+                                      its pattern backwards, so symmetric positions may evaluate differently
+        antisymmetric (bool)        : False: the tables of the two players' patterns are trained independently,
+                                      so the value for the opponent is not the opposite
+    """
+    symmetric = False
+    antisymmetric = False
+
+    def __init__(self, weights: array = None, score_weight: float = 1.0) -> None:
+        self.weights = weights if weights is not None else array('d', bytes(8 * N_WEIGHTS))
+        self.score_weight = score_weight
+
+    @classmethod
+    def load(cls, path: str) -> "NTupleEvaluatorAbalone":
+        """
+        Load weights written by save, falling back on null weights if the file is missing
+        or was written for other tuples.
+        """
+        weights = array('d')
+        if os.path.exists(path) and os.path.getsize(path) == weights.itemsize * (N_WEIGHTS + 1):
+            with open(path, "rb") as weights_file:
+                weights.fromfile(weights_file, N_WEIGHTS + 1)
+            return cls(weights[1:], weights[0])
+        return cls()
+
+    def save(self, path: str) -> None:
+        """
+        Write the score weight and the weight tables to a binary file.
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as weights_file:
+            array('d', [self.score_weight]).tofile(weights_file)
+            self.weights.tofile(weights_file)
+        os.replace(tmp_path, path)
+
+    def signature(self) -> bytes:
+        """
+        16-byte digest of the weights, so that cached values computed with other weights are not reused.
+        """
+        return hashlib.md5(array('d', [self.score_weight]).tobytes() + self.weights.tobytes()).digest()
+
+    @staticmethod
+    def indices(cells: List[int]) -> array:
+        """
+        Flat weight index of each tuple for a board (EMPTY, OWN or OPPONENT for each cell).
+        """
+        indices = array('i', TUPLE_OFFSETS)
+        for cell in range(N_CELLS):
+            content = cells[cell]
+            if content:
+                for index, power in CELL_TUPLES[cell]:
+                    indices[index] += content * power
+        return indices
+
+    def accumulate(self, cells: List[int], scores: Tuple[float, float] = None) -> list:
+        """
+        Full computation of the accumulator of a board.
+        """
+        indices = self.indices(cells)
+        weights = self.weights
+        return [indices, sum(weights[index] for index in indices)]
+
+    def make(self, accumulator: list, changes: List[Tuple[int, int, int]]) -> None:
+        """
+        Update an accumulator in place after cells changed ((cell, old content, new content)).
+        """
+        indices, value = accumulator
+        weights = self.weights
+        for cell, old, new in changes:
+            difference = new - old
+            for index, power in CELL_TUPLES[cell]:
+                weight_index = indices[index]
+                value -= weights[weight_index]
+                weight_index += difference * power
+                value += weights[weight_index]
+                indices[index] = weight_index
+        accumulator[1] = value
+
+    def unmake(self, accumulator: list, changes: List[Tuple[int, int, int]]) -> None:
+        """
+        Undo make with the same changes.
+        """
+        self.make(accumulator, [(cell, new, old) for cell, old, new in reversed(changes)])
+
+    def value(self, accumulator: list, scores: Tuple[float, float]) -> float:
+        return accumulator[1] + self.score_weight * (scores[0] - scores[1])
+
+    def evaluate(self, cells: List[int], scores: Tuple[float, float]) -> float:
+        """
+        Full evaluation of a board.
+
+        Args:
+            cells (list[int]): EMPTY, OWN or OPPONENT for each cell
+            scores (Tuple[float, float]): scores of the evaluated player and of the opponent
+
+        Returns:
+            float: sum of the tuple weights and of the weighted score difference
+        """
+        return self.value(self.accumulate(cells), scores)
+
+    def evaluate_state(self, state: GameState, player_id: int) -> float:
+        """
+        Full evaluation of a game state from a player's point of view.
+        """
+        cells = cells_from_env(state.get_rep().get_env(), player_id)
+        own_score = state.scores[player_id]
+        opponent_score = next(score for pid, score in state.scores.items() if pid != player_id)
+        return self.evaluate(cells, (own_score, opponent_score))
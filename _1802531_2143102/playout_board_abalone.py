@@ -0,0 +1,268 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Compact Abalone board for fast simulations.
+
+The board is a bytearray over the 61 cells (EMPTY, WHITE or BLACK) with the number
+of marbles each colour lost, the colour to move and the step. Moves are 16-bit
+integers (see move_encoding_abalone; a bare move index, rear cell * 6 + direction,
+is also accepted) and are played and undone in place, touching at most three cells, without building
+Action, GameStateAbalone or Piece objects. The rules are those of
+GameStateAbalone.detect_conflict and GameStateAbalone.generator: inline moves of up
+to three marbles, pushing fewer opponent marbles, and marbles moved off the board
+(including our own) are lost.
+"""
+import random
+from array import array
+from typing import List, Tuple
+
+from seahorse.game.game_state import GameState
+
+from .board_tables_abalone import CELLS, CENTER, N_CELLS, N_DIRECTIONS, RAYS
+from .move_encoding_abalone import CODE_SHIFT, MOVE_INDEX_MASK, light_action
+from .symmetry_abalone import BLACK, EMPTY, PIECE_CONTENTS, WHITE, typed_cells_from_env
+
+MAX_MARBLES_MOVED = 3
+N_MOVES = N_CELLS * N_DIRECTIONS
+
+def _center_distance(cell: Tuple[int, int]) -> float:
+    # Same distance as MasterAbalone.compute_winner, used to break ties
+    diff = (abs(cell[0] - CENTER[0]), abs(cell[1] - CENTER[1]))
+    distance = (diff[0] + diff[1]) / 2
+    if diff in [(0, 2), (1, 3), (2, 4)]:
+        distance += 1
+    if diff == (0, 4):
+        distance += 2
+    return distance
+
+CENTER_DISTANCE = tuple(_center_distance(cell) for cell in CELLS)
+
+
+class PlayoutBoardAbalone():
+    """
+    Board of a game in progress, played and undone in place.
+
+    Attributes:
+        cells    (bytearray) : EMPTY, WHITE or BLACK for each cell
+        lost     (list[int]) : number of marbles lost, indexed by colour (index 0 unused)
+        to_move  (int)       : colour of the player to move
+        step     (int)       : number of moves played since the start of the game
+        max_step (int)       : step at which the game ends
+        max_lost (int)       : number of lost marbles at which the game ends
+    """
+    __slots__ = ("cells", "to_move", "lost", "step", "max_step", "max_lost")
+
+    def __init__(self, cells: bytearray, to_move: int, lost: List[int], step: int,
+                 max_step: int = 50, max_lost: int = 6) -> None:
+        self.cells = cells
+        self.to_move = to_move
+        self.lost = lost
+        self.step = step
+        self.max_step = max_step
+        self.max_lost = max_lost
+
+    @classmethod
+    def from_state(cls, state: GameState) -> "PlayoutBoardAbalone":
+        """
+        Build the compact board of a game state.
+        """
+        lost = [0, 0, 0]
+        for player in state.players:
+            lost[PIECE_CONTENTS[player.get_piece_type()]] = -int(state.scores[player.get_id()])
+        return cls(bytearray(typed_cells_from_env(state.get_rep().get_env())),
+                   PIECE_CONTENTS[state.next_player.get_piece_type()], lost, state.get_step(),
+                   state.max_step, -state.max_score)
+
+    def copy(self) -> "PlayoutBoardAbalone":
+        return PlayoutBoardAbalone(bytearray(self.cells), self.to_move, list(self.lost), self.step,
+                                   self.max_step, self.max_lost)
+
+    def push_code(self, cell: int, direction: int) -> int:
+        """
+        Check the move of the marble chain starting at `cell` (a marble of the player to move).
+
+        Returns:
+            int: 0 if the move is illegal, else own marbles | opponent marbles << 2
+        """
+        cells = self.cells
+        me = self.to_move
+        own = 1
+        opponent = 0
+        for next_cell in RAYS[cell][direction]:
+            content = cells[next_cell]
+            if content == EMPTY:
+                break
+            if content == me:
+                if opponent:
+                    return 0
+                own += 1
+                if own > MAX_MARBLES_MOVED:
+                    return 0
+            else:
+                opponent += 1
+                if opponent >= own:
+                    return 0
+        return own | opponent << 2
+
+    def legal_moves(self) -> array:
+        """
+        Every legal move of the player to move.
+
+        Returns:
+            array[int]: encoded moves
+        """
+        moves = array('H')
+        cells = self.cells
+        me = self.to_move
+        for cell in range(N_CELLS):
+            if cells[cell] == me:
+                for direction in range(N_DIRECTIONS):
+                    code = self.push_code(cell, direction)
+                    if code:
+                        moves.append((cell * N_DIRECTIONS + direction) | code << CODE_SHIFT)
+        return moves
+
+    def random_move(self, rng: random.Random) -> int:
+        """
+        A legal move drawn uniformly, by rejection sampling of move indices (rear cell * 6 + direction).
+        A draw costs a single rng.random call: randrange is several times slower.
+
+        Returns:
+            int: the encoded move, -1 if there is none
+        """
+        cells = self.cells
+        me = self.to_move
+        draw = rng.random
+        for _ in range(256):
+            index = int(draw() * N_MOVES)
+            cell = index // N_DIRECTIONS
+            if cells[cell] == me:
+                code = self.push_code(cell, index - cell * N_DIRECTIONS)
+                if code:
+                    return index | code << CODE_SHIFT
+        moves = self.legal_moves()
+        return rng.choice(moves) if moves else -1
+
+    def make(self, move: int) -> tuple:
+        """
+        Play a legal move in place.
+
+        Returns:
+            tuple: what unmake needs to undo the move
+        """
+        cell, direction = divmod(move & MOVE_INDEX_MASK, N_DIRECTIONS)
+        code = move >> CODE_SHIFT or self.push_code(cell, direction)
+        own = code & 3
+        opponent = code >> 2
+        length = own + opponent
+        ray = RAYS[cell][direction]
+        cells = self.cells
+        me = self.to_move
+        front = 3 - me if opponent else me
+
+        cells[cell] = EMPTY
+        if opponent:
+            cells[ray[own - 1]] = me
+        if length - 1 < len(ray):
+            cells[ray[length - 1]] = front
+            fallen = EMPTY
+        else:
+            self.lost[front] += 1
+            fallen = front
+
+        self.to_move = 3 - me
+        self.step += 1
+        return (move, code, fallen)
+
+    def unmake(self, undo: tuple) -> None:
+        """
+        Undo the last move played with make.
+        """
+        move, code, fallen = undo
+        cell, direction = divmod(move & MOVE_INDEX_MASK, N_DIRECTIONS)
+        own = code & 3
+        opponent = code >> 2
+        length = own + opponent
+        ray = RAYS[cell][direction]
+        cells = self.cells
+        me = 3 - self.to_move
+
+        cells[cell] = me
+        if opponent:
+            cells[ray[own - 1]] = 3 - me
+        if fallen:
+            self.lost[fallen] -= 1
+        else:
+            cells[ray[length - 1]] = EMPTY
+
+        self.to_move = me
+        self.step -= 1
+
+    def changes(self, undo: tuple) -> List[Tuple[int, int, int]]:
+        """
+        Cells changed by the move just played with make, as (cell, old content, new content).
+        """
+        move, code, fallen = undo
+        cell, direction = divmod(move & MOVE_INDEX_MASK, N_DIRECTIONS)
+        own = code & 3
+        opponent = code >> 2
+        ray = RAYS[cell][direction]
+        me = 3 - self.to_move
+
+        changes = [(cell, me, EMPTY)]
+        if opponent:
+            changes.append((ray[own - 1], 3 - me, me))
+        if not fallen:
+            changes.append((ray[own + opponent - 1], EMPTY, 3 - me if opponent else me))
+        return changes
+
+    def is_done(self) -> bool:
+        return self.step >= self.max_step or self.lost[WHITE] >= self.max_lost or self.lost[BLACK] >= self.max_lost
+
+    def result(self) -> float:
+        """
+        Outcome for White if the game stopped now: 1 for a win, 0 for a loss, 0.5 for a draw.
+        As in MasterAbalone.compute_winner, the player who lost fewer marbles wins, then the
+        player whose marbles are closer to the center.
+        """
+        if self.lost[WHITE] != self.lost[BLACK]:
+            return 1.0 if self.lost[WHITE] < self.lost[BLACK] else 0.0
+        distance = 0.0
+        cells = self.cells
+        for cell in range(N_CELLS):
+            if cells[cell] == WHITE:
+                distance += CENTER_DISTANCE[cell]
+            elif cells[cell] == BLACK:
+                distance -= CENTER_DISTANCE[cell]
+        if distance == 0:
+            return 0.5
+        return 1.0 if distance < 0 else 0.0
+
+    def playout(self, rng: random.Random, max_plies: int) -> float:
+        """
+        Play random moves in place until the game ends or `max_plies` moves were played.
+
+        Returns:
+            float: the outcome for White at the end of the playout (see result)
+        """
+        lost = self.lost
+        max_step = self.max_step
+        max_lost = self.max_lost
+        random_move = self.random_move
+        make = self.make
+        for _ in range(max_plies):
+            # is_done, inlined
+            if self.step >= max_step or lost[WHITE] >= max_lost or lost[BLACK] >= max_lost:
+                break
+            move = random_move(rng)
+            if move == -1:
+                break
+            make(move)
+        return self.result()
+
+    def light_action(self, move: int) -> dict:
+        """
+        Light action ({'from', 'to'}) of a move, for GameStateAbalone.convert_light_action_to_action.
+        """
+        return light_action(move)
@@ -0,0 +1,215 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Pondering: searching on the opponent's clock.
+
+After MyPlayer returns a move, a persistent background process searches our best
+answer to each opponent reply, most likely reply first (the one our evaluation
+likes least). Answers are streamed back as light actions keyed by position. When
+our turn comes, the search is stopped: if the actual position was answered, the
+answer is played instantly; if it was being searched, the heuristic values computed
+so far are imported into our transposition table so the search starts warm.
+
+Game states are not sent between processes (their players hold whole transposition
+tables): positions travel as plain snapshots and are rebuilt with the worker's own players.
+"""
+import multiprocessing
+import queue
+import traceback
+from typing import List, Optional, Tuple
+
+from seahorse.game.game_state import GameState
+
+from .replay_abalone import board_types, find_light_action, restore, snapshot
+from .search_control_abalone import SearchControlAbalone, SearchStopped
+from .transposition_table_abalone import compact_board_grid
+
+PIECE_TYPES = ("W", "B")
+
+
+def position_key(state: GameState) -> str:
+    """
+    Identify a position independently of player objects: next piece type and compact board grid.
+    """
+    return state.next_player.get_piece_type() + compact_board_grid(state)
+
+
+def ponder_worker(piece_type: str, configuration: dict, tasks, messages, stop_event) -> None:
+    """
+    Entry point of the pondering process. The pondering player runs the search of the
+    player it ponders for, set up from its search configuration (see MyPlayer.search_configuration).
+
+    Protocol (tasks from the main process, messages to it):
+        ("ponder", snapshot)  -> ("result", position key, light action) for each answered reply
+        ("stop", position key) -> ("entries", position key, [(table key, value)])
+                                  if that position was being searched, then ("idle",)
+        ("quit",)
+    An exception of the search is sent as ("error", traceback) and the process waits for the
+    next stop; an exception while setting up the player is sent the same way, then the process exits.
+    """
+    from my_player import MyPlayer
+
+    class PonderingPlayer(MyPlayer):
+        """
+        MyPlayer whose evaluations are recorded for export.
+        """
+
+        def evaluate_state(self, state: GameState, node: list = None) -> float:
+            state_hash = self.transposition_table.state_key(state)
+            state_value = self.transposition_table.retrieve_hashed_value(state_hash)
+            if state_value is None:
+                state_value = self.compute_state_heuristic(state, node)
+                self.transposition_table.store_hashed_value(state_hash, state_value)
+                self.new_entries.append((state_hash, state_value))
+            return state_value
+
+    try:
+        players = {piece_type: PonderingPlayer(piece_type, name="ponder_" + piece_type) for piece_type in PIECE_TYPES}
+        ponderer = players[piece_type]
+        ponderer.configure_search(configuration)
+    except Exception:
+        messages.put(("error", traceback.format_exc()))
+        return
+
+    while True:
+        task = tasks.get()
+        if task[0] == "quit":
+            return
+        if task[0] == "stop":
+            messages.put(("idle",))
+            continue
+
+        interrupted = None
+        ponderer.transposition_table.new_generation()
+        state = restore(task[1], players)
+        ponderer.new_entries = []
+        try:
+            replies = [action.get_next_game_state() for action in state.generate_possible_actions()]
+            replies.sort(key=ponderer.evaluate_state)
+            for reply in replies:
+                if stop_event.is_set():
+                    break
+                if reply.is_done():
+                    continue
+                key = position_key(reply)
+                ponderer.new_entries = []
+                interrupted = key
+                # No deadline: the search runs to full depth unless the main process stops it
+                best_action = ponderer.alpha_beta(reply, SearchControlAbalone(stop_event=stop_event))
+                interrupted = None
+                if best_action is not None:
+                    data, _ = find_light_action(reply, board_types(best_action.get_next_game_state()))
+                    messages.put(("result", key, data))
+        except SearchStopped:
+            pass
+        except Exception:
+            interrupted = None
+            messages.put(("error", traceback.format_exc()))
+
+        stop = tasks.get()
+        if stop[0] == "quit":
+            return
+        if interrupted is not None and interrupted == stop[1]:
+            messages.put(("entries", interrupted, ponderer.new_entries))
+        messages.put(("idle",))
+
+
+class PondererAbalone():
+    """
+    Handle on the pondering process of a player.
+
+    Attributes:
+        process    (Process) : the persistent pondering process, searching with the player's configuration
+        tasks      (Queue)   : tasks sent to the process
+        messages   (Queue)   : results streamed back by the process
+        stop_event (Event)   : set to interrupt the current search
+        busy       (bool)    : whether a ponder task is running
+        timeout    (float)   : seconds to wait for the process to acknowledge a stop
+    """
+
+    def __init__(self, piece_type: str, configuration: dict, timeout: float = 5.0) -> None:
+        context = multiprocessing.get_context("spawn")
+        self.tasks = context.Queue()
+        self.messages = context.Queue()
+        self.stop_event = context.Event()
+        self.process = context.Process(target=ponder_worker, daemon=True,
+                                       args=(piece_type, configuration, self.tasks, self.messages, self.stop_event))
+        self.process.start()
+        self.busy = False
+        self.timeout = timeout
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def start(self, state: GameState) -> None:
+        """
+        Start pondering on a state where the opponent is to move (nothing if the process is dead).
+        """
+        if not self.is_alive():
+            return
+        self.stop_event.clear()
+        self.tasks.put(("ponder", snapshot(state)))
+        self.busy = True
+
+    def stop(self, state: GameState) -> Tuple[Optional[dict], List[tuple]]:
+        """
+        Stop pondering now that the opponent has played, leading to `state`. Errors of the
+        process are reported; if it does not acknowledge the stop in time, it is closed.
+        Check is_alive afterwards: a dead process no longer ponders.
+
+        Returns:
+            (dict, list): the light action found for `state` (None if it was not answered) and the
+                          (transposition table key, value) entries computed while searching it
+        """
+        if not self.busy:
+            return None, []
+        self.busy = False
+        if not self.is_alive():
+            self.report_errors()
+            return None, []
+        key = position_key(state)
+        self.stop_event.set()
+        self.tasks.put(("stop", key))
+
+        answer, entries = None, []
+        while True:
+            try:
+                message = self.messages.get(timeout=self.timeout)
+            except queue.Empty:
+                print("Pondering process did not stop within", self.timeout, "s, closing it.")
+                self.close()
+                break
+            if message[0] == "idle":
+                break
+            if message[0] == "error":
+                print("Pondering failed:", message[1])
+            if message[0] == "result" and message[1] == key:
+                answer = message[2]
+            elif message[0] == "entries" and message[1] == key:
+                entries = message[2]
+        return answer, entries
+
+    def report_errors(self) -> None:
+        """
+        Report the errors sent by the process before it exited.
+        """
+        while True:
+            try:
+                message = self.messages.get(timeout=0.1)
+            except queue.Empty:
+                return
+            if message[0] == "error":
+                print("Pondering failed:", message[1])
+
+    def close(self) -> None:
+        """
+        Stop the pondering process.
+        """
+        if self.process.is_alive():
+            self.stop_event.set()
+            self.tasks.put(("quit",))
+            self.process.join(self.timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.busy = False
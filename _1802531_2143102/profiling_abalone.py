@@ -0,0 +1,103 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Profiling of a player over a whole game.
+
+cProfile is enabled only while the player's compute_action runs, so neither the game
+master, the seahorse proxies nor the GUI appear in the profile, and the statistics are
+aggregated across all the moves of the game. The report starts with the functions of
+the hot path (successor generation, board accessors, transposition table hashing and
+the heuristic), then lists the most expensive functions by cumulative time.
+
+Usage (see main_abalone.py):
+    python main_abalone.py -t local -g --profile profile.txt my_player.py random_player_abalone.py
+    (add --profile-player 2 to profile the second player instead)
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+from typing import List
+
+from seahorse.player.player import Player
+
+# Functions of the hot path, by name (methods included), listed first in the report
+HOT_PATH_FUNCTIONS = ("generator", "generate_possible_actions", "detect_conflict", "get_neighbours", "get_grid",
+                      "__compute_hash", "compute_state_heuristic", "evaluate_state")
+# Modules whose functions are all part of the heuristic
+HEURISTIC_MODULES = ("evaluator_abalone.py", "ntuple_abalone.py")
+
+
+class ComputeActionProfilerAbalone():
+    """
+    cProfile session shared by the compute_action calls of the players it is attached to.
+
+    Attributes:
+        profile (cProfile.Profile) : the profiler, enabled during compute_action only
+        n_moves (int)              : number of compute_action calls profiled
+        elapsed (float)            : wall-clock time spent in compute_action, in (s)
+    """
+
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+        self.n_moves = 0
+        self.elapsed = 0.0
+
+    def attach(self, player: Player) -> None:
+        """
+        Profile the compute_action calls of a player (its method is shadowed by a profiled wrapper).
+        """
+        compute_action = player.compute_action
+
+        def profiled_compute_action(*args, **kwargs):
+            begin = time.perf_counter()
+            self.profile.enable()
+            try:
+                return compute_action(*args, **kwargs)
+            finally:
+                self.profile.disable()
+                self.elapsed += time.perf_counter() - begin
+                self.n_moves += 1
+
+        player.compute_action = profiled_compute_action
+
+    def hot_path(self) -> List[tuple]:
+        """
+        Statistics of the hot path functions, most expensive first.
+
+        Returns:
+            list[tuple]: (function, calls, total time, cumulative time) in (s)
+        """
+        stats = pstats.Stats(self.profile)
+        entries = []
+        for (filename, line, name), (_, n_calls, total_time, cumulative_time, _) in stats.stats.items():
+            if name in HOT_PATH_FUNCTIONS or os.path.basename(filename) in HEURISTIC_MODULES:
+                entries.append((f"{os.path.basename(filename)}:{line}({name})", n_calls, total_time, cumulative_time))
+        entries.sort(key=lambda entry: entry[2], reverse=True)
+        return entries
+
+    def report(self, limit: int = 40) -> str:
+        """
+        Text report: hot path first, then the `limit` functions of largest cumulative time.
+        """
+        lines = [f"Profiled moves: {self.n_moves}, time in compute_action: {self.elapsed:.3f} s", "",
+                 "Hot path (sorted by own time):",
+                 f"{'calls':>10} {'own (s)':>10} {'own %':>7} {'cumul (s)':>10}  function"]
+        for function, n_calls, total_time, cumulative_time in self.hot_path():
+            share = 100.0 * total_time / self.elapsed if self.elapsed else 0.0
+            lines.append(f"{n_calls:>10} {total_time:>10.3f} {share:>6.1f}% {cumulative_time:>10.3f}  {function}")
+
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).strip_dirs().sort_stats("cumulative").print_stats(limit)
+        lines += ["", stream.getvalue()]
+        return "\n".join(lines)
+
+    def save(self, path: str) -> None:
+        """
+        Write the text report to `path` and the raw statistics (for pstats or snakeviz) next to it, as .prof.
+        """
+        with open(path, "w") as report_file:
+            report_file.write(self.report())
+        self.profile.dump_stats(os.path.splitext(path)[0] + ".prof")
@@ -0,0 +1,80 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Helpers to describe game states without player objects, and to recover the light
+action ({'from', 'to'}) played between two boards.
+"""
+from typing import Dict, Tuple
+
+from board_abalone import BoardAbalone
+from game_state_abalone import GameStateAbalone
+from player_abalone import PlayerAbalone
+from seahorse.game.game_layout.board import Piece
+from seahorse.game.game_state import GameState
+
+BOARD_DIMENSIONS = [17, 9]
+DIRECTIONS = [(-1, -1), (1, -1), (-1, 1), (1, 1), (2, 0), (-2, 0)]
+
+
+def board_types(state: GameState) -> Dict[Tuple[int, int], str]:
+    """
+    Extract a {position: piece_type} mapping from a game state.
+    """
+    return {position: piece.get_type() for position, piece in state.get_rep().get_env().items()}
+
+
+def find_light_action(state: GameStateAbalone, next_board: Dict[Tuple[int, int], str]):
+    """
+    Find the light action leading from a state to the given board, and replay it.
+
+    The rear marble of the moved line is the only cell left empty by the mover,
+    so only its six directions need to be tried.
+
+    Returns:
+        (dict, Action): the light action and the replayed action
+
+    Raises:
+        ValueError: if no legal move leads to the given board
+    """
+    mover = state.next_player.get_piece_type()
+    current_board = board_types(state)
+    vacated = [position for position, piece_type in current_board.items()
+               if piece_type == mover and position not in next_board]
+    for src in vacated:
+        for n_i, n_j in DIRECTIONS:
+            data = {'from': src, 'to': (src[0] + n_i, src[1] + n_j)}
+            action = state.convert_light_action_to_action(data)
+            if action is not None and board_types(action.get_next_game_state()) == next_board:
+                return data, action
+    raise ValueError("no legal move leads to the recorded board at step " + str(state.get_step()))
+
+
+def snapshot(state: GameState) -> tuple:
+    """
+    Picklable description of a game state, free of player objects.
+
+    Returns:
+        tuple: ({position: piece type}, {piece type: score}, step, next piece type)
+    """
+    player_types = {player.get_id(): player.get_piece_type() for player in state.players}
+    return (board_types(state),
+            {player_types[player_id]: score for player_id, score in state.scores.items()},
+            state.get_step(),
+            state.next_player.get_piece_type())
+
+
+def restore(state_snapshot: tuple, players: Dict[str, PlayerAbalone]) -> GameStateAbalone:
+    """
+    Rebuild a game state from a snapshot, owned by the given players (one per piece type).
+    """
+    board, scores, step, next_type = state_snapshot
+    pieces = {piece_type: Piece(piece_type=piece_type, owner=player) for piece_type, player in players.items()}
+    env = {position: pieces[piece_type] for position, piece_type in board.items()}
+    return GameStateAbalone(
+        scores={players[piece_type].get_id(): score for piece_type, score in scores.items()},
+        next_player=players[next_type],
+        players=[players["W"], players["B"]],
+        rep=BoardAbalone(env=env, dim=BOARD_DIMENSIONS),
+        step=step,
+    )
@@ -0,0 +1,105 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Cooperative control of a search: wall-clock deadline, node budget and stop signal.
+
+The search counts its nodes with count_node; every `check_every` nodes (and exactly
+when the node budget is reached) the limits are checked and SearchStopped is raised
+if one of them is hit, unwinding the search. Unlike util.TimeoutFunction (SIGALRM),
+this works in any thread or process, nests, and has the resolution of time.monotonic.
+
+A node budget makes a search reproducible regardless of the machine's speed, for
+benchmarks; a deadline keeps it within the game clock.
+"""
+import time
+
+
+class SearchStopped(Exception):
+    """
+    Raised inside a search when its deadline, node budget or stop signal is reached.
+    """
+    pass
+
+
+class SearchControlAbalone():
+    """
+    Limits of a search, checked cheaply every few nodes.
+
+    Attributes:
+        deadline    (float) : time.monotonic() at which the search stops, None for no deadline
+        max_nodes   (int)   : number of nodes at which the search stops, None for no budget
+        stop_event  (Event) : threading or multiprocessing event stopping the search when set, None if unused
+        check_every (int)   : number of nodes between two checks of the deadline and stop signal
+        nodes       (int)   : number of nodes counted so far
+        stopped     (bool)  : whether a limit was reached or stop was called
+    """
+
+    def __init__(self, time_budget: float = None, max_nodes: int = None, stop_event=None,
+                 check_every: int = 256) -> None:
+        """
+        Args:
+            time_budget (float, optional): seconds from now before the search stops
+            max_nodes (int, optional): number of nodes before the search stops
+            stop_event (Event, optional): event stopping the search when set
+            check_every (int, optional): number of nodes between two checks
+        """
+        self.deadline = None if time_budget is None else time.monotonic() + time_budget
+        self.max_nodes = max_nodes
+        self.stop_event = stop_event
+        self.check_every = check_every
+        self.nodes = 0
+        self.stopped = False
+        self.next_check = self.check_every if max_nodes is None else min(self.check_every, max_nodes)
+
+    def is_bounded(self) -> bool:
+        """
+        Whether the search can be cut short by a deadline or a node budget (the caller then
+        needs a result from a shallower search, see MyPlayer.alpha_beta).
+        """
+        return self.deadline is not None or self.max_nodes is not None
+
+    def count_node(self) -> None:
+        """
+        Count a node of the search.
+
+        Raises:
+            SearchStopped: if a limit is reached
+        """
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check()
+
+    def check(self) -> None:
+        """
+        Check every limit now.
+
+        Raises:
+            SearchStopped: if a limit is reached
+        """
+        self.next_check = self.nodes + self.check_every
+        if self.max_nodes is not None:
+            self.next_check = min(self.next_check, self.max_nodes)
+            if self.nodes >= self.max_nodes:
+                self.stopped = True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.stopped = True
+        if self.stop_event is not None and self.stop_event.is_set():
+            self.stopped = True
+        if self.stopped:
+            raise SearchStopped()
+
+    def stop(self) -> None:
+        """
+        Stop the search at its next check (from another thread, for instance).
+        """
+        self.stopped = True
+        self.next_check = self.nodes + 1
+
+    def remaining_time(self) -> float:
+        """
+        Seconds left before the deadline, infinite if there is none.
+        """
+        if self.deadline is None:
+            return float('inf')
+        return max(0.0, self.deadline - time.monotonic())
@@ -0,0 +1,79 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Per-move search statistics, exported as JSON lines.
+
+Counters (nodes, evaluations, cutoffs, transposition table probes...) are always kept,
+being plain integer increments. Timers (move generation, evaluation, hashing) cost two
+clock reads per measured call, so MyPlayer only runs them when a sink is configured.
+Each line of the sink is the JSON record of one move, e.g. to compare the statistics of
+two versions of the engine on the same games:
+
+    {"player": "W", "step": 12, "time": 3.1, "nodes": 12642, "completed_depth": 3, ...}
+"""
+import json
+import sys
+
+SEARCH_COUNTERS = ("nodes", "leaf_evaluations", "heuristic_evaluations", "null_move_tries", "null_move_cutoffs",
+                   "reductions", "re_searches", "completed_depth")
+SEARCH_TIMERS = ("move_generation_time", "evaluation_time", "hashing_time")
+
+
+def new_search_statistics() -> dict:
+    """
+    Statistics of a search, all counters and timers at zero.
+
+    Returns:
+        dict: counter or timer name -> value, and "cutoffs_by_move_index": number of cutoffs
+              produced by the i-th move searched at a node, for each i
+    """
+    statistics = dict.fromkeys(SEARCH_COUNTERS, 0)
+    statistics.update(dict.fromkeys(SEARCH_TIMERS, 0.0))
+    statistics["cutoffs_by_move_index"] = []
+    return statistics
+
+
+def count_cutoff(statistics: dict, index: int) -> None:
+    """
+    Count a cutoff produced by the index-th move searched at a node.
+    """
+    cutoffs = statistics["cutoffs_by_move_index"]
+    if index >= len(cutoffs):
+        cutoffs.extend([0] * (index + 1 - len(cutoffs)))
+    cutoffs[index] += 1
+
+
+def counter_deltas(after: dict, before: dict) -> dict:
+    """
+    Difference of two snapshots of counters, e.g. the transposition table counters during a move.
+    """
+    return {name: value - before.get(name, 0) for name, value in after.items()}
+
+
+class JsonLinesSinkAbalone():
+    """
+    Append-only JSON-lines file receiving one record per move.
+
+    Attributes:
+        path        (str)    : path of the file, "-" for the standard output
+        stats_file  (TextIO) : the file, opened on the first record
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.stats_file = None
+
+    def write(self, record: dict) -> None:
+        """
+        Write a record as one line, flushed at once so that the file can be followed during a game.
+        """
+        if self.stats_file is None:
+            self.stats_file = sys.stdout if self.path == "-" else open(self.path, "a")
+        self.stats_file.write(json.dumps(record) + "\n")
+        self.stats_file.flush()
+
+    def close(self) -> None:
+        if self.stats_file is not None and self.stats_file is not sys.stdout:
+            self.stats_file.close()
+        self.stats_file = None
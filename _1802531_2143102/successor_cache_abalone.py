@@ -0,0 +1,74 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Bounded cache of the successors of expanded states.
+
+MyPlayer.alpha_beta expands states with generate_possible_actions, which unlike
+get_possible_actions does not cache the action set on the state: a parent does not
+retain its successors, so the states alive during a search are those of the lists
+on the current path, in number proportional to the depth times the branching factor.
+
+This cache is the opt-in exception: the successor lists of the most recently
+expanded states are kept, up to a fixed number of states, so that the states searched
+again (by iterative deepening, or from one move to the next) are not expanded twice.
+"""
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+from seahorse.game.game_state import GameState
+
+from .transposition_table_abalone import compact_board_grid
+
+
+def successor_key(state: GameState) -> tuple:
+    """
+    Key of a state's successors: step, scores, player to move and board (unlike transposition
+    table keys, never shared with symmetric positions, whose successors differ).
+    """
+    return (state.get_step(), tuple(sorted(state.scores.items())),
+            state.next_player.get_piece_type() + compact_board_grid(state))
+
+
+class SuccessorCacheAbalone():
+    """
+    Least-recently-used cache of successor lists.
+
+    Attributes:
+        max_entries (int)            : number of states whose successors are kept at most
+        entries     (OrderedDict)    : key -> list of (action, next state), least recently used first
+        counters    (dict[str, int]) : hits, misses and evictions since the cache was created
+    """
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[List[tuple]]:
+        """
+        Successors cached for a key, None on a miss.
+        """
+        transitions = self.entries.get(key)
+        if transitions is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        self.entries.move_to_end(key)
+        return transitions
+
+    def put(self, key: Hashable, transitions: List[tuple]) -> None:
+        """
+        Cache the successors of a state, evicting the least recently used ones if full.
+        """
+        self.entries[key] = transitions
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
@@ -0,0 +1,160 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Symmetries of the hexagonal Abalone board.
+
+The board has 12 symmetries (6 rotations, each with or without a reflection),
+precomputed as permutations of the 61 cells. A position is mapped to the
+representative of its symmetry class by taking the smallest of its 12 transformed
+encodings, optionally also considering the colour-swapped position (with the other
+player to move), so that caches keyed by canonical keys are shared by all the
+symmetric variants of a position.
+"""
+from typing import Dict, List, Tuple
+
+from board_abalone import INITIAL_BOARDS
+from seahorse.game.game_state import GameState
+
+from .board_tables_abalone import CELLS, CELL_INDEX, CENTER, N_CELLS
+
+# Cell contents, independently of the point of view
+EMPTY = 0
+WHITE = 1
+BLACK = 2
+PIECE_CONTENTS = {"W": WHITE, "B": BLACK}
+COLOUR_SWAP = bytes.maketrans(bytes([WHITE, BLACK]), bytes([BLACK, WHITE]))
+
+
+def _to_cube(cell: Tuple[int, int]) -> Tuple[int, int, int]:
+    q = cell[1] - CENTER[1]
+    r = (cell[0] - CENTER[0] - q) // 2
+    return q, r, -q - r
+
+
+def _from_cube(cube: Tuple[int, int, int]) -> Tuple[int, int]:
+    q, r, _ = cube
+    return 2 * r + CENTER[0] + q, q + CENTER[1]
+
+
+def _symmetries() -> tuple:
+    permutations = []
+    for reflect in (False, True):
+        for rotation in range(6):
+            permutation = []
+            for cell in CELLS:
+                x, y, z = _to_cube(cell)
+                if reflect:
+                    y, z = z, y
+                for _ in range(rotation):
+                    x, y, z = -z, -x, -y
+                permutation.append(CELL_INDEX[_from_cube((x, y, z))])
+            permutations.append(tuple(permutation))
+    return tuple(permutations)
+
+# SYMMETRIES[s][cell]: image of `cell` under symmetry s (s = 0 is the identity)
+SYMMETRIES = _symmetries()
+N_SYMMETRIES = len(SYMMETRIES)
+
+# INVERSE_SYMMETRIES[s][cell]: cell whose image under symmetry s is `cell`
+INVERSE_SYMMETRIES = tuple(tuple(symmetry.index(cell) for cell in range(N_CELLS)) for symmetry in SYMMETRIES)
+
+
+def typed_cells_from_env(env: dict) -> bytes:
+    """
+    Encode a board environment as one byte per cell (EMPTY, WHITE or BLACK).
+    """
+    cells = bytearray(N_CELLS)
+    for position, piece in env.items():
+        cells[CELL_INDEX[position]] = PIECE_CONTENTS[piece.get_type()]
+    return bytes(cells)
+
+
+def typed_cells_from_grid(board: List[List[int]]) -> bytes:
+    """
+    Encode a 17x9 board of INITIAL_BOARDS (1 for White, 2 for Black) as one byte per cell.
+    """
+    return bytes(board[i][j] if board[i][j] in (WHITE, BLACK) else EMPTY for i, j in CELLS)
+
+
+def transform(cells: bytes, symmetry: int) -> bytes:
+    """
+    Apply a symmetry to an encoded board.
+    """
+    inverse = INVERSE_SYMMETRIES[symmetry]
+    return bytes(cells[inverse[cell]] for cell in range(N_CELLS))
+
+
+def canonical_form(cells: bytes, next_piece_type: str, colour_swap: bool = False) -> Tuple[bytes, int, bool]:
+    """
+    Representative of the symmetry class of a position.
+
+    Args:
+        cells (bytes): encoded board (see typed_cells_from_env)
+        next_piece_type (str): piece type of the player to move
+        colour_swap (bool): whether the colour-swapped position (other player to move) is
+                            considered equivalent. Values from a fixed player's point of view
+                            then change sign when `swapped` is True.
+
+    Returns:
+        (bytes, int, bool): the canonical key, the symmetry mapping the position to it, and
+                            whether the colours were swapped
+    """
+    candidates = [(cells, next_piece_type, False)]
+    if colour_swap:
+        candidates.append((cells.translate(COLOUR_SWAP), "B" if next_piece_type == "W" else "W", True))
+
+    best = None
+    for board, piece_type, swapped in candidates:
+        prefix = piece_type.encode()
+        for symmetry in range(N_SYMMETRIES):
+            key = prefix + transform(board, symmetry)
+            if best is None or key < best[0]:
+                best = (key, symmetry, swapped)
+    return best
+
+
+def canonical_key(state: GameState, colour_swap: bool = False) -> bytes:
+    """
+    Canonical key of a game state, shared by all its symmetric variants.
+    """
+    cells = typed_cells_from_env(state.get_rep().get_env())
+    return canonical_form(cells, state.next_player.get_piece_type(), colour_swap)[0]
+
+
+def transform_position(position: Tuple[int, int], symmetry: int) -> Tuple[int, int]:
+    """
+    Image of a board position under a symmetry.
+    """
+    return CELLS[SYMMETRIES[symmetry][CELL_INDEX[position]]]
+
+
+def transform_light_action(data: dict, symmetry: int) -> dict:
+    """
+    Image of a light action ({'from', 'to'}) under a symmetry.
+    """
+    return {'from': transform_position(tuple(data['from']), symmetry),
+            'to': transform_position(tuple(data['to']), symmetry)}
+
+
+def inverse_symmetry(symmetry: int) -> int:
+    """
+    Index of the symmetry undoing `symmetry`.
+    """
+    return SYMMETRIES.index(INVERSE_SYMMETRIES[symmetry])
+
+
+def find_symmetry(cells: bytes, reference: bytes) -> int:
+    """
+    Find a symmetry mapping an encoded board onto a reference board.
+
+    Returns:
+        int: the symmetry index, None if the boards are not symmetric
+    """
+    for symmetry in range(N_SYMMETRIES):
+        if transform(cells, symmetry) == reference:
+            return symmetry
+    return None
+
+# Encoded starting boards of each configuration
+INITIAL_CELLS: Dict[str, bytes] = {config: typed_cells_from_grid(board) for config, board in INITIAL_BOARDS.items()}
@@ -0,0 +1,205 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Temporal-difference training of the n-tuple evaluator by headless self-play.
+
+Worker processes play games against each other on PlayoutBoardAbalone (the rules of
+GameStateAbalone, without Action/GameState objects, MasterAbalone or the GUI), each
+move chosen epsilon-greedily by a 1-ply search on the current weights. The central
+learner receives the positions of each game and applies TD(0) updates move by move,
+for each player's point of view: the value of a position is moved towards the value
+of the next one, and the value of the last one towards the final outcome. Weights are
+sent to the workers with every game and checkpointed to disk periodically.
+
+Usage:
+    python -m _1802531_2143102.td_training_abalone -g 20000 -w 8
+"""
+import argparse
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from board_abalone import INITIAL_BOARDS
+from .board_tables_abalone import OPPONENT, OWN
+from .ntuple_abalone import NTUPLE_WEIGHTS_PATH, NTupleEvaluatorAbalone
+from .playout_board_abalone import PlayoutBoardAbalone
+from .symmetry_abalone import BLACK, WHITE, typed_cells_from_grid
+
+# Value of a won game, on the scale of the score difference (one marble = 1)
+WIN_VALUE = 6.0
+
+# RELATIVE_CONTENTS[colour]: translation of a colour board to EMPTY/OWN/OPPONENT from that colour's point of view
+RELATIVE_CONTENTS = {WHITE: bytes.maketrans(bytes([WHITE, BLACK]), bytes([OWN, OPPONENT])),
+                     BLACK: bytes.maketrans(bytes([WHITE, BLACK]), bytes([OPPONENT, OWN]))}
+
+
+def self_play_game(weights: bytes, score_weight: float, epsilon: float, seed: int) -> Tuple[List[tuple], float]:
+    """
+    Play a game of the evaluator against itself.
+
+    Args:
+        weights (bytes): weight tables of the evaluator (array('d') bytes)
+        score_weight (float): weight of the score difference
+        epsilon (float): probability of playing a random move instead of the best one
+        seed (int): random seed, also selecting the starting board
+
+    Returns:
+        (list[tuple], float): (cells, marbles lost by White, marbles lost by Black) after
+                              each move from the start, and the outcome for White (1, 0.5 or 0)
+    """
+    rng = random.Random(seed)
+    table = array('d')
+    table.frombytes(weights)
+    evaluator = NTupleEvaluatorAbalone(table, score_weight)
+
+    config = ("classic", "alien")[seed % 2]
+    board = PlayoutBoardAbalone(bytearray(typed_cells_from_grid(INITIAL_BOARDS[config])), WHITE, [0, 0, 0], 0)
+    accumulators = {colour: evaluator.accumulate(bytes(board.cells).translate(RELATIVE_CONTENTS[colour]))
+                    for colour in (WHITE, BLACK)}
+    positions = [(bytes(board.cells), 0, 0)]
+
+    while not board.is_done():
+        me = board.to_move
+        moves = board.legal_moves()
+        if not moves:
+            break
+        if rng.random() < epsilon:
+            best_move = rng.choice(moves)
+        else:
+            # Afterstate values from the mover's point of view, updated incrementally
+            accumulator = accumulators[me]
+            best_move, best_value = moves[0], float('-inf')
+            for move in moves:
+                undo = board.make(move)
+                changes = changed_contents(board, undo, me)
+                evaluator.make(accumulator, changes)
+                value = evaluator.value(accumulator, (-board.lost[me], -board.lost[3 - me]))
+                evaluator.unmake(accumulator, changes)
+                board.unmake(undo)
+                if value > best_value:
+                    best_move, best_value = move, value
+
+        undo = board.make(best_move)
+        for colour in (WHITE, BLACK):
+            evaluator.make(accumulators[colour], changed_contents(board, undo, colour))
+        positions.append((bytes(board.cells), board.lost[WHITE], board.lost[BLACK]))
+
+    return positions, board.result()
+
+
+def changed_contents(board: PlayoutBoardAbalone, undo: tuple, colour: int) -> List[Tuple[int, int, int]]:
+    """
+    Changes of the move just played, as (cell, old, new) EMPTY/OWN/OPPONENT contents from `colour`'s point of view.
+    """
+    translation = RELATIVE_CONTENTS[colour]
+    return [(cell, translation[old], translation[new]) for cell, old, new in board.changes(undo)]
+
+
+def td_update(evaluator: NTupleEvaluatorAbalone, positions: List[tuple], white_result: float, alpha: float) -> float:
+    """
+    Apply TD(0) updates along a game, for both players' points of view.
+
+    Returns:
+        float: mean absolute TD error
+    """
+    weights = evaluator.weights
+    total_error = 0.0
+    n_updates = 0
+    for colour in (WHITE, BLACK):
+        translation = RELATIVE_CONTENTS[colour]
+        outcome = (2.0 * white_result - 1.0) * WIN_VALUE * (1 if colour == WHITE else -1)
+
+        def value(indices: array, position: tuple) -> float:
+            lost = {WHITE: position[1], BLACK: position[2]}
+            return sum(weights[index] for index in indices) + \
+                   evaluator.score_weight * (lost[3 - colour] - lost[colour])
+
+        cells = positions[0][0].translate(translation)
+        indices = evaluator.indices(cells)
+        for t in range(len(positions)):
+            current_value = value(indices, positions[t])
+            if t + 1 < len(positions):
+                next_cells = positions[t + 1][0].translate(translation)
+                next_indices = array('i', indices)
+                accumulator = [next_indices, 0.0]
+                evaluator.make(accumulator, [(cell, old, new) for cell, (old, new) in enumerate(zip(cells, next_cells))
+                                             if old != new])
+                target = value(next_indices, positions[t + 1])
+            else:
+                target = outcome
+
+            error = target - current_value
+            step = alpha * error
+            for index in indices:
+                weights[index] += step
+            total_error += abs(error)
+            n_updates += 1
+
+            if t + 1 < len(positions):
+                cells, indices = next_cells, next_indices
+    return total_error / max(1, n_updates)
+
+
+def train(n_games: int, workers: int = os.cpu_count(), alpha: float = 0.001, epsilon: float = 0.1,
+          weights_path: str = NTUPLE_WEIGHTS_PATH, checkpoint_every: int = 500, seed: int = 0,
+          max_pending: int = None) -> NTupleEvaluatorAbalone:
+    """
+    Train the n-tuple evaluator, starting from the weights file if present.
+
+    Games are produced by `workers` processes, each with the latest weights at submission
+    time, while the learner updates the weights from the finished games.
+
+    Returns:
+        NTupleEvaluatorAbalone: the trained evaluator (also saved to weights_path)
+    """
+    evaluator = NTupleEvaluatorAbalone.load(weights_path)
+    max_pending = max_pending or 2 * max(1, workers)
+    begin = time.time()
+    errors = []
+
+    def learn(game: int, positions: List[tuple], white_result: float) -> None:
+        errors.append(td_update(evaluator, positions, white_result, alpha))
+        if (game + 1) % checkpoint_every == 0 or game + 1 == n_games:
+            evaluator.save(weights_path)
+            elapsed = time.time() - begin
+            print("Games: ", game + 1, " games/hour: ", 3600 * (game + 1) / elapsed,
+                  " mean TD error: ", sum(errors) / len(errors))
+            errors.clear()
+
+    if workers <= 1:
+        for game in range(n_games):
+            learn(game, *self_play_game(evaluator.weights.tobytes(), evaluator.score_weight, epsilon, seed + game))
+        return evaluator
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        finished = 0
+        for game in range(n_games):
+            pending.append(executor.submit(self_play_game, evaluator.weights.tobytes(), evaluator.score_weight,
+                                           epsilon, seed + game))
+            if len(pending) >= max_pending:
+                learn(finished, *pending.pop(0).result())
+                finished += 1
+        for future in pending:
+            learn(finished, *future.result())
+            finished += 1
+    return evaluator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="td_training_abalone.py",
+                                     description="Train the n-tuple evaluator of MyPlayer by self-play.")
+    parser.add_argument("-g", "--games", type=int, default=10000, help="Number of self-play games")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("-a", "--alpha", type=float, default=0.001, help="Learning rate")
+    parser.add_argument("-e", "--epsilon", type=float, default=0.1, help="Probability of exploratory moves")
+    parser.add_argument("-o", "--output", default=NTUPLE_WEIGHTS_PATH, help="Weights file, resumed from if present")
+    parser.add_argument("-c", "--checkpoint-every", type=int, default=500, help="Games between checkpoints")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Random seed of the first game")
+    args = parser.parse_args()
+
+    train(args.games, args.workers, args.alpha, args.epsilon, args.output, args.checkpoint_every, args.seed)
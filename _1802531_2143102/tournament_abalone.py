@@ -0,0 +1,359 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Round-robin and Swiss tournaments between player modules, with Elo ratings.
+
+Players are modules defining MyPlayer, loaded like main_abalone.py loads them. Two
+players meet in an encounter of four games: both board configurations (classic and
+alien), each with both colours. Games are played headlessly and in parallel by a
+MultiGameHostAbalone, and each finished game is appended at once to the results file
+(JSON lines), so that an interrupted tournament resumes where it stopped: the games
+already in the file are not played again.
+
+Round robin: every pair of players meets once per cycle. Swiss: each round pairs
+players of close scores who have not met yet, the leader first; with an odd number of
+players, the lowest ranked player without a bye sits out and scores half the points of
+an encounter. The pairings of a round depend only on the results of the previous ones,
+so they are the same when the tournament is resumed.
+
+Ratings are the maximum-likelihood Elo ratings of the Bradley-Terry model (a draw counts
+as half a win), with the advantage of White fitted alongside. As in BayesElo, each player
+is given a few virtual draws against a player rated 0, which anchors the scale and keeps
+the ratings of unbeaten players finite. Ratings are relative to the average player, with
+95% intervals from the curvature of the likelihood.
+
+Usage:
+    python -m _1802531_2143102.tournament_abalone my_player.py mcts_player.py random_player_abalone.py -r results.jsonl -w 8
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+from os.path import basename, splitext
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .multi_game_host_abalone import DEFAULT_TIME_LIMIT, HostedMatchAbalone, MultiGameHostAbalone
+
+CONFIGS = ("classic", "alien")
+GAMES_PER_ENCOUNTER = 2 * len(CONFIGS)
+# Elo points per natural logarithm of the odds
+ELO_SCALE = 400.0 / math.log(10.0)
+# Virtual draws of each player against a player rated 0 (and of White against an equal Black)
+PRIOR_DRAWS = 2.0
+# Half-width of a 95% interval, in standard deviations
+INTERVAL_Z = 1.96
+
+
+def player_paths(paths: List[str]) -> Dict[str, str]:
+    """
+    Map the name of each player (its module name) to its module.
+
+    Raises:
+        ValueError: if two players have the same module name, or a module does not exist
+    """
+    players = {}
+    for path in paths:
+        name = splitext(basename(path))[0]
+        if name in players:
+            raise ValueError(f"two players are named {name!r}: {players[name]} and {path}")
+        if not os.path.isfile(path):
+            raise ValueError(f"no player module {path}")
+        players[name] = path
+    return players
+
+
+def encounter_games(round_number: int, player_a: str, player_b: str) -> List[dict]:
+    """
+    Games of an encounter: both configurations, each with both colours.
+    """
+    games = []
+    for config in CONFIGS:
+        for white, black in ((player_a, player_b), (player_b, player_a)):
+            games.append({"game": f"{round_number}:{white}:{black}:{config}", "round": round_number,
+                          "white": white, "black": black, "config": config})
+    return games
+
+
+def round_robin_schedule(names: List[str], cycles: int = 1) -> List[dict]:
+    """
+    Games of a round robin: every pair of players meets once per cycle (one round per cycle).
+    """
+    games = []
+    for cycle in range(cycles):
+        for player_a, player_b in itertools.combinations(names, 2):
+            games += encounter_games(cycle, player_a, player_b)
+    return games
+
+
+def read_results(path: str) -> Dict[str, dict]:
+    """
+    Results already in a results file, by game. A line cut short by an interruption is ignored.
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, "r") as results_file:
+        for line in results_file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result["game"]] = result
+    return results
+
+
+def end_last_line(path: str) -> None:
+    """
+    Terminate a line cut short by an interruption, so that the next result starts on its own line.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as results_file:
+        results_file.seek(-1, os.SEEK_END)
+        if results_file.read(1) != b"\n":
+            results_file.write(b"\n")
+
+
+def white_points(result: dict) -> float:
+    """
+    Points of White in a game: 1 for a win, 0.5 for a draw (both players winning), 0 for a loss.
+    """
+    winners = result["winners"]
+    if "W" in winners:
+        return 0.5 if "B" in winners else 1.0
+    return 0.0
+
+
+def player_records(names: List[str], results: List[dict]) -> Dict[str, dict]:
+    """
+    Games, wins, draws, losses and points of each player.
+    """
+    records = {name: {"games": 0, "wins": 0, "draws": 0, "losses": 0, "points": 0.0} for name in names}
+    for result in results:
+        points = white_points(result)
+        for name, player_points in ((result["white"], points), (result["black"], 1.0 - points)):
+            record = records[name]
+            record["games"] += 1
+            record["points"] += player_points
+            record["wins" if player_points == 1.0 else "losses" if player_points == 0.0 else "draws"] += 1
+    return records
+
+
+def swiss_pairings(names: List[str], points: Dict[str, float], met: set, had_bye: set) -> Tuple[List[tuple], str]:
+    """
+    Pairings of a Swiss round. Players are ranked by points (then name); the best unpaired
+    player meets the best unpaired player it has not met yet, or the next one if it has met them all.
+
+    Args:
+        names (list[str]): the players
+        points (dict[str, float]): points of each player so far
+        met (set[frozenset]): pairs of players who already met
+        had_bye (set[str]): players who already had a bye
+
+    Returns:
+        (list[tuple], str): the pairs, and the player with a bye (None if the number of players is even)
+    """
+    ranking = sorted(names, key=lambda name: (-points[name], name))
+    bye = None
+    if len(ranking) % 2 == 1:
+        bye = next((name for name in reversed(ranking) if name not in had_bye), ranking[-1])
+        ranking.remove(bye)
+
+    pairs = []
+    while ranking:
+        player = ranking.pop(0)
+        opponent = next((other for other in ranking if frozenset((player, other)) not in met), ranking[0])
+        ranking.remove(opponent)
+        pairs.append((player, opponent))
+    return pairs, bye
+
+
+def compute_ratings(names: List[str], results: List[dict], prior_draws: float = PRIOR_DRAWS) -> dict:
+    """
+    Maximum-likelihood Elo ratings of the players, and advantage of White, by Newton's method.
+
+    Returns:
+        dict: {"ratings": {name: Elo relative to the average player}, "intervals": {name: half-width of the 95% interval},
+               "white_advantage": Elo, "white_advantage_interval": half-width of its 95% interval}
+    """
+    index = {name: k for k, name in enumerate(names)}
+    n_parameters = len(names) + 1
+    # One row per game: +1 for White, -1 for Black, 1 in the last column for the advantage of White
+    rows, scores, weights = [], [], []
+    for result in results:
+        row = np.zeros(n_parameters)
+        row[index[result["white"]]] = 1.0
+        row[index[result["black"]]] = -1.0
+        row[-1] = 1.0
+        rows.append(row)
+        scores.append(white_points(result))
+        weights.append(1.0)
+    # Virtual draws against a player rated 0, with no colour, and between two players of the same rating
+    # (the advantage of White only), so that the advantage stays finite when colours are unbalanced
+    for k in range(n_parameters):
+        row = np.zeros(n_parameters)
+        row[k] = 1.0
+        rows.append(row)
+        scores.append(0.5)
+        weights.append(prior_draws)
+    rows, scores, weights = np.array(rows), np.array(scores), np.array(weights)
+
+    # Parameters in natural units (log-odds)
+    theta = np.zeros(n_parameters)
+    hessian = np.eye(n_parameters)
+    for _ in range(100):
+        expected = 1.0 / (1.0 + np.exp(-(rows @ theta)))
+        gradient = rows.T @ (weights * (scores - expected))
+        hessian = (rows.T * (weights * expected * (1.0 - expected))) @ rows
+        step = np.linalg.solve(hessian, gradient)
+        theta += step
+        if np.max(np.abs(step)) < 1e-9:
+            break
+
+    # Ratings relative to the average player: only differences are measured by the games
+    n_players = len(names)
+    centering = np.eye(n_parameters)
+    centering[:n_players, :n_players] -= 1.0 / n_players
+    theta = centering @ theta
+    covariance = centering @ np.linalg.inv(hessian) @ centering.T
+    deviations = np.sqrt(np.diag(covariance)) * ELO_SCALE
+    return {"ratings": {name: float(theta[k] * ELO_SCALE) for name, k in index.items()},
+            "intervals": {name: float(INTERVAL_Z * deviations[k]) for name, k in index.items()},
+            "white_advantage": float(theta[-1] * ELO_SCALE),
+            "white_advantage_interval": float(INTERVAL_Z * deviations[-1])}
+
+
+def format_ratings(names: List[str], results: List[dict], byes: Dict[str, int] = None) -> str:
+    """
+    Table of the players by rating, with their record.
+    """
+    byes = byes or {}
+    records = player_records(names, results)
+    if not results:
+        return "No game played yet."
+    ratings = compute_ratings(names, results)
+    lines = [f"{'rank':>4}  {'player':<30} {'Elo':>7} {'95%':>6} {'games':>6} {'W':>4} {'D':>4} {'L':>4} {'score':>6}"]
+    for rank, name in enumerate(sorted(names, key=lambda name: -ratings["ratings"][name]), 1):
+        record = records[name]
+        score = 100.0 * record["points"] / record["games"] if record["games"] else 0.0
+        lines.append(f"{rank:>4}  {name:<30} {ratings['ratings'][name]:>7.0f} {ratings['intervals'][name]:>6.0f} "
+                     f"{record['games']:>6} {record['wins']:>4} {record['draws']:>4} {record['losses']:>4} {score:>5.1f}%"
+                     + (f"  ({byes[name]} bye)" if byes.get(name) else ""))
+    lines.append(f"White advantage: {ratings['white_advantage']:.0f} +/- {ratings['white_advantage_interval']:.0f} Elo, "
+                 f"over {len(results)} games")
+    return "\n".join(lines)
+
+
+class TournamentAbalone():
+    """
+    Tournament between player modules, resumable from its results file.
+
+    Attributes:
+        players      (dict[str, str])       : player name -> module
+        results_path (str)                  : results file, one JSON line per game
+        results      (dict[str, dict])      : results of the games played so far, by game
+        host         (MultiGameHostAbalone) : host playing the games
+        time_limit   (float)                : time credit of each player per game in (s)
+        byes         (dict[str, int])       : number of byes of each player (Swiss)
+    """
+
+    def __init__(self, paths: List[str], results_path: str, workers: int = os.cpu_count(),
+                 time_limit: float = DEFAULT_TIME_LIMIT) -> None:
+        self.players = player_paths(paths)
+        if len(self.players) < 2:
+            raise ValueError("a tournament needs at least two players")
+        self.results_path = results_path
+        self.results = read_results(results_path)
+        self.host = MultiGameHostAbalone(workers=workers)
+        self.time_limit = time_limit
+        self.byes = {}
+
+    def played(self, games: List[dict]) -> List[dict]:
+        return [self.results[game["game"]] for game in games if game["game"] in self.results]
+
+    async def play(self, games: List[dict]) -> None:
+        """
+        Play the games of the list not in the results file yet, appending their results as they finish.
+        """
+        specs = {}
+        for game in games:
+            if game["game"] not in self.results:
+                self.host.add_match(self.players[game["white"]], self.players[game["black"]], game["config"],
+                                    time_limit=self.time_limit, match_id=game["game"])
+                specs[game["game"]] = game
+        if not specs:
+            return
+        print(f"{len(specs)} games to play, {len(games) - len(specs)} already played")
+
+        end_last_line(self.results_path)
+        with open(self.results_path, "a") as results_file:
+            def record(match: HostedMatchAbalone) -> None:
+                result = dict(specs[match.match_id])
+                result.update({key: value for key, value in match.result().items() if key not in ("match", "players")})
+                results_file.write(json.dumps(result) + "\n")
+                results_file.flush()
+                self.results[match.match_id] = result
+            await self.host.run(on_done=record)
+
+    async def round_robin(self, cycles: int = 1) -> List[dict]:
+        games = round_robin_schedule(list(self.players), cycles)
+        await self.play(games)
+        return self.played(games)
+
+    async def swiss(self, rounds: int) -> List[dict]:
+        names = list(self.players)
+        points = dict.fromkeys(names, 0.0)
+        met, had_bye = set(), set()
+        games = []
+        for round_number in range(rounds):
+            pairs, bye = swiss_pairings(names, points, met, had_bye)
+            round_games = []
+            for player_a, player_b in pairs:
+                round_games += encounter_games(round_number, player_a, player_b)
+                met.add(frozenset((player_a, player_b)))
+            if bye is not None:
+                had_bye.add(bye)
+                self.byes[bye] = self.byes.get(bye, 0) + 1
+                points[bye] += GAMES_PER_ENCOUNTER / 2
+            print(f"Round {round_number + 1}: " + ", ".join(f"{a} - {b}" for a, b in pairs)
+                  + (f", bye: {bye}" if bye else ""))
+            await self.play(round_games)
+            for result in self.played(round_games):
+                points[result["white"]] += white_points(result)
+                points[result["black"]] += 1.0 - white_points(result)
+            games += round_games
+        return self.played(games)
+
+    def close(self) -> None:
+        self.host.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="tournament_abalone.py",
+                                     description="Play a tournament between Abalone players and rate them.")
+    parser.add_argument("players", nargs="+", help="Player modules (defining MyPlayer)")
+    parser.add_argument("-r", "--results", default="tournament_results.jsonl",
+                        help="Results file, one JSON line per game; an interrupted tournament resumes from it")
+    parser.add_argument("-f", "--format", choices=["round_robin", "swiss"], default="round_robin",
+                        help="Pairing system")
+    parser.add_argument("-n", "--rounds", type=int, default=1,
+                        help="Round robin: number of cycles; Swiss: number of rounds")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("-t", "--time-limit", type=float, default=DEFAULT_TIME_LIMIT,
+                        help="Time credit of each player per game in (s)")
+    args = parser.parse_args()
+
+    tournament = TournamentAbalone(args.players, args.results, args.workers, args.time_limit)
+    try:
+        if args.format == "swiss":
+            results = asyncio.run(tournament.swiss(args.rounds))
+        else:
+            results = asyncio.run(tournament.round_robin(args.rounds))
+    finally:
+        tournament.close()
+    print(format_ratings(list(tournament.players), results, tournament.byes))
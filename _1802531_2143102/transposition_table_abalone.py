@@ -5,32 +5,89 @@ Authors: Yann Roberge (1802531)
 Date created: 19-Nov-2023
 """
 from seahorse.game.game_state import GameState
-from .util import Queue
+from .symmetry_abalone import canonical_key
+import hashlib
+import itertools
 import json
+import mmap
+import os
+import struct
+
+# Binary table file layout:
+#   header: magic, perspective piece type, number of slots, evaluator signature
+#   slots:  (64-bit key hash, 0 if the slot is empty ; heuristic value)
+# Slots form an open-addressing hash table with linear probing, so that the
+# file can be memory-mapped and probed in place without being parsed.
+FILE_MAGIC = b"ABALTT01"
+FILE_HEADER = struct.Struct("<8s1s7xQ16s")
+FILE_SLOT = struct.Struct("<Qd")
+MAX_PROBES = 16
+
+def compact_board_grid(state: GameState) -> str:
+    """
+    Convert the board of a game state into a long string with no whitespaces,
+    one character per cell of the board grid.
+
+    Returns:
+        str: the compact board grid
+    """
+    return state.get_rep().get_compact_grid()
+
+def key_hash(state_hash: str) -> int:
+    """
+    64-bit, never null, hash of a table key, used as key in table files.
+    """
+    return int.from_bytes(hashlib.blake2b(state_hash.encode(), digest_size=8).digest(), "little") | 1
 
 class TranspositionTableAbalone():
     """
     A container class implementing a transposition table for states that have already been extended.
 
+    Entries are aged by generation: the player starts a new generation at each move,
+    entries read during a move are promoted to the current generation, and when the
+    table is full the oldest generation is dropped at once.
+
     Attributes:
-        table   (dict[float]) : the large transposition table for our explored states.
+        generations (list[dict[str, float]]) : one table per generation, oldest first.
                                     string-form state representations are associated to their
                                     previously evaluate heuristic value.
         n_table_entries     (int)       : how many states are currently stored in the table
         max_table_size      (int)       : size of table, measured in # of states stored.
-                                        if entries are added when the table is full, then older
-                                        elements will be removed as per the replacement policy.
-        replacement_queue (Queue[str])  : queue of the oldest saved states.
-        replacement_queue_len (int)     : length of replacement policy queue
+        configured_size     (int)       : size the table was created with; max_table_size may be capped
+                                          below it for a move (see MemoryAccountantAbalone.enforce)
+        max_generations     (int)       : number of generations kept at most
+        generation          (int)       : number of the current generation
+        perspective         (str)       : piece type of the player the values are computed for
+        signature           (bytes)     : 16-byte signature of the evaluator computing the values;
+                                          table files with another signature are ignored
+        file_map            (mmap)      : memory-mapped table file, probed on misses, if any
+        file_slots          (int)       : number of slots of the mapped file
+        file_sign           (float)     : -1 if the mapped file was computed for the other player
+        antisymmetric       (bool)      : whether the values for the other player are the opposite ones, so that
+                                          files computed for it can be reused (see EvaluatorAbalone.antisymmetric)
+        canonical           (bool)      : whether states are keyed by their symmetry-canonical form, so that
+                                          symmetric positions share their value; only valid with an
+                                          evaluator invariant under the symmetries (see EvaluatorAbalone.symmetric)
+        counters            (dict[str, int]) : probes, hits (in memory), file hits, stores and
+                                          evicted entries since the table was created
     """
 
-    def __init__(self, max_table_size: int = 100_000, replacement_queue_len: int = 10_000) -> None:
-        self.table = {}
+    def __init__(self, max_table_size: int = 100_000, max_generations: int = 8, perspective: str = None,
+                 signature: bytes = bytes(16), canonical: bool = False, antisymmetric: bool = True) -> None:
+        self.generations = [{}]
         self.n_table_entries = 0
         self.max_table_size = max_table_size
-        self.replacement_queue = Queue()
-        self.replacement_queue_current_size = 0
-        self.replacement_queue_len = replacement_queue_len
+        self.configured_size = max_table_size
+        self.max_generations = max_generations
+        self.generation = 0
+        self.perspective = perspective
+        self.signature = signature
+        self.file_map = None
+        self.file_slots = 0
+        self.file_sign = 1.0
+        self.antisymmetric = antisymmetric
+        self.canonical = canonical
+        self.counters = {"probes": 0, "hits": 0, "file_hits": 0, "stores": 0, "evictions": 0}
 
     def __str__(self) -> str:
         """
@@ -39,9 +96,21 @@ class TranspositionTableAbalone():
         Returns:
             str: The string representation of the table.
         """
-        string = self.to_json().dumps()
+        string = json.dumps(self.to_json())
         return string
 
+    def __len__(self) -> int:
+        return self.n_table_entries
+
+    def new_generation(self) -> None:
+        """
+        Start a new generation of entries, dropping the oldest one if there are too many.
+        """
+        self.generation += 1
+        self.generations.append({})
+        while len(self.generations) > self.max_generations:
+            self.__drop_oldest_generation()
+
     def retrieve_value(self, state: GameState) -> float:
         """
         Retrieve the heuristic value associated to a hash from the table.
@@ -54,15 +123,37 @@ class TranspositionTableAbalone():
         """
         # Compute hash
         state_hash = self.__compute_hash(state)
+        return self.retrieve_hashed_value(state_hash)
 
-        # Return table value, none if entry is not in table
-        if state_hash in self.table:
-            state_value = self.table[state_hash]
-        else:
-            state_value = None
+    def retrieve_hashed_value(self, state_hash: str) -> float:
+        """
+        Retrieve the heuristic value associated to a hash, from the newest generation
+        to the oldest, then from the mapped table file.
+        """
+        counters = self.counters
+        counters["probes"] += 1
+        current = self.generations[-1]
+        if state_hash in current:
+            counters["hits"] += 1
+            return current[state_hash]
+
+        # Promote entries of older generations to the current one
+        for table in reversed(self.generations[:-1]):
+            if state_hash in table:
+                counters["hits"] += 1
+                state_value = table.pop(state_hash)
+                current[state_hash] = state_value
+                return state_value
+
+        if self.file_map is not None:
+            state_value = self.__probe_file(key_hash(state_hash))
+            if state_value is not None:
+                counters["file_hits"] += 1
+                self.store_hashed_value(state_hash, state_value)
+            return state_value
+
+        return None
 
-        return state_value
-    
     def store_value(self, state: GameState, state_value: float) -> None:
         """
         Store the heuristic value calculated for a state to the table, so that it
@@ -70,19 +161,60 @@ class TranspositionTableAbalone():
         """
         # Compute hash
         state_hash = self.__compute_hash(state)
+        self.store_hashed_value(state_hash, state_value)
 
-        # If table is full, make room for the new entry
-        # Else just store it
-        #### TODO: REFACTOR, duplicated code in called functions
-        if self.n_table_entries == self.max_table_size:
-            self.__replace_table_entry(state_hash)
-        else:
-            self.n_table_entries += 1
-            self.__enqueue_table_entry(state_hash)
-        self.table[state_hash] = state_value
+        return None
+
+    def state_key(self, state: GameState) -> str:
+        """
+        Key of a state in the table, e.g. to store values computed in another process.
+        """
+        return self.__compute_hash(state)
+
+    def store_hashed_value(self, state_hash: str, state_value: float) -> None:
+        """
+        Store the heuristic value associated to a hash to the table.
+        """
+        current = self.generations[-1]
+        if state_hash in current:
+            current[state_hash] = state_value
+            return None
+
+        # If table is full, make room for the new entry by dropping the oldest generations.
+        # If the current generation alone fills the table, the entry is not stored.
+        while self.n_table_entries >= self.max_table_size and len(self.generations) > 1:
+            self.__drop_oldest_generation()
+        if self.n_table_entries >= self.max_table_size:
+            return None
+
+        current[state_hash] = state_value
+        self.n_table_entries += 1
+        self.counters["stores"] += 1
 
         return None
 
+    def shrink(self, max_entries: int) -> int:
+        """
+        Drop entries until at most `max_entries` remain: oldest generations first, then the
+        oldest entries of the current generation.
+
+        Returns:
+            int: number of entries dropped
+        """
+        n_entries = self.n_table_entries
+        while self.n_table_entries > max_entries and len(self.generations) > 1:
+            self.__drop_oldest_generation()
+        current = self.generations[-1]
+        if self.n_table_entries > max_entries:
+            # Dictionaries keep insertion order: the first keys are the oldest
+            for state_hash in list(itertools.islice(current, self.n_table_entries - max(0, max_entries))):
+                del current[state_hash]
+            self.counters["evictions"] += self.n_table_entries - len(current)
+            self.n_table_entries = len(current)
+            # Deleting keys does not shrink a dictionary: copy it to release the space
+            self.generations[-1] = dict(current)
+        return n_entries - self.n_table_entries
+
     def __compute_hash(self, state: GameState) -> str:
         """
         Convert a game state into a compact string form used as a hash in
@@ -91,49 +223,115 @@ class TranspositionTableAbalone():
         Returns:
             str: A unique string representing a game state
         """
-        # TODO: implement
-        next_player_id = state.next_player.get_id()
+        # Symmetric variants of a position share their entry
+        if self.canonical:
+            return canonical_key(state).decode("latin-1")
 
-        # Create a long string representing board grid with no whitespaces
-        board_lines = []
-        for line in state.get_rep().get_grid():
-            board_lines.append(''.join(map(str, line)))
-        compact_board_grid = ''.join(board_lines)
+        next_piece_type = state.next_player.get_piece_type()
 
-        hash = str(next_player_id) + compact_board_grid
+        # Create a long string representing board grid with no whitespaces
+        hash = next_piece_type + compact_board_grid(state)
         return hash
 
-    def __replace_table_entry(self, new_state_hash: str) -> None:
+    def __drop_oldest_generation(self) -> None:
         """
         Implements the replacement policy to our transposition table:
-            Each time a state is added to table, it is saved in a FIFO, unless
-            the said FIFO is full.
+            the whole oldest generation is removed at once.
         """
-        # Push last added state, unless queue is full
-        if self.replacement_queue_current_size != self.replacement_queue_len:
-            self.replacement_queue.push(new_state_hash)
-            self.replacement_queue_current_size += 1
-        else:
-            pass
+        oldest = self.generations.pop(0)
+        self.n_table_entries -= len(oldest)
+        self.counters["evictions"] += len(oldest)
+        if not self.generations:
+            self.generations.append({})
 
-        # Pop oldest entry, which is to be removed from the table,
-        # unless queue is empty.
-        if not self.replacement_queue.isEmpty():
-            oldest_entry = self.replacement_queue.pop()
-            self.table.pop(oldest_entry)
+    def load(self, path: str) -> bool:
+        """
+        Memory-map a table file, to be probed in place on misses.
 
-    def __enqueue_table_entry(self, new_state_hash: str) -> None:
+        Returns:
+            bool: whether the file was mapped (it is ignored if its signature differs, or if it
+                  was computed for the other player and the values are not antisymmetric)
         """
-        Implements the replacement policy to our transposition table:
-            Each time a state is added to table, it is saved in a FIFO, unless
-            the said FIFO is full.
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as table_file:
+            file_map = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, perspective, n_slots, signature = FILE_HEADER.unpack_from(file_map, 0)
+        other_perspective = self.perspective is not None and perspective.decode() != self.perspective
+        if magic != FILE_MAGIC or signature != self.signature or (other_perspective and not self.antisymmetric):
+            file_map.close()
+            return False
+
+        self.close()
+        self.file_map = file_map
+        self.file_slots = n_slots
+        # Antisymmetric values are differences between the two players, so they change sign with the perspective
+        self.file_sign = -1.0 if other_perspective else 1.0
+        return True
+
+    def __probe_file(self, hashed_key: int) -> float:
+        slot = hashed_key % self.file_slots
+        for _ in range(MAX_PROBES):
+            stored_key, state_value = FILE_SLOT.unpack_from(self.file_map, FILE_HEADER.size + slot * FILE_SLOT.size)
+            if stored_key == hashed_key:
+                return self.file_sign * state_value
+            if stored_key == 0:
+                return None
+            slot = (slot + 1) % self.file_slots
+        return None
+
+    def __file_entries(self):
+        for slot in range(self.file_slots):
+            stored_key, state_value = FILE_SLOT.unpack_from(self.file_map, FILE_HEADER.size + slot * FILE_SLOT.size)
+            if stored_key != 0:
+                yield stored_key, self.file_sign * state_value
+
+    def save(self, path: str, max_entries: int = 1_000_000) -> None:
+        """
+        Write the table, merged with the mapped file if any, to a table file.
+        Entries of the newest generations are kept first.
+        """
+        entries = {}
+        for table in reversed(self.generations):
+            for state_hash, state_value in table.items():
+                if len(entries) >= max_entries:
+                    break
+                entries.setdefault(key_hash(state_hash), state_value)
+        if self.file_map is not None:
+            for hashed_key, state_value in self.__file_entries():
+                if len(entries) >= max_entries:
+                    break
+                entries.setdefault(hashed_key, state_value)
+
+        n_slots = 1024
+        while n_slots < 2 * len(entries):
+            n_slots *= 2
+
+        buffer = bytearray(FILE_HEADER.size + n_slots * FILE_SLOT.size)
+        FILE_HEADER.pack_into(buffer, 0, FILE_MAGIC, (self.perspective or "W").encode(), n_slots, self.signature)
+        for hashed_key, state_value in entries.items():
+            slot = hashed_key % n_slots
+            for _ in range(MAX_PROBES):
+                offset = FILE_HEADER.size + slot * FILE_SLOT.size
+                if FILE_SLOT.unpack_from(buffer, offset)[0] == 0:
+                    FILE_SLOT.pack_into(buffer, offset, hashed_key, state_value)
+                    break
+                slot = (slot + 1) % n_slots
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as table_file:
+            table_file.write(buffer)
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        """
+        Unmap the table file, if any.
         """
-        # Push last added state, unless queue is full
-        if self.replacement_queue_current_size != self.replacement_queue_len:
-            self.replacement_queue.push(new_state_hash)
-            self.replacement_queue_current_size += 1
-        else:
-            pass
+        if self.file_map is not None:
+            self.file_map.close()
+            self.file_map = None
+            self.file_slots = 0
 
     def to_json(self) -> dict:
         """
@@ -142,8 +340,11 @@ class TranspositionTableAbalone():
         Returns:
             dict: The JSON representation of the table.
         """
-        json_table = {"table" : json.dumps(self.table), \
-                "n_table_entries"   : self.n_table_entries, \
-                "replacement_queue" : json.dumps(self.replacement_queue.list), \
-                "replacement_queue_len": self.n_table_entries }
+        json_table = {"n_table_entries"   : self.n_table_entries, \
+                "max_table_size"   : self.max_table_size, \
+                "configured_size"  : self.configured_size, \
+                "generation"       : self.generation, \
+                "generation_sizes" : [len(table) for table in self.generations], \
+                "file_slots"       : self.file_slots, \
+                "counters"         : dict(self.counters) }
         return json_table
@@ -6,6 +6,82 @@ from typing import Dict
 from seahorse.game.game_layout.board import Board, Piece
 from seahorse.utils.serializer import Serializable
 
+# Starting configurations, in board coordinates
+# 0 case non accessible
+# 1 case player 1
+# 2 case player 2
+# 3 case vide accessible
+CLASSIC = [ # CLASSIQUE
+    [0, 0, 0, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 1, 0, 1, 0, 0, 0],
+    [0, 0, 1, 0, 1, 0, 3, 0, 0],
+    [0, 1, 0, 1, 0, 3, 0, 3, 0],
+    [1, 0, 1, 0, 1, 0, 3, 0, 3],
+    [0, 1, 0, 1, 0, 3, 0, 3, 0],
+    [1, 0, 1, 0, 3, 0, 3, 0, 3],
+    [0, 3, 0, 3, 0, 3, 0, 3, 0],
+    [3, 0, 3, 0, 3, 0, 3, 0, 3],
+    [0, 3, 0, 3, 0, 3, 0, 3, 0],
+    [3, 0, 3, 0, 3, 0, 2, 0, 2],
+    [0, 3, 0, 3, 0, 2, 0, 2, 0],
+    [3, 0, 3, 0, 2, 0, 2, 0, 2],
+    [0, 3, 0, 3, 0, 2, 0, 2, 0],
+    [0, 0, 3, 0, 2, 0, 2, 0, 0],
+    [0, 0, 0, 2, 0, 2, 0, 0, 0],
+    [0, 0, 0, 0, 2, 0, 0, 0, 0],
+]
+ALIEN = [ # ALIEN
+    [0, 0, 0, 0, 2, 0, 0, 0, 0],
+    [0, 0, 0, 3, 0, 3, 0, 0, 0],
+    [0, 0, 2, 0, 2, 0, 3, 0, 0],
+    [0, 3, 0, 1, 0, 2, 0, 3, 0],
+    [2, 0, 1, 0, 1, 0, 3, 0, 3],
+    [0, 2, 0, 2, 0, 3, 0, 3, 0],
+    [3, 0, 1, 0, 2, 0, 3, 0, 3],
+    [0, 2, 0, 2, 0, 3, 0, 3, 0],
+    [3, 0, 3, 0, 3, 0, 3, 0, 3],
+    [0, 3, 0, 3, 0, 1, 0, 1, 0],
+    [3, 0, 3, 0, 1, 0, 2, 0, 3],
+    [0, 3, 0, 3, 0, 1, 0, 1, 0],
+    [3, 0, 3, 0, 2, 0, 2, 0, 1],
+    [0, 3, 0, 1, 0, 2, 0, 3, 0],
+    [0, 0, 3, 0, 1, 0, 1, 0, 0],
+    [0, 0, 0, 3, 0, 3, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 0, 0, 0],
+]
+
+INITIAL_BOARDS = {"classic": CLASSIC, "alien": ALIEN}
+
+# (cell of the 9x9 grid of get_grid, board cell it shows) for the 61 cells of the board
+GRID_POSITIONS = (
+    ((0, 6), (0, 4)), ((0, 5), (1, 3)), ((0, 4), (2, 2)),
+    ((0, 3), (3, 1)), ((0, 2), (4, 0)), ((1, 6), (1, 5)),
+    ((1, 5), (2, 4)), ((1, 4), (3, 3)), ((1, 3), (4, 2)),
+    ((1, 2), (5, 1)), ((1, 1), (6, 0)), ((2, 7), (2, 6)),
+    ((2, 6), (3, 5)), ((2, 5), (4, 4)), ((2, 4), (5, 3)),
+    ((2, 3), (6, 2)), ((2, 2), (7, 1)), ((2, 1), (8, 0)),
+    ((3, 7), (3, 7)), ((3, 6), (4, 6)), ((3, 5), (5, 5)),
+    ((3, 4), (6, 4)), ((3, 3), (7, 3)), ((3, 2), (8, 2)),
+    ((3, 1), (9, 1)), ((4, 8), (4, 8)), ((4, 7), (5, 7)),
+    ((4, 6), (6, 6)), ((4, 5), (7, 5)), ((4, 4), (8, 4)),
+    ((4, 3), (9, 3)), ((5, 7), (6, 8)), ((5, 6), (7, 7)),
+    ((5, 5), (8, 6)), ((5, 4), (9, 5)), ((6, 7), (8, 8)),
+    ((6, 6), (9, 7)), ((5, 3), (10, 4)), ((5, 2), (11, 3)),
+    ((5, 1), (12, 2)), ((5, 0), (13, 1)), ((4, 2), (10, 2)),
+    ((4, 1), (11, 1)), ((4, 0), (12, 0)), ((6, 5), (10, 6)),
+    ((6, 4), (11, 5)), ((6, 3), (12, 4)), ((6, 2), (13, 3)),
+    ((6, 1), (14, 2)), ((7, 6), (10, 8)), ((7, 5), (11, 7)),
+    ((7, 4), (12, 6)), ((7, 3), (13, 5)), ((7, 2), (14, 4)),
+    ((7, 1), (15, 3)), ((8, 6), (12, 8)), ((8, 5), (13, 7)),
+    ((8, 4), (14, 6)), ((8, 3), (15, 5)), ((8, 2), (16, 4)),
+    ((3, 0), (10, 0))
+)
+GRID_TO_BOARD = {grid_position: position for grid_position, position in GRID_POSITIONS}
+BOARD_TO_GRID = {position: grid_position for grid_position, position in GRID_POSITIONS}
+# Index of each board cell in the compact grid (get_compact_grid), and the compact grid of an empty board
+COMPACT_GRID_POSITIONS = tuple((x * 9 + y, position) for (x, y), position in GRID_POSITIONS)
+COMPACT_GRID_TEMPLATE = ''.join(str(3 if (x, y) in GRID_TO_BOARD else 0) for x in range(9) for y in range(9))
+
 
 class BoardAbalone(Board):
     """
@@ -41,6 +117,8 @@ class BoardAbalone(Board):
 
     def __init__(self, env: dict[tuple[int], Piece], dim: list[int]) -> None:
         super().__init__(env, dim)
+        self._grid = None
+        self._compact_grid = None
 
     def __str__(self) -> str:
         """
@@ -49,7 +127,7 @@ class BoardAbalone(Board):
         Returns:
             str: The string representation of the board.
         """
-        grid_data=self.get_grid()
+        grid_data=self.__cached_grid()
         string = ""
         for i in range(9):
             if i % 2 == 1:
@@ -95,48 +173,47 @@ class BoardAbalone(Board):
         """
         Return a nice representation of the board.
 
+        The grid is computed once per board (see invalidate_grid); a copy is returned.
+
         Returns:
             str: The nice representation of the board.
         """
-        grid_data = [
-            [0, 0, 2, 2, 2, 2, 2, 0, 0],
-            [0, 2, 2, 2, 2, 2, 2, 0, 0],
-            [0, 3, 3, 2, 2, 2, 3, 3, 0],
-            [3, 3, 3, 3, 3, 3, 3, 3, 0],
-            [3, 3, 3, 3, 3, 3, 3, 3, 3],
-            [3, 3, 3, 3, 3, 3, 3, 3, 0],
-            [0, 3, 3, 1, 1, 1, 3, 3, 0],
-            [0, 1, 1, 1, 1, 1, 1, 0, 0],
-            [0, 0, 1, 1, 1, 1, 1, 0, 0],
-        ]
-        positions = [
-            ((0, 6), (0, 4)), ((0, 5), (1, 3)), ((0, 4), (2, 2)),
-            ((0, 3), (3, 1)), ((0, 2), (4, 0)), ((1, 6), (1, 5)),
-            ((1, 5), (2, 4)), ((1, 4), (3, 3)), ((1, 3), (4, 2)),
-            ((1, 2), (5, 1)), ((1, 1), (6, 0)), ((2, 7), (2, 6)),
-            ((2, 6), (3, 5)), ((2, 5), (4, 4)), ((2, 4), (5, 3)),
-            ((2, 3), (6, 2)), ((2, 2), (7, 1)), ((2, 1), (8, 0)),
-            ((3, 7), (3, 7)), ((3, 6), (4, 6)), ((3, 5), (5, 5)),
-            ((3, 4), (6, 4)), ((3, 3), (7, 3)), ((3, 2), (8, 2)),
-            ((3, 1), (9, 1)), ((4, 8), (4, 8)), ((4, 7), (5, 7)),
-            ((4, 6), (6, 6)), ((4, 5), (7, 5)), ((4, 4), (8, 4)),
-            ((4, 3), (9, 3)), ((5, 7), (6, 8)), ((5, 6), (7, 7)),
-            ((5, 5), (8, 6)), ((5, 4), (9, 5)), ((6, 7), (8, 8)),
-            ((6, 6), (9, 7)), ((5, 3), (10, 4)), ((5, 2), (11, 3)),
-            ((5, 1), (12, 2)), ((5, 0), (13, 1)), ((4, 2), (10, 2)),
-            ((4, 1), (11, 1)), ((4, 0), (12, 0)), ((6, 5), (10, 6)),
-            ((6, 4), (11, 5)), ((6, 3), (12, 4)), ((6, 2), (13, 3)),
-            ((6, 1), (14, 2)), ((7, 6), (10, 8)), ((7, 5), (11, 7)),
-            ((7, 4), (12, 6)), ((7, 3), (13, 5)), ((7, 2), (14, 4)),
-            ((7, 1), (15, 3)), ((8, 6), (12, 8)), ((8, 5), (13, 7)),
-            ((8, 4), (14, 6)), ((8, 3), (15, 5)), ((8, 2), (16, 4)),
-            ((3, 0), (10, 0))
-        ]
-
-        for x,y in positions:
-            grid_data[x[0]][x[1]] = self.get_env().get(y).get_type() if  self.get_env().get(y) else BoardAbalone.EMPTY_POS
-
-        return grid_data
+        return [list(line) for line in self.__cached_grid()]
+
+    def get_compact_grid(self) -> str:
+        """
+        Return the grid as a string with no whitespaces, one character per cell, computed once per board.
+
+        Returns:
+            str: The compact grid.
+        """
+        if self._compact_grid is None:
+            characters = list(COMPACT_GRID_TEMPLATE)
+            env = self.get_env()
+            for index, position in COMPACT_GRID_POSITIONS:
+                piece = env.get(position)
+                if piece:
+                    characters[index] = str(piece.get_type())
+            self._compact_grid = ''.join(characters)
+        return self._compact_grid
+
+    def invalidate_grid(self) -> None:
+        """
+        Forget the cached grids. Boards are not modified once built (successor boards are
+        built on copies of the env), but code mutating the env must call this afterwards.
+        """
+        self._grid = None
+        self._compact_grid = None
+
+    def __cached_grid(self) -> List[List[Any]]:
+        if self._grid is None:
+            grid_data = [[BoardAbalone.FORBIDDEN_POS] * 9 for _ in range(9)]
+            env = self.get_env()
+            for (x, y), position in GRID_POSITIONS:
+                piece = env.get(position)
+                grid_data[x][y] = piece.get_type() if piece else BoardAbalone.EMPTY_POS
+            self._grid = grid_data
+        return self._grid
 
     def to_json(self) -> dict:
         """
@@ -3,13 +3,18 @@ import json
 from typing import Dict, List, Optional, Set, Tuple
 
 from board_abalone import BoardAbalone
+from loguru import logger
 from player_abalone import PlayerAbalone
 from seahorse.game.action import Action
-from seahorse.game.game_layout.board import Piece
 from seahorse.game.game_state import GameState
 from seahorse.player.player import Player
 from seahorse.utils.serializer import Serializable
 
+from _1802531_2143102.board_tables_abalone import DIRECTIONS
+from _1802531_2143102.move_encoding_abalone import decode_move
+from _1802531_2143102.move_index_abalone import IllegalMoveError, LegalMoveIndexAbalone
+from _1802531_2143102.playout_board_abalone import PlayoutBoardAbalone
+
 
 class GameStateAbalone(GameState):
     """
@@ -20,13 +25,20 @@ class GameStateAbalone(GameState):
         next_player (Player): Next player to play.
         players (list[Player]): List of players.
         rep (Representation): Representation of the game.
+        _players_by_id (dict[int, Player]): Players by ID, shared with the successor states.
+        _legal_move_index (LegalMoveIndexAbalone): Legal moves of the state, built on first use.
     """
 
-    def __init__(self, scores: Dict, next_player: Player, players: List[Player], rep: BoardAbalone, step: int, *args, **kwargs) -> None:
+    def __init__(self, scores: Dict, next_player: Player, players: List[Player], rep: BoardAbalone, step: int, *args,
+                 players_by_id: Optional[Dict[int, Player]] = None, **kwargs) -> None:
         super().__init__(scores, next_player, players, rep)
         self.max_score = -6
         self.max_step = 50
         self.step = step
+        if players_by_id is None:
+            players_by_id = {player.get_id(): player for player in players}
+        self._players_by_id = players_by_id
+        self._legal_move_index = None
 
     def get_step(self) -> int:
         """
@@ -115,9 +127,50 @@ class GameStateAbalone(GameState):
         Returns:
             Player: The player with the given ID.
         """
-        for player in self.players:
-            if player.get_id() == pid:
-                return player
+        return self._players_by_id.get(pid)
+
+    def on_board(self, index: Tuple[int, int], d: List[int]) -> bool:
+        """
+        Check if a position is on the board.
+
+        Args:
+            index: The position to check.
+            d: The dimensions of the board.
+
+        Returns:
+            bool: True if the position is on the hexagonal game board, False otherwise.
+        """
+        return 0 <= index[0] < d[0] and 0 <= index[1] < d[1] and self.in_hexa(index)
+
+    def move_pieces(self, to_move_pieces: List[Tuple[int, int]], n_i: int, n_j: int) -> Tuple[BoardAbalone, Optional[int]]:
+        """
+        Shift pieces by one step in a direction.
+
+        The moved Piece objects are reinserted at their new positions instead of being
+        copied, so the new board shares its Piece objects with this state's board: they
+        must not be modified.
+
+        Args:
+            to_move_pieces (list[Tuple[int, int]]): Positions of the pieces to move.
+            n_i (int): Row direction of movement.
+            n_j (int): Column direction of movement.
+
+        Returns:
+            Tuple[BoardAbalone, int]: The new board, and the ID of the owner of the piece
+            pushed off the board (None if no piece was pushed off).
+        """
+        current_rep = self.get_rep()
+        d = current_rep.get_dimensions()
+        copy_b = copy.copy(current_rep.get_env())
+        id_add = None
+        moved = [(index, copy_b.pop(index)) for index in to_move_pieces]
+        for index, piece in moved:
+            destination = (index[0] + n_i, index[1] + n_j)
+            if self.on_board(destination, d):
+                copy_b[destination] = piece
+            else:
+                id_add = piece.get_owner_id()
+        return BoardAbalone(env=copy_b, dim=d), id_add
 
     def generator(self):
         """
@@ -126,45 +179,16 @@ class GameStateAbalone(GameState):
         Returns:
             Set[Action]: List of possible future representations.
         """
-        current_rep = self.get_rep()
-        b = current_rep.get_env()
-        d = current_rep.get_dimensions()
+        b = self.get_rep().get_env()
+        next_player_id = self.next_player.get_id()
+        list_index = [(-1, -1), (1, -1), (-1, 1), (1, 1), (2, 0), (-2, 0)]
         for i, j in list(b.keys()):
             p = b.get((i, j), None)
-            if p.get_owner_id() == self.next_player.get_id():
-                list_index = [(-1, -1), (1, -1), (-1, 1), (1, 1), (2, 0), (-2, 0)]
+            if p.get_owner_id() == next_player_id:
                 for n_i, n_j in list_index:
                     to_move_pieces = self.detect_conflict(i, j, n_i, n_j)
                     if to_move_pieces is not None:
-                        copy_b = copy.copy(b)
-                        id_add = None
-                        pop_piece = None
-                        for k in range(len(to_move_pieces)):
-                            n_index = to_move_pieces[k]
-                            if (
-                                n_index[0] + n_i >= 0
-                                and n_index[0] + n_i < d[0]
-                                and n_index[1] + n_j >= 0
-                                and n_index[1] + n_j < d[1]
-                                and self.in_hexa((n_index[0] + n_i, n_index[1] + n_j))
-                            ):
-                                copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)] = Piece(
-                                    piece_type=copy_b[(n_index[0], n_index[1])].get_type(),
-                                    owner=self.get_player_id(copy_b[(n_index[0], n_index[1])].get_owner_id()),
-                                )
-                                copy_b.pop((n_index[0], n_index[1]))
-                            else:
-                                id_add = copy_b[(n_index[0], n_index[1])].get_owner_id()
-                                pop_piece = (n_index[0], n_index[1])
-                                copy_b.pop((n_index[0], n_index[1]))
-                        for k in range(len(to_move_pieces)):
-                            n_index = to_move_pieces[k]
-                            if pop_piece != (n_index[0], n_index[1]):
-                                copy_b[(n_index[0] + n_i, n_index[1] + n_j)] = copy.copy(
-                                    copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)]
-                                )
-                                copy_b.pop((n_index[0] + n_i, n_index[1] + n_j, 1))
-                        yield BoardAbalone(env=copy_b, dim=d), id_add
+                        yield self.move_pieces(to_move_pieces, n_i, n_j)
 
     def generate_possible_actions(self) -> Set[Action]:
         """
@@ -182,56 +206,65 @@ class GameStateAbalone(GameState):
                     self.players,
                     valid_next_rep,
                     step=self.step + 1,
+                    players_by_id=self._players_by_id,
                 ),
             )
             for valid_next_rep, id_add in self.generator()
         }
         return poss_actions
 
+    def legal_move_index(self) -> LegalMoveIndexAbalone:
+        """
+        Index of the legal moves of the state, built once from the fast move generator.
+
+        Returns:
+            LegalMoveIndexAbalone: The legal moves, by move index.
+        """
+        if self._legal_move_index is None:
+            self._legal_move_index = LegalMoveIndexAbalone.from_state(self)
+        return self._legal_move_index
+
+    def check_action(self, action: Action) -> bool:
+        """
+        Check that an action leads from this state to the state reached by a legal move,
+        without enumerating the possible actions.
+
+        Returns:
+            bool: True if the action is legal, False otherwise.
+        """
+        try:
+            next_board = PlayoutBoardAbalone.from_state(action.get_next_game_state())
+        except (KeyError, ValueError):
+            # A marble off the playable cells, a piece of unknown type or a score of an unknown player
+            return False
+        try:
+            self.legal_move_index().find_move(next_board)
+        except IllegalMoveError:
+            return False
+        return True
+
     def convert_light_action_to_action(self,data) ->  Action :
-        src,dst=data["from"],data["to"]
         current_game_state = self
-        b = current_game_state.get_rep().get_env()
-        d = current_game_state.get_rep().get_dimensions()
-        n_i, n_j = dst[0]-src[0],dst[1]-src[1]
-        to_move_pieces = current_game_state.detect_conflict(src[0],src[1],n_i,n_j)
+        # Validated by a lookup in the legal move index, which also gives the marbles to move
+        try:
+            move = current_game_state.legal_move_index().validate(data)
+        except IllegalMoveError as error:
+            logger.warning(f"Illegal action {data} at step {current_game_state.step}: {error}")
+            to_move_pieces = None
+        else:
+            to_move_pieces = list(current_game_state.legal_move_index().moved_positions(move))
+            n_i, n_j = DIRECTIONS[decode_move(move)[1]]
         if to_move_pieces is not None:
-            copy_b = copy.copy(b)
-            id_add = None
-            pop_piece = None
-            for k in range(len(to_move_pieces)):
-                n_index = to_move_pieces[k]
-                if (
-                    n_index[0] + n_i >= 0
-                    and n_index[0] + n_i < d[0]
-                    and n_index[1] + n_j >= 0
-                    and n_index[1] + n_j < d[1]
-                    and current_game_state.in_hexa((n_index[0] + n_i, n_index[1] + n_j))
-                ):
-                    copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)] = Piece(
-                        piece_type=copy_b[(n_index[0], n_index[1])].get_type(),
-                        owner=current_game_state.get_player_id(copy_b[(n_index[0], n_index[1])].get_owner_id()),
-                    )
-                    copy_b.pop((n_index[0], n_index[1]))
-                else:
-                    id_add = copy_b[(n_index[0], n_index[1])].get_owner_id()
-                    pop_piece = (n_index[0], n_index[1])
-                    copy_b.pop((n_index[0], n_index[1]))
-            for k in range(len(to_move_pieces)):
-                n_index = to_move_pieces[k]
-                if pop_piece != (n_index[0], n_index[1]):
-                    copy_b[(n_index[0] + n_i, n_index[1] + n_j)] = copy.copy(
-                        copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)]
-                    )
-                    copy_b.pop((n_index[0] + n_i, n_index[1] + n_j, 1))
+            next_rep, id_add = current_game_state.move_pieces(to_move_pieces, n_i, n_j)
             return Action(
                     current_game_state,
                     GameStateAbalone(
                         current_game_state.compute_scores(id_add=id_add),
                         current_game_state.compute_next_player(),
                         current_game_state.players,
-                        BoardAbalone(env=copy_b, dim=d),
+                        next_rep,
                         step=current_game_state.step + 1,
+                        players_by_id=current_game_state._players_by_id,
                         ),
                     )
         return None
@@ -259,7 +292,7 @@ class GameStateAbalone(GameState):
         return "The game is finished!"
 
     def to_json(self) -> str:
-        return { i:j for i,j in self.__dict__.items() if i!="_possible_actions"}
+        return { i:j for i,j in self.__dict__.items() if i not in ("_possible_actions", "_players_by_id", "_legal_move_index")}
 
     @classmethod
     def from_json(cls,data:str,*,next_player:Optional[PlayerAbalone]=None) -> Serializable:
@@ -6,10 +6,11 @@ import platform
 import sys
 
 from loguru import logger
-from board_abalone import BoardAbalone
+from board_abalone import BoardAbalone, INITIAL_BOARDS
 from player_abalone import PlayerAbalone
 from master_abalone import MasterAbalone
 from game_state_abalone import GameStateAbalone
+from _1802531_2143102.delta_protocol_abalone import DEFAULT_SNAPSHOT_EVERY
 from seahorse.player.proxies import InteractivePlayerProxy, LocalPlayerProxy, RemotePlayerProxy
 from seahorse.utils.gui_client import GUIClient
 from seahorse.utils.recorders import StateRecorder
@@ -17,63 +18,21 @@ from seahorse.game.game_layout.board import Piece
 from seahorse.utils.custom_exceptions import PlayerDuplicateError
 from argparse import RawTextHelpFormatter
 
-def play(player1, player2, log_level, port, address, gui, record, gui_path, config) :
+def play(player1, player2, log_level, port, address, gui, record, gui_path, config, delta=False, snapshot_every=DEFAULT_SNAPSHOT_EVERY) :
     list_players = [player1, player2]
     init_scores = {player1.get_id(): 0, player2.get_id(): 0}
     dim = [17, 9]
     env = {}
-    # 0 case non accessible
-    # 1 case player 1
-    # 2 case player 2
-    # 3 case vide accessible
-    classic = [ # CLASSIQUE
-        [0, 0, 0, 0, 1, 0, 0, 0, 0],
-        [0, 0, 0, 1, 0, 1, 0, 0, 0],
-        [0, 0, 1, 0, 1, 0, 3, 0, 0],
-        [0, 1, 0, 1, 0, 3, 0, 3, 0],
-        [1, 0, 1, 0, 1, 0, 3, 0, 3],
-        [0, 1, 0, 1, 0, 3, 0, 3, 0],
-        [1, 0, 1, 0, 3, 0, 3, 0, 3],
-        [0, 3, 0, 3, 0, 3, 0, 3, 0],
-        [3, 0, 3, 0, 3, 0, 3, 0, 3],
-        [0, 3, 0, 3, 0, 3, 0, 3, 0],
-        [3, 0, 3, 0, 3, 0, 2, 0, 2],
-        [0, 3, 0, 3, 0, 2, 0, 2, 0],
-        [3, 0, 3, 0, 2, 0, 2, 0, 2],
-        [0, 3, 0, 3, 0, 2, 0, 2, 0],
-        [0, 0, 3, 0, 2, 0, 2, 0, 0],
-        [0, 0, 0, 2, 0, 2, 0, 0, 0],
-        [0, 0, 0, 0, 2, 0, 0, 0, 0],
-    ]
-    alien = [ # ALIEN
-            [0, 0, 0, 0, 2, 0, 0, 0, 0],
-            [0, 0, 0, 3, 0, 3, 0, 0, 0],
-            [0, 0, 2, 0, 2, 0, 3, 0, 0],
-            [0, 3, 0, 1, 0, 2, 0, 3, 0],
-            [2, 0, 1, 0, 1, 0, 3, 0, 3],
-            [0, 2, 0, 2, 0, 3, 0, 3, 0],
-            [3, 0, 1, 0, 2, 0, 3, 0, 3],
-            [0, 2, 0, 2, 0, 3, 0, 3, 0],
-            [3, 0, 3, 0, 3, 0, 3, 0, 3],
-            [0, 3, 0, 3, 0, 1, 0, 1, 0],
-            [3, 0, 3, 0, 1, 0, 2, 0, 3],
-            [0, 3, 0, 3, 0, 1, 0, 1, 0],
-            [3, 0, 3, 0, 2, 0, 2, 0, 1],
-            [0, 3, 0, 1, 0, 2, 0, 3, 0],
-            [0, 0, 3, 0, 1, 0, 1, 0, 0],
-            [0, 0, 0, 3, 0, 3, 0, 0, 0],
-            [0, 0, 0, 0, 1, 0, 0, 0, 0],
-        ]
-    
-    initial_board = classic if config=='classic' else alien
+    initial_board = INITIAL_BOARDS[config]
     W = 1
     B = 2
+    # Pieces are immutable: a single Piece per player is shared by all its marbles
+    pieces = {W: Piece(piece_type=player1.get_piece_type(), owner=player1),
+              B: Piece(piece_type=player2.get_piece_type(), owner=player2)}
     for i in range(dim[0]):
         for j in range(dim[1]):
-            if initial_board[i][j] == W:
-                env[(i, j)] = Piece(piece_type=player1.get_piece_type(), owner=player1)
-            elif initial_board[i][j] == B:
-                env[(i, j)] = Piece(piece_type=player2.get_piece_type(), owner=player2)
+            if initial_board[i][j] in pieces:
+                env[(i, j)] = pieces[initial_board[i][j]]
 
     init_rep = BoardAbalone(env=env, dim=dim)
     initial_game_state = GameStateAbalone(
@@ -81,7 +40,7 @@ def play(player1, player2, log_level, port, address, gui, record, gui_path, conf
     try:
         master = MasterAbalone(
             name="Abalone", initial_game_state=initial_game_state, players_iterator=list_players, log_level=log_level, port=port,
-            hostname=address
+            hostname=address, delta_updates=delta, snapshot_every=snapshot_every
         )
     except PlayerDuplicateError:
         return
@@ -106,10 +65,11 @@ if __name__=="__main__":
     parser.add_argument("-t","--type",
                         required=True,
                         type=str, 
-                        choices=["local", "host_game", "connect", "human_vs_computer", "human_vs_human"],
+                        choices=["local", "host_game", "host_games", "connect", "human_vs_computer", "human_vs_human"],
                         help="\nThe execution mode you want.\n" 
                              +" - local: Runs everything on you machine\n"
                              +" - host_game: Runs a single player on your machine and waits for an opponent to connect with the 'connect' node.\n\t      You must provide an external ip for the -a argument (use 'ipconfig').\n"
+                             +" - host_games: Runs many games at once on your machine, the players' moves computed by --workers processes.\n\t      The games are listed in --matches, or are --games games between the two players given, colours alternating.\n\t      Spectators watch a game at GUI/index.html?match=<id> on the port given with -p (-g: no spectators).\n"
                              +" - connect: Runs a single player and connects to a distant game launched with the 'host' at the hostname specified with '-a'.\n"
                              +" - human_vs_computer: Launches a GUI locally for you to challenge your player.\n"
                              +" - human_vs_human: Launches a GUI locally for you to experiment the game's mechanics.\n"
@@ -121,6 +81,13 @@ if __name__=="__main__":
     parser.add_argument("-g","--no-gui",action='store_false',default=True, help="Headless mode\n\n")
     parser.add_argument("-r","--record",action="store_true",default=False, help="Stores the succesive game states in a json file.\n\n")
     parser.add_argument("-l","--log",required=False,choices=["DEBUG","INFO"], default="DEBUG",help="\nSets the logging level.")
+    parser.add_argument("--profile",required=False, default=None, metavar="REPORT",help="\nlocal mode only: profiles a player's compute_action over the game\nand writes the report to REPORT (raw statistics next to it, as .prof).\n\n")
+    parser.add_argument("--profile-player",required=False,type=int,choices=[1,2], default=1, help="Player profiled with --profile: 1 (white) or 2 (black).\n\n")
+    parser.add_argument("--delta",action="store_true",default=False, help="Sends the GUI and the recorder only the changes of each move,\nwith a full snapshot every --snapshot-every steps.\n\n")
+    parser.add_argument("--snapshot-every",required=False,type=int, default=DEFAULT_SNAPSHOT_EVERY, metavar="N",help="Steps between two full snapshots with --delta.\n\n")
+    parser.add_argument("--matches",required=False, default=None, metavar="FILE",help="host_games mode: the games to play, one per line:\n'white_player.py black_player.py [classic|alien]'.\n\n")
+    parser.add_argument("--games",required=False,type=int, default=1, help="host_games mode: number of games between the two players given, without --matches.\n\n")
+    parser.add_argument("--workers",required=False,type=int, default=os.cpu_count(), help="host_games mode: number of processes computing the players' moves.\n\n")
     parser.add_argument("players_list",nargs="*", help='The players')
     args=parser.parse_args()
 
@@ -132,6 +99,13 @@ if __name__=="__main__":
     log_level = vars(args).get("log")
     list_players = vars(args).get("players_list")
     base_config = vars(args).get("config")
+    profile_path = vars(args).get("profile")
+    profile_player = vars(args).get("profile_player")
+    delta = vars(args).get("delta")
+    snapshot_every = vars(args).get("snapshot_every")
+    matches_path = vars(args).get("matches")
+    games = vars(args).get("games")
+    workers = vars(args).get("workers")
     time_limit = 15*60
 
     gui_path = os.path.join(dirname(os.path.abspath(__file__)),'GUI','index.html')
@@ -145,7 +119,15 @@ if __name__=="__main__":
         player2_class = __import__(splitext(basename(list_players[1]))[0], fromlist=[None])
         player1 = player1_class.MyPlayer("W", name=splitext(basename(list_players[0]))[0]+"_1", time_limit=time_limit)
         player2 = player2_class.MyPlayer("B", name=splitext(basename(list_players[1]))[0]+"_2", time_limit=time_limit)
-        play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=gui, record=record, gui_path=gui_path, config=base_config)
+        if profile_path :
+            from _1802531_2143102.profiling_abalone import ComputeActionProfilerAbalone
+            profiler = ComputeActionProfilerAbalone()
+            # A single player, so that the report is not a mix of both players' code
+            profiler.attach(player1 if profile_player == 1 else player2)
+        play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=gui, record=record, gui_path=gui_path, config=base_config, delta=delta, snapshot_every=snapshot_every)
+        if profile_path :
+            profiler.save(profile_path)
+            print("Profile report written to", profile_path)
     elif type == "host_game" :
         folder = dirname(list_players[0])
         sys.path.append(folder)
@@ -155,7 +137,20 @@ if __name__=="__main__":
         if address=='localhost':
             logger.warning('Using `localhost` with `host_game` mode, if both players are on different machines')
             logger.warning('use ipconfig/ifconfig to get your external ip and specity the ip with -a')
-        play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=int(gui)+1, record=record, gui_path=gui_path, config=base_config)
+        play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=int(gui)+1, record=record, gui_path=gui_path, config=base_config, delta=delta, snapshot_every=snapshot_every)
+    elif type == "host_games" :
+        from _1802531_2143102.multi_game_host_abalone import MultiGameHostAbalone, host_matches, read_match_list
+        host = MultiGameHostAbalone(workers=workers, delta_updates=delta, snapshot_every=snapshot_every)
+        if matches_path :
+            for white_path, black_path, config in read_match_list(matches_path) :
+                host.add_match(white_path, black_path, config, time_limit=time_limit)
+        else :
+            for game in range(games) :
+                host.add_match(list_players[game % 2], list_players[(game + 1) % 2], base_config, time_limit=time_limit)
+        try :
+            asyncio.new_event_loop().run_until_complete(host_matches(host, address, port if gui else None))
+        finally :
+            host.close()
     elif type == "connect" :
         folder = dirname(list_players[0])
         sys.path.append(folder)
@@ -171,10 +166,10 @@ if __name__=="__main__":
         player1_class = __import__(splitext(basename(list_players[0]))[0], fromlist=[None])
         player1 = InteractivePlayerProxy(PlayerAbalone("W", name="bob", time_limit=time_limit),gui_path=gui_path,gs=GameStateAbalone)
         player2 = LocalPlayerProxy(player1_class.MyPlayer("B", name=splitext(basename(list_players[0]))[0], time_limit=time_limit),gs=GameStateAbalone)
-        play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=False, record=record, gui_path=gui_path, config=base_config)
+        play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=False, record=record, gui_path=gui_path, config=base_config, delta=delta, snapshot_every=snapshot_every)
     elif type == "human_vs_human" :
         player1 = InteractivePlayerProxy(PlayerAbalone("W", name="bob", time_limit=time_limit),gui_path=gui_path,gs=GameStateAbalone)
         player2 = InteractivePlayerProxy(PlayerAbalone("B", name="alice", time_limit=time_limit))
         player2.share_sid(player1)
-        play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=False, record=record, gui_path=gui_path, config=base_config)
+        play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=False, record=record, gui_path=gui_path, config=base_config, delta=delta, snapshot_every=snapshot_every)
         
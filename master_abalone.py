@@ -1,10 +1,13 @@
 from typing import Dict, Iterable, List
 from collections import Counter
+import json
 
 from seahorse.game.game_state import GameState
 from seahorse.game.master import GameMaster
 from seahorse.player.player import Player
 
+from _1802531_2143102.delta_protocol_abalone import DEFAULT_SNAPSHOT_EVERY, DeltaEncoderAbalone
+
 
 class MasterAbalone(GameMaster):
     """
@@ -17,11 +20,26 @@ class MasterAbalone(GameMaster):
         players_iterator (Iterable): An iterable for the players_iterator, ordered according to the playing order.
             If a list is provided, a cyclic iterator is automatically built
         log_level (str): Name of the log file
+        delta_encoder (DeltaEncoderAbalone): Encoder of the updates sent to the listeners as deltas
+            (see delta_protocol_abalone), None to send the full state after every move
     """
 
-    def __init__(self, name: str, initial_game_state: GameState, players_iterator: Iterable[Player], log_level: str, port: int = 8080, hostname: str = "localhost") -> None:
+    def __init__(self, name: str, initial_game_state: GameState, players_iterator: Iterable[Player], log_level: str, port: int = 8080, hostname: str = "localhost",
+                 delta_updates: bool = False, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY) -> None:
         super().__init__(name, initial_game_state, players_iterator, log_level, port, hostname)
-        
+        self.delta_encoder = DeltaEncoderAbalone(snapshot_every) if delta_updates else None
+
+    async def _emit_play_payload(self) -> None:
+        """
+        Broadcasts the current game state to the listeners, as a delta from the previous one
+        or a full snapshot if delta updates are enabled.
+        """
+        if self.delta_encoder is None:
+            return await super()._emit_play_payload()
+        play_payload = self.delta_encoder.encode(self.current_game_state)
+        play_payload["remaining_time"] = self.remaining_time.copy()
+        await self.emitter.sio.emit("play", json.dumps(play_payload, default=lambda x: x.to_json()))
+
     def compute_winner(self, scores: Dict[int, float]) -> List[Player]:
         """
         Computes the winners of the game based on the scores.
@@ -32,31 +50,46 @@ class MasterAbalone(GameMaster):
         Returns:
             Iterable[Player]: List of the players who won the game
         """
-        def manhattanDist(A, B):
-            mask1 = [(0,2),(1,3),(2,4)]
-            mask2 = [(0,4)]
-            diff = (abs(B[0] - A[0]),abs(B[1] - A[1]))
-            dist = (abs(B[0] - A[0]) + abs(B[1] - A[1]))/2
-            if diff in mask1:
-                dist += 1
-            if diff in mask2:
-                dist += 2
-            return dist
-        
-        max_val = max(scores.values())
-        players_id = list(filter(lambda key: scores[key] == max_val, scores))
-        itera = list(filter(lambda x: x.get_id() in players_id, self.players))
-        if len(itera) > 1: #égalité
-            final_rep = self.current_game_state.get_rep()
-            env = final_rep.get_env()
-            dim = final_rep.get_dimensions()
-            dist = dict.fromkeys(players_id, 0)
-            center = (dim[0]//2, dim[1]//2)
-            for i, j in list(env.keys()):
-                p = env.get((i, j), None)
-                if p.get_owner_id():
-                    dist[p.get_owner_id()] += manhattanDist(center, (i, j))
-            min_dist = min(dist.values())
-            players_id = list(filter(lambda key: dist[key] == min_dist, dist))
-            itera = list(filter(lambda x: x.get_id() in players_id, self.players))
-        return itera
+        return final_winners(self.current_game_state, scores)
+
+
+def final_winners(game_state: GameState, scores: Dict[int, float]) -> List[Player]:
+    """
+    Winners of a finished game: the players of highest score, ties broken by the smallest
+    total distance of the marbles to the center.
+
+    Args:
+        game_state (GameState): Final state of the game
+        scores (Dict[int, float]): Score for each player
+
+    Returns:
+        Iterable[Player]: List of the players who won the game
+    """
+    def manhattanDist(A, B):
+        mask1 = [(0,2),(1,3),(2,4)]
+        mask2 = [(0,4)]
+        diff = (abs(B[0] - A[0]),abs(B[1] - A[1]))
+        dist = (abs(B[0] - A[0]) + abs(B[1] - A[1]))/2
+        if diff in mask1:
+            dist += 1
+        if diff in mask2:
+            dist += 2
+        return dist
+    
+    max_val = max(scores.values())
+    players_id = list(filter(lambda key: scores[key] == max_val, scores))
+    itera = list(filter(lambda x: x.get_id() in players_id, game_state.players))
+    if len(itera) > 1: #égalité
+        final_rep = game_state.get_rep()
+        env = final_rep.get_env()
+        dim = final_rep.get_dimensions()
+        dist = dict.fromkeys(players_id, 0)
+        center = (dim[0]//2, dim[1]//2)
+        for i, j in list(env.keys()):
+            p = env.get((i, j), None)
+            if p.get_owner_id():
+                dist[p.get_owner_id()] += manhattanDist(center, (i, j))
+        min_dist = min(dist.values())
+        players_id = list(filter(lambda key: dist[key] == min_dist, dist))
+        itera = list(filter(lambda x: x.get_id() in players_id, game_state.players))
+    return itera
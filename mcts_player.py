@@ -0,0 +1,73 @@
+from player_abalone import PlayerAbalone
+from seahorse.game.action import Action
+from seahorse.game.game_state import GameState
+
+from _1802531_2143102.mcts_abalone import search
+from _1802531_2143102.playout_board_abalone import PlayoutBoardAbalone
+
+import random
+import time
+
+class MyPlayer(PlayerAbalone):
+    """
+    Player class for Abalone game searching with Monte-Carlo Tree Search.
+
+    Attributes:
+        piece_type   (str): piece type of the player
+        exploration  (float): exploration constant of the UCB1 bound
+        playout_plies (int): number of random moves played at most per playout
+        max_nodes    (int): number of tree nodes allocated at most per move
+        max_move_time (float): time spent at most on a move, in (s)
+        rng (random.Random): random generator of the playouts
+    """
+
+    def __init__(self, piece_type: str, name: str = "bob", time_limit: float=60*15,*args) -> None:
+        """
+        Initialize the PlayerAbalone instance.
+
+        Args:
+            piece_type (str): Type of the player's game piece
+            name (str, optional): Name of the player (default is "bob")
+            time_limit (float, optional): the time limit in (s)
+        """
+        super().__init__(piece_type,name,time_limit,*args)
+
+        #### SEARCH ####
+        self.exploration = 1.4
+        self.playout_plies = 20
+        self.max_nodes = 2_000_000
+        self.max_move_time = 30.0
+        self.rng = random.Random()
+        ################
+
+    def compute_action(self, current_state: GameState, **kwargs) -> Action:
+        """
+        Function to implement the logic of the player.
+
+        Args:
+            current_state (GameState): Current game state representation
+            **kwargs: Additional keyword arguments
+
+        Returns:
+            Action: selected feasible action
+        """
+        begin = time.time()
+        board = PlayoutBoardAbalone.from_state(current_state)
+        move, tree, n_playouts = search(board, self.move_time_budget(current_state, **kwargs), self.exploration,
+                                        self.playout_plies, self.max_nodes, self.rng)
+        elapsed = time.time() - begin
+        print("mcts_player step time: ", elapsed, " playouts: ", n_playouts,
+              " playouts/s: ", n_playouts / max(elapsed, 1e-9), " nodes: ", len(tree),
+              " (node limit reached)" if tree.full else "")
+
+        if move == -1:
+            return next(iter(current_state.get_possible_actions()))
+        return current_state.convert_light_action_to_action(board.light_action(move))
+
+    def move_time_budget(self, current_state: GameState, **kwargs) -> float:
+        """
+        Share the remaining time equally between our remaining moves.
+        """
+        remaining_time = kwargs.get("remaining_time", self.time_limit)
+        remaining_moves = max(1, (current_state.max_step - current_state.get_step() + 1) // 2)
+        return min(self.max_move_time, 0.9 * remaining_time / remaining_moves)
@@ -1,12 +1,55 @@
+from game_state_abalone import GameStateAbalone
 from player_abalone import PlayerAbalone
 from seahorse.game.action import Action
 from seahorse.game.game_state import GameState
 from seahorse.utils.custom_exceptions import MethodNotImplementedError
 
 from _1802531_2143102.transposition_table_abalone import TranspositionTableAbalone
-
+from _1802531_2143102.ponder_abalone import PondererAbalone
+from _1802531_2143102.memory_abalone import MemoryAccountantAbalone
+from _1802531_2143102.search_control_abalone import SearchControlAbalone, SearchStopped
+from _1802531_2143102.successor_cache_abalone import SuccessorCacheAbalone, successor_key
+from _1802531_2143102.search_statistics_abalone import JsonLinesSinkAbalone, count_cutoff, counter_deltas, \
+                                                      new_search_statistics
+from _1802531_2143102.symmetry_abalone import INITIAL_CELLS, find_symmetry, inverse_symmetry, \
+                                             transform_light_action, transform_position, typed_cells_from_env
+from _1802531_2143102.evaluator_abalone import EvaluatorAbalone, IncrementalEvaluationAbalone, default_weights, \
+                                                feature_digest
+from _1802531_2143102.ntuple_abalone import NTUPLE_WEIGHTS_PATH, NTupleEvaluatorAbalone
+
+import hashlib
+import json
+import os
 import time
 
+# Weights of the features of compute_state_heuristic, overridden by the weights file if present
+DEFAULT_HEURISTIC_WEIGHTS = default_weights()
+HEURISTIC_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_1802531_2143102", "heuristic_weights.json")
+# Attributes of MyPlayer that define its search, copied by search_configuration
+SEARCH_SETTINGS = ("search_depth", "heuristic_weights", "evaluator_type", "null_move_pruning", "null_move_reduction",
+                   "late_move_reductions", "late_move_full_depth_moves", "late_move_reduction", "re_search")
+
+def load_heuristic_weights(path: str = HEURISTIC_WEIGHTS_PATH) -> dict:
+    """
+    Load the heuristic weights written by the tuning script, falling back on the defaults.
+    A weights file tuned for other feature definitions (see feature_digest) is ignored.
+
+    Args:
+        path (str): path to the JSON weights file
+
+    Returns:
+        dict: feature name -> weight
+    """
+    weights = dict(DEFAULT_HEURISTIC_WEIGHTS)
+    if os.path.exists(path):
+        with open(path, "r") as weights_file:
+            tuned = json.load(weights_file)
+        if tuned.get("features") != feature_digest(DEFAULT_HEURISTIC_WEIGHTS):
+            print("Ignoring", path, "tuned for other feature definitions, using the default weights.")
+        else:
+            weights.update(tuned["weights"])
+    return weights
+
 class MyPlayer(PlayerAbalone):
     """
     Player class for Abalone game.
@@ -17,7 +60,25 @@ class MyPlayer(PlayerAbalone):
                             WARNING: We are well aware that board configuration has no place
                             under the player class, however we have been instructed not to
                             change any other file for the purpose of this particular project.
+        board_symmetry (int): symmetry mapping the reference starting board onto the actual one
         transposition_table (TranspositionTable): table for caching calculated heuristics
+        transposition_table_path (str): binary file the transposition table is warmed from and saved to
+        heuristic_weights (dict[str, float]): weight of each feature of the state heuristic
+        evaluator_type (str): "features" or "ntuple", selects the evaluator
+        evaluator (EvaluatorAbalone): evaluator computing the state heuristic (NTupleEvaluatorAbalone for "ntuple")
+        evaluation (IncrementalEvaluationAbalone): incremental evaluation of the nodes of the current search
+        null_move_pruning (bool): whether to try passing to cut off nodes early
+        late_move_reductions (bool): whether to search late moves other than captures at reduced depth
+        re_search (bool): whether reduced moves beating the bound are searched again at full depth
+        search_statistics (dict): counters and timers of the last search (see search_statistics_abalone)
+        statistics_sink (JsonLinesSinkAbalone): receives the statistics of each search, None to disable
+                                                the timers and the export
+        max_move_time (float): time spent at most on a move, in (s) (None for no deadline)
+        max_nodes (int): number of nodes searched at most per move (None for no budget)
+        successor_cache (SuccessorCacheAbalone): successors of the last expanded states, None to disable
+        memory (MemoryAccountantAbalone): measures the caches after each move and keeps them under memory_ceiling
+        pondering (bool): whether to keep searching in a background process while the opponent thinks
+        ponderer (PondererAbalone): handle on the pondering process, started on the first move
     """
 
     def __init__(self, piece_type: str, name: str = "bob", time_limit: float=60*15,*args) -> None:
@@ -32,14 +93,74 @@ class MyPlayer(PlayerAbalone):
         super().__init__(piece_type,name,time_limit,*args)
         self.player_id = self.get_id()
         self.board_config = None
-        self.transposition_table = TranspositionTableAbalone(\
-                                        max_table_size = 1_000_000, \
-                                        replacement_queue_len = 10_000)
+        self.board_symmetry = 0
+        self.heuristic_weights = load_heuristic_weights()
+
+        #### INSTRUMENTATION ####
+        # JSON-lines file ("-" for stdout) receiving the statistics of each search, None to disable
+        statistics_path = None
+        self.statistics_sink = JsonLinesSinkAbalone(statistics_path) if statistics_path != None else None
+        #########################
+
+        #### EVALUATOR ####
+        # "features": weighted features of compute_state_heuristic
+        # "ntuple":   n-tuple network, weights read from NTUPLE_WEIGHTS_PATH
+        self.evaluator_type = "features"
+        ###################
+
+        self.evaluator = self.make_evaluator()
+        self.evaluation = None
+
+        #### TRANSPOSITION TABLE KEYS ####
+        # Share the entries of symmetric positions (requires an evaluator invariant under the symmetries)
+        canonical_keys = False
+        ##################################
+
+        self.transposition_table = self.make_transposition_table(1_000_000, 8, canonical_keys)
+
+        #### TRANSPOSITION TABLE FILE ####
+        # Binary table file mapped at startup and saved after our last move (None to disable)
+        self.transposition_table_path = None
+        ##################################
 
         #### SEARCH DEPTH ####
         self.search_depth = 3
         ######################
 
+        #### SELECTIVE SEARCH ####
+        self.null_move_pruning = True
+        self.null_move_reduction = 1
+        self.late_move_reductions = True
+        self.late_move_full_depth_moves = 4
+        self.late_move_reduction = 1
+        self.re_search = True
+        self.search_statistics = new_search_statistics()
+        ##########################
+
+        #### SEARCH CONTROL ####
+        # A deadline or node budget makes alpha_beta deepen iteratively up to search_depth
+        self.max_move_time = 60.0
+        self.max_nodes = None
+        ########################
+
+        #### SUCCESSOR CACHE ####
+        # Number of expanded states whose successors are kept between searches (0 to disable),
+        # about 100 kB each
+        successor_cache_size = 0
+        self.successor_cache = SuccessorCacheAbalone(successor_cache_size) if successor_cache_size > 0 else None
+        ###########################
+
+        #### MEMORY ####
+        # Bytes the transposition table and cached action sets may use at most (None for no ceiling)
+        self.memory_ceiling = 512 * 2**20
+        self.memory = MemoryAccountantAbalone(self.memory_ceiling)
+        ##################
+
+        #### PONDERING ####
+        self.pondering = False
+        self.ponderer = None
+        ###################
+
     def get_opponent_id(self, current_state: GameState) -> int:
         """
         Retrieve the opponent's player ID within the current game state.
@@ -71,17 +192,201 @@ class MyPlayer(PlayerAbalone):
             self.detect_board_configuration(current_state)
             print("Board configuration: ", self.board_config)
 
+        # Entries of previous moves age by one generation
+        self.transposition_table.new_generation()
+        if step < 2 and self.transposition_table_path != None:
+            self.transposition_table.load(self.transposition_table_path)
+
+        # Collect what was found while pondering on the opponent's clock
+        pondered_action = self.stop_pondering(current_state)
+
         # Attempt to retrieve the next move from the hardcoded opening table
         best_action = self.move_from_opening_table(self.board_config, current_state)
-        if best_action != None:
-            return best_action
+
+        # Else play the answer found while pondering, if the opponent played the expected move
+        if best_action == None:
+            best_action = pondered_action
 
         # Main search strategy: Alpha-beta minimax
-        begin = time.time()
-        best_action = self.alpha_beta(current_state)
-        print("my_player step time: ", time.time() - begin)
+        if best_action == None:
+            begin = time.time()
+            table_counters = dict(self.transposition_table.counters)
+            control = SearchControlAbalone(time_budget=self.move_time_budget(current_state, **kwargs),
+                                           max_nodes=self.max_nodes)
+            best_action = self.alpha_beta(current_state, control)
+            print("my_player step time: ", time.time() - begin)
+            if self.statistics_sink != None:
+                self.export_search_statistics(current_state, time.time() - begin, table_counters)
+
+        # Account for the memory of the caches, shrinking them if over the ceiling
+        memory_report = self.memory.account(self.transposition_table, current_state, self.successor_cache)
+        print("Memory: ", self.memory.summary(memory_report))
+
+        # Save the transposition table after our last move
+        next_state = best_action.get_next_game_state()
+        if self.transposition_table_path != None and \
+                (next_state.is_done() or next_state.get_step() >= next_state.max_step - 1):
+            self.transposition_table.save(self.transposition_table_path)
+
+        self.start_pondering(best_action)
         return best_action
-    
+
+    def export_search_statistics(self, current_state: GameState, elapsed: float, table_counters: dict) -> None:
+        """
+        Write the statistics of the search just run to the statistics sink, as one JSON line.
+
+        Args:
+            current_state (GameState): The state the search was run on.
+            elapsed (float): time spent on the move in (s)
+            table_counters (dict[str, int]): transposition table counters before the search
+        """
+        record = {"player": self.piece_type, "step": current_state.get_step(), "time": elapsed,
+                  "evaluator": self.evaluator_type, "search_depth": self.search_depth}
+        record.update(self.search_statistics)
+        record["transposition_table"] = counter_deltas(self.transposition_table.counters, table_counters)
+        record["transposition_table"]["entries"] = len(self.transposition_table)
+        if self.successor_cache != None:
+            record["successor_cache"] = dict(self.successor_cache.counters, entries=len(self.successor_cache))
+        if isinstance(self.evaluator, EvaluatorAbalone):
+            record["feature_times"] = self.evaluator.timing_report()
+            self.evaluator.feature_times.clear()
+        self.statistics_sink.write(record)
+
+    def move_time_budget(self, current_state: GameState, **kwargs) -> float:
+        """
+        Share the remaining time equally between our remaining moves.
+
+        Returns:
+            float: time budget of the move in (s), None if max_move_time is None
+        """
+        if self.max_move_time == None:
+            return None
+        remaining_time = kwargs.get("remaining_time", self.time_limit)
+        remaining_moves = max(1, (current_state.max_step - current_state.get_step() + 1) // 2)
+        return min(self.max_move_time, 0.9 * remaining_time / remaining_moves)
+
+    def make_evaluator(self):
+        """
+        Build the evaluator selected by evaluator_type.
+
+        Returns:
+            EvaluatorAbalone or NTupleEvaluatorAbalone: evaluator computing the state heuristic
+        """
+        if self.evaluator_type == "ntuple":
+            return NTupleEvaluatorAbalone.load(NTUPLE_WEIGHTS_PATH)
+        # Features are timed when the search statistics are exported
+        return EvaluatorAbalone(self.heuristic_weights, timing=self.statistics_sink != None)
+
+    def make_transposition_table(self, max_table_size: int, max_generations: int,
+                                 canonical: bool) -> TranspositionTableAbalone:
+        """
+        Build the transposition table caching the values of the evaluator.
+
+        Args:
+            max_table_size (int): number of states stored at most
+            max_generations (int): number of generations kept at most
+            canonical (bool): whether symmetric positions share their entry
+
+        Returns:
+            TranspositionTableAbalone: an empty table
+
+        Raises:
+            ValueError: if canonical keys are asked for with an evaluator that is not invariant under the symmetries
+        """
+        if canonical and not self.evaluator.symmetric:
+            raise ValueError("canonical transposition keys need an evaluator invariant under the board symmetries, "
+                             "which the " + self.evaluator_type + " evaluator is not")
+        return TranspositionTableAbalone(max_table_size = max_table_size, \
+                                         max_generations = max_generations, \
+                                         perspective = self.piece_type, \
+                                         signature = self.evaluator_signature(), \
+                                         canonical = canonical, \
+                                         antisymmetric = self.evaluator.antisymmetric)
+
+    def evaluator_signature(self) -> bytes:
+        """
+        Signature of the heuristic weights, so that transposition table files computed
+        with other weights are not reused.
+
+        Returns:
+            bytes: 16-byte digest of the heuristic weights
+        """
+        if self.evaluator_type == "ntuple":
+            return self.evaluator.signature()
+        return hashlib.md5(json.dumps(self.heuristic_weights, sort_keys=True).encode()).digest()
+
+    def search_configuration(self) -> dict:
+        """
+        Settings of the search, from which another player runs the same search
+        (e.g. the pondering process, see configure_search).
+
+        Returns:
+            dict: the SEARCH_SETTINGS attributes and the sizes of the transposition table and successor cache
+        """
+        configuration = {name: getattr(self, name) for name in SEARCH_SETTINGS}
+        configuration["max_table_size"] = self.transposition_table.configured_size
+        configuration["max_generations"] = self.transposition_table.max_generations
+        configuration["canonical"] = self.transposition_table.canonical
+        configuration["successor_cache_size"] = self.successor_cache.max_entries if self.successor_cache != None else 0
+        return configuration
+
+    def configure_search(self, configuration: dict) -> None:
+        """
+        Apply a search_configuration, rebuilding the evaluator, the transposition table and the successor cache.
+
+        Args:
+            configuration (dict): settings returned by search_configuration
+        """
+        for name in SEARCH_SETTINGS:
+            setattr(self, name, configuration[name])
+        self.evaluator = self.make_evaluator()
+        self.transposition_table = self.make_transposition_table(configuration["max_table_size"],
+                                                                 configuration["max_generations"],
+                                                                 configuration["canonical"])
+        successor_cache_size = configuration["successor_cache_size"]
+        self.successor_cache = SuccessorCacheAbalone(successor_cache_size) if successor_cache_size > 0 else None
+
+    def start_pondering(self, action: Action) -> None:
+        """
+        Search the opponent's replies to the action we are about to play, in the background.
+
+        Args:
+            action (Action): The action returned by compute_action.
+        """
+        if not self.pondering or action.get_next_game_state().is_done():
+            return None
+        if self.ponderer == None:
+            self.ponderer = PondererAbalone(self.piece_type, self.search_configuration())
+        self.ponderer.start(action.get_next_game_state())
+
+    def stop_pondering(self, current_state: GameState) -> Action:
+        """
+        Stop pondering and collect its results: the values computed for the current state are
+        imported into the transposition table.
+
+        Args:
+            current_state (GameState): The state reached after the opponent's move.
+
+        Returns:
+            Action: the answer found while pondering, or None if the current state was not answered
+        """
+        if self.ponderer == None:
+            return None
+
+        light_action, entries = self.ponderer.stop(current_state)
+        for state_hash, state_value in entries:
+            self.transposition_table.store_hashed_value(state_hash, state_value)
+
+        # A pondering process that died or hung is not restarted
+        if not self.ponderer.is_alive():
+            print("Pondering process stopped, pondering is off for the rest of the game.")
+            self.ponderer = None
+            self.pondering = False
+
+        if light_action == None:
+            return None
+        return current_state.convert_light_action_to_action(light_action)
+
 
     def detect_board_configuration(self, current_state: GameState):
         """
@@ -101,41 +406,29 @@ class MyPlayer(PlayerAbalone):
                   has been played.")
             return None
 
-        # Classic config
-        board_classic = [
-            [ 0 ,  0 , 'W', 'W', 'W', 'W', 'W',  0 ,  0 ],
-            [ 0 , 'W', 'W', 'W', 'W', 'W', 'W',  0 ,  0 ],
-            [ 0 ,  3 ,  3 , 'W', 'W', 'W',  3 ,  3 ,  0 ],
-            [ 3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  0 ],
-            [ 3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ],
-            [ 3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  0 ],
-            [ 0 ,  3 ,  3 , 'B', 'B', 'B',  3 ,  3 ,  0 ],
-            [ 0 , 'B', 'B', 'B', 'B', 'B', 'B',  0 ,  0 ],
-            [ 0 ,  0 , 'B', 'B', 'B', 'B', 'B',  0 ,  0 ]
-        ]
-
-        # Alien config
-        board_alien = [
-            [ 0 ,  0 , 'B',  3 , 'B',  3 , 'B',  0 ,  0 ],
-            [ 0 ,  3 , 'B', 'W', 'W', 'B',  3 ,  0 ,  0 ],
-            [ 0 ,  3 , 'B', 'W', 'B', 'W', 'B',  3 ,  0 ],
-            [ 3 ,  3 ,  3 , 'B', 'B',  3 ,  3 ,  3 ,  0 ],
-            [ 3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ,  3 ],
-            [ 3 ,  3 ,  3 , 'W', 'W',  3 ,  3 ,  3 ,  0 ],
-            [ 0 ,  3 , 'W', 'B', 'W', 'B', 'W',  3 ,  0 ],
-            [ 0 ,  3 , 'W', 'B', 'B', 'W',  3 ,  0 ,  0 ],
-            [ 0 ,  0 , 'W',  3 , 'W',  3 , 'W',  0 ,  0 ]
-        ]
-
-        # Get current board grid representation
-        current_board = current_state.get_rep().get_grid()
-
-        if current_board == board_classic:
-            self.board_config = "classic"
-        elif current_board == board_alien:
-            self.board_config = "alien"
-        else:
-            self.board_config = "other"
+        # Compare the board with the starting boards, up to a symmetry of the hexagonal board
+        current_cells = typed_cells_from_env(current_state.get_rep().get_env())
+        self.board_config = "other"
+        self.board_symmetry = 0
+        for config, reference_cells in INITIAL_CELLS.items():
+            symmetry = find_symmetry(current_cells, reference_cells)
+            if symmetry != None:
+                self.board_config = config
+                self.board_symmetry = inverse_symmetry(symmetry)
+                break
+
+    def to_board_frame(self, data: dict) -> dict:
+        """
+        Map a light action of the opening tables, written for the reference starting board,
+        onto the actual board (which may be a rotated or reflected starting board).
+        """
+        return transform_light_action(data, self.board_symmetry)
+
+    def to_board_frame_position(self, position: tuple) -> tuple:
+        """
+        Map a position of the reference starting board onto the actual board.
+        """
+        return transform_position(position, self.board_symmetry)
             
     def move_from_opening_table(self, starting_position: str, current_state: GameState) -> Action:
         # Opening table only covers the first three moves
@@ -182,47 +475,47 @@ class MyPlayer(PlayerAbalone):
         if piece_type == 'W':
             if current_step == 0: # First move
                 opening_action = current_state.convert_light_action_to_action( \
-                                        data={'from':(1,3), 'to':(3,3)})
+                                        data=self.to_board_frame({'from':(1,3), 'to':(3,3)}))
             elif current_step == 2: # Second move
                 opening_action = current_state.convert_light_action_to_action( \
-                                        data={'from':(5,1), 'to':(6,2)})
+                                        data=self.to_board_frame({'from':(5,1), 'to':(6,2)}))
             elif current_step == 4: # Third move
                 non_empty_tiles = current_state.get_rep().get_env().keys()
 
-                if (6, 4) not in non_empty_tiles:
+                if self.to_board_frame_position((6, 4)) not in non_empty_tiles:
                     opening_action = current_state.convert_light_action_to_action( \
-                                            data={'from':(3,1), 'to':(4,2)})
+                                            data=self.to_board_frame({'from':(3,1), 'to':(4,2)}))
                 else:
                     opening_action = current_state.convert_light_action_to_action( \
-                                            data={'from':(6,2), 'to':(7,3)})
+                                            data=self.to_board_frame({'from':(6,2), 'to':(7,3)}))
 
         elif piece_type == 'B':
             white_moved_into_center = False
 
             if current_step == 1: # First move
                 opening_action = current_state.convert_light_action_to_action( \
-                                        data={'from':(13,7), 'to':(12,6)})
+                                        data=self.to_board_frame({'from':(13,7), 'to':(12,6)}))
 
             elif current_step == 3: # Second move
                 # check if (8,4) is empty on step 3:
                 non_empty_tiles = current_state.get_rep().get_env().keys()
 
-                if (8, 4) not in non_empty_tiles:
+                if self.to_board_frame_position((8, 4)) not in non_empty_tiles:
                     white_moved_into_center = False
                     opening_action = current_state.convert_light_action_to_action( \
-                                    data={'from':(14,4), 'to':(12,4)})
+                                    data=self.to_board_frame({'from':(14,4), 'to':(12,4)}))
                 else:
                     white_moved_into_center = True
                     opening_action = current_state.convert_light_action_to_action( \
-                                    data={'from':(15,5), 'to':(13,5)})
+                                    data=self.to_board_frame({'from':(15,5), 'to':(13,5)}))
                 
             elif current_step == 5: # Third move
                 if white_moved_into_center == False:
                     opening_action = current_state.convert_light_action_to_action( \
-                                    data={'from':(15,5), 'to':(13,5)})
+                                    data=self.to_board_frame({'from':(15,5), 'to':(13,5)}))
                 else:
                     opening_action = current_state.convert_light_action_to_action( \
-                                    data={'from':(14,6), 'to':(12,6)})
+                                    data=self.to_board_frame({'from':(14,6), 'to':(12,6)}))
         return opening_action
 
     def move_from_alien_opening_table(self, current_state: GameState) -> Action:
@@ -245,181 +538,254 @@ class MyPlayer(PlayerAbalone):
         if piece_type == 'W':
             if current_step == 0: # First move
                 opening_action = current_state.convert_light_action_to_action( \
-                                        data={'from':(4,4), 'to':(3,3)})
+                                        data=self.to_board_frame({'from':(4,4), 'to':(3,3)}))
 
         elif piece_type == 'B':
             if current_step == 1: # First move
                 opening_action = current_state.convert_light_action_to_action( \
-                                        data={'from':(12,4), 'to':(13,5)})
+                                        data=self.to_board_frame({'from':(12,4), 'to':(13,5)}))
         return opening_action
 
-    def alpha_beta(self, current_state: GameState) -> Action:
+    def alpha_beta(self, current_state: GameState, control: SearchControlAbalone = None) -> Action:
         """
         Implements the Alpha-Beta pruning algorithm to determine the best action in the current game state.
+
+        Selective search, each toggled in the constructor:
+            - null-move pruning: the side to move passes and the position is searched at reduced
+              depth; if passing is already good enough, the node is cut off.
+            - late-move reductions: moves are ordered captures first (an opponent marble pushed
+              off), then quiet moves, then self-ejections (one of the mover's own marbles moved off
+              the board); moves other than captures searched after the first few are searched at
+              reduced depth.
+            - re-search: a reduced move that beats the current bound is searched again at full depth.
+        Counters are kept in search_statistics.
+
+        Nodes are counted by the search control. If it has a deadline or a node budget, the
+        search deepens iteratively up to search_depth and the action of the deepest completed
+        iteration is returned when a limit is reached. Otherwise the search goes straight to
+        search_depth, and SearchStopped propagates to the caller if the stop signal is set.
+
+        States are expanded with generate_possible_actions, which does not cache the successors
+        on the parent: only the successor lists of the current path are alive, so memory grows
+        with the depth rather than the size of the tree. The successor cache, if enabled, keeps
+        a bounded number of lists more.
         
         Args:
             current_state (GameState): The current state of the game.
+            control (SearchControlAbalone, optional): limits of the search (none by default)
 
         Returns:
             Action: The best action to take as determined by the Alpha-Beta algorithm.
         """
-
-        def maximize(current_state: GameState, alpha: float, beta: float, depth: int) -> (float, Action):
+        control = control or SearchControlAbalone()
+        statistics = new_search_statistics()
+        self.search_statistics = statistics
+        timed = self.statistics_sink != None
+        # Nodes are evaluated from the accumulators of their parent
+        evaluation = self.evaluation = IncrementalEvaluationAbalone(self.evaluator, self.player_id)
+
+        def move_class(current_state: GameState, transition: GameState) -> int:
+            # 0 if the move pushes an opponent marble off, 2 if it moves one of the mover's own off, 1 otherwise
+            mover_id = current_state.next_player.get_id()
+            for player_id, score in transition.scores.items():
+                if score != current_state.scores[player_id]:
+                    return 2 if player_id == mover_id else 0
+            return 1
+
+        def ordered_transitions(current_state: GameState) -> list:
+            if timed:
+                begin = time.perf_counter()
+            if self.successor_cache != None:
+                key = successor_key(current_state)
+                transitions = self.successor_cache.get(key)
+                if transitions != None:
+                    return transitions
+            transitions = [(action, action.get_next_game_state()) for action in current_state.generate_possible_actions()]
+            if self.late_move_reductions:
+                # Captures first and self-ejections last, so that late moves are not captures
+                transitions.sort(key=lambda transition: move_class(current_state, transition[1]))
+            if self.successor_cache != None:
+                self.successor_cache.put(key, transitions)
+            if timed:
+                statistics["move_generation_time"] += time.perf_counter() - begin
+            return transitions
+
+        def reduce(current_state: GameState, transition: GameState, index: int, depth: int) -> int:
+            if not self.late_move_reductions or depth < 3 or index < self.late_move_full_depth_moves:
+                return 0
+            if move_class(current_state, transition) == 0 or transition.is_done():
+                return 0
+            statistics["reductions"] += 1
+            return self.late_move_reduction
+
+        def maximize(node: list, alpha: float, beta: float, depth: int, null_allowed: bool = True) -> (float, Action):
+            control.count_node()
+            current_state = node[1]
             if depth == 0 or current_state.is_done():
-                return self.evaluate_state(current_state), None
+                return self.evaluate_state(current_state, node), None
+
+            if null_allowed and self.null_move_allowed(current_state, depth):
+                statistics["null_move_tries"] += 1
+                value, _ = minimize(evaluation.node(self.null_move_state(current_state), node), alpha, beta,
+                                    depth - 1 - self.null_move_reduction, null_allowed=False)
+                if value >= beta:
+                    statistics["null_move_cutoffs"] += 1
+                    return (value, None)
 
             best_value = float('-inf')
             best_action = None
-            for action in current_state.generate_possible_actions():
-                transition = action.get_next_game_state()
-                value, _ = minimize(transition, alpha, beta, depth - 1)
+            for index, (action, transition) in enumerate(ordered_transitions(current_state)):
+                reduction = reduce(current_state, transition, index, depth)
+                child = evaluation.node(transition, node)
+                value, _ = minimize(child, alpha, beta, depth - 1 - reduction)
+                if reduction and value > alpha and self.re_search:
+                    statistics["re_searches"] += 1
+                    value, _ = minimize(child, alpha, beta, depth - 1)
                 if value > best_value:
                     best_value = value
                     best_action = action
                     alpha = max(alpha, best_value)
 
                 if best_value >= beta:
+                    count_cutoff(statistics, index)
                     return (best_value, best_action)
 
             return (best_value, best_action)
     
-        def minimize(current_state: GameState, alpha: float, beta: float,  depth: int) -> (float, Action):
+        def minimize(node: list, alpha: float, beta: float,  depth: int, null_allowed: bool = True) -> (float, Action):
+            control.count_node()
+            current_state = node[1]
             if depth == 0 or current_state.is_done():
-                return self.evaluate_state(current_state), None
+                return self.evaluate_state(current_state, node), None
+
+            if null_allowed and self.null_move_allowed(current_state, depth):
+                statistics["null_move_tries"] += 1
+                value, _ = maximize(evaluation.node(self.null_move_state(current_state), node), alpha, beta,
+                                    depth - 1 - self.null_move_reduction, null_allowed=False)
+                if value <= alpha:
+                    statistics["null_move_cutoffs"] += 1
+                    return (value, None)
 
             best_value = float('inf')
             best_action = None
-            for action in current_state.generate_possible_actions():
-                transition = action.get_next_game_state()
-                value, _ = maximize(transition, alpha, beta, depth - 1)
+            for index, (action, transition) in enumerate(ordered_transitions(current_state)):
+                reduction = reduce(current_state, transition, index, depth)
+                child = evaluation.node(transition, node)
+                value, _ = maximize(child, alpha, beta, depth - 1 - reduction)
+                if reduction and value < beta and self.re_search:
+                    statistics["re_searches"] += 1
+                    value, _ = maximize(child, alpha, beta, depth - 1)
                 if value < best_value:
                     best_value = value
                     best_action = action
                     beta = min(beta, best_value)
                 
                 if best_value <= alpha:
+                    count_cutoff(statistics, index)
                     return (best_value, best_action)
 
             return (best_value, best_action)
         
-        depth = self.search_depth
-        _, best_action = maximize(current_state, float('-inf'), float('inf'), depth)
+        best_action = None
+        first_depth = 1 if control.is_bounded() else self.search_depth
+        root = evaluation.node(current_state)
+        try:
+            for depth in range(first_depth, self.search_depth + 1):
+                # No null move at the root: an action must be returned
+                _, best_action = maximize(root, float('-inf'), float('inf'), depth, null_allowed=False)
+                statistics["completed_depth"] = depth
+        except SearchStopped:
+            if not control.is_bounded():
+                raise
+        finally:
+            statistics["nodes"] = control.nodes
+
+        # Stopped before completing the first iteration
+        if best_action == None:
+            best_action = next(iter(current_state.get_possible_actions()))
         return best_action
+
+    def null_move_allowed(self, state: GameState, depth: int) -> bool:
+        """
+        Whether passing may be tried in a state. Passing is only a fair lower bound when the
+        side to move is not in trouble (zugzwang guard): it must not be behind in marbles nor
+        one marble away from losing, and the game must not end within the searched plies.
+        """
+        if not self.null_move_pruning or depth <= self.null_move_reduction:
+            return False
+        if state.get_step() + depth >= state.max_step:
+            return False
+        mover_id = state.next_player.get_id()
+        mover_score = state.scores[mover_id]
+        opponent_score = min(score for player_id, score in state.scores.items() if player_id != mover_id)
+        return mover_score > state.max_score + 1 and mover_score >= opponent_score
+
+    def null_move_state(self, state: GameState) -> GameState:
+        """
+        State reached when the side to move passes: same board, other player to move.
+        """
+        return GameStateAbalone(dict(state.scores), state.compute_next_player(), state.players,
+                                state.get_rep(), step=state.get_step() + 1)
     
-    def evaluate_state(self, state: GameState) -> float:
+    def evaluate_state(self, state: GameState, node: list = None) -> float:
         """
         Evaluates the given game state and returns a numerical score representing its value.
 
         Args:
             state (GameState): The current state of the game to be evaluated.
+            node (list, optional): search node of the state (see IncrementalEvaluationAbalone),
+                                   evaluated incrementally from its parent on a table miss
 
         Returns:
             float: A numerical value representing the desirability of the given game state.
         """
 
+        statistics = self.search_statistics
+        statistics["leaf_evaluations"] += 1
+        timed = self.statistics_sink != None
+
+        # The key is computed once, for the lookup and the store
+        if timed:
+            begin = time.perf_counter()
+        state_hash = self.transposition_table.state_key(state)
+        if timed:
+            statistics["hashing_time"] += time.perf_counter() - begin
+
         # Attempt retrieving a cached state value from transposition table
-        estimated_value_from_table = self.transposition_table.retrieve_value(state)
+        estimated_value_from_table = self.transposition_table.retrieve_hashed_value(state_hash)
 
         ## If hit, return said value
         if estimated_value_from_table != None:
             return estimated_value_from_table
         ## If miss, compute heuristics
         else:
-            state_value = self.compute_state_heuristic(state)
+            if timed:
+                begin = time.perf_counter()
+            state_value = self.compute_state_heuristic(state, node)
+            if timed:
+                statistics["evaluation_time"] += time.perf_counter() - begin
+            statistics["heuristic_evaluations"] += 1
 
         # Save calculated value to transposition table for future use
-        self.transposition_table.store_value(state, state_value)
-
-        return self.compute_state_heuristic(state)
+        self.transposition_table.store_hashed_value(state_hash, state_value)
 
-    def compute_state_heuristic(self, state: GameState) -> float:
-        # Estimate state value based on heuristics
-        ## Simple score difference heuristic (favors opponent marbles out)
-        scores_heuristic = state.scores[self.player_id] - state.scores[self.get_opponent_id(state)]
+        return state_value
 
-        center_control_heuristic = self.calculate_center_control(state, self.player_id) - self.calculate_center_control(state, self.get_opponent_id(state))
-        cluster_heuristic = self.calculate_clustering(state, self.player_id) - self.calculate_clustering(state, self.get_opponent_id(state))
+    def compute_state_heuristic(self, state: GameState, node: list = None) -> float:
+        # Estimate state value based on the weighted features of the evaluator,
+        # updated from the parent's during a search
+        if node == None:
+            return self.evaluator.evaluate_state(state, self.player_id)
+        return self.evaluation.evaluate(node)
 
-        heuristic = scores_heuristic + 0.9 * center_control_heuristic + 0.4 * cluster_heuristic
-        return heuristic
-
-    def calculate_center_control(self, state: GameState, player_id: int) -> float:
+    def compute_heuristic_features(self, state: GameState) -> list:
         """
-        Heuristique pour favoriser le controle du centre.
-        Calcule la moyenne de la distance de manhattan entre le centre et l'état (state).   
+        Compute the (unweighted) features combined by compute_state_heuristic, from this player's point of view.
 
         Args:
-            state (GameState): Current game state representation
-            player_id (int): ID du player 
+            state (GameState): The game state to describe.
 
         Returns:
-            float: moyenne dist manhattan au centre
+            list[float]: value of every registered feature, in the order of DEFAULT_HEURISTIC_WEIGHTS
         """
-        center = (8, 4)
-        total_distance = 0
-        piece_count = 0
-
-        for position, piece in state.get_rep().get_env().items():
-            if piece.get_owner_id() == player_id:
-                # Calculate Manhattan distance from the center
-                distance = abs(center[0] - position[0]) + abs(center[1] - position[1])
-                total_distance += distance
-                piece_count += 1
-
-        if piece_count == 0:
-            return 0
-
-        return -total_distance / piece_count
-    
-    def calculate_clustering(self, state: GameState, player_id: int) -> float:
-        """
-        Heuristic to favor keeping pieces in clusters.
-
-        Args:
-            state (GameState): Current game state representation
-            player_id (int): ID of the player
-
-        Returns:
-            float: Score representing the clustering of pieces
-        """
-        clustering_score = 0
-        processed = set()
-
-        # Calculate the number of adjacent friendly pieces for each piece
-        for position, piece in state.get_rep().get_env().items():
-            if piece.get_owner_id() == player_id and position not in processed:
-                cluster_size = self.get_cluster_size(state, position, player_id, processed)
-                clustering_score += cluster_size
-        return clustering_score
-
-    def get_cluster_size(self, state: GameState, start_position, player_id: int, processed: set) -> int:
-        """
-        Determine the size of the cluster starting from start_position.
-
-        Args:
-            state (GameState): Current game state representation
-            start_position (tuple): The starting position of the piece
-            player_id (int): ID of the player
-            processed (set): A set to record processed positions to avoid double counting
-
-        Returns:
-            int: Size of the cluster
-        """
-        queue = [start_position]
-        cluster_size = 0
-        while queue:
-            current_position = queue.pop(0)
-            if current_position in processed:
-                continue
-
-            processed.add(current_position)
-            current_piece = state.get_rep().get_env().get(current_position, None)
-
-            if current_piece and current_piece.get_owner_id() == player_id:
-                cluster_size += 1
-                # Add neighbors of current piece to queue to repeat process
-                neighbors = state.get_rep().get_neighbours(current_position[0], current_position[1])
-                for direction, neighbor in neighbors.items():
-                    if neighbor[1] not in processed:
-                        queue.append(neighbor[1])
-        return cluster_size
+        return self.evaluator.feature_values(state, self.player_id)
@@ -0,0 +1,88 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+GameStateAbalone.check_action, which replaces the master's membership test in the
+possible actions, must accept exactly the actions that generate_possible_actions yields.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+import random
+import unittest
+
+from board_abalone import INITIAL_BOARDS
+from player_abalone import PlayerAbalone
+from seahorse.game.action import Action
+
+from _1802531_2143102.board_tables_abalone import CELLS
+from _1802531_2143102.replay_abalone import board_types, restore, snapshot
+
+
+def initial_state(players: dict, config: str):
+    board = {(i, j): "W" if content == 1 else "B" for i, row in enumerate(INITIAL_BOARDS[config])
+             for j, content in enumerate(row) if content in (1, 2)}
+    return restore((board, {"W": 0, "B": 0}, 0, "W"), players)
+
+
+def outcome(state) -> tuple:
+    """
+    What makes two next states the same: board, scores by piece type, next player and step.
+    """
+    board, scores, step, next_type = snapshot(state)
+    return frozenset(board.items()), frozenset(scores.items()), step, next_type
+
+
+def tampered(state, players: dict, board: dict):
+    """
+    State with the same scores, step and next player as `state` but another board.
+    """
+    _, scores, step, next_type = snapshot(state)
+    return restore((board, scores, step, next_type), players)
+
+
+class CheckActionTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.players = {"W": PlayerAbalone("W", name="white"), "B": PlayerAbalone("B", name="black")}
+        self.rng = random.Random(0)
+
+    def candidate_actions(self, state, actions: list) -> list:
+        """
+        Legal actions and forged ones: a legal move played twice, a marble moved to a cell
+        off the board, a marble jumping to a distant empty cell and a marble removed.
+        """
+        players = self.players
+        candidates = list(actions)
+        next_state = actions[0].get_next_game_state()
+        candidates += [Action(state, action.get_next_game_state())
+                       for action in list(next_state.generate_possible_actions())[:3]]
+
+        board = board_types(state)
+        mover = state.next_player.get_piece_type()
+        own = sorted(position for position, piece_type in board.items() if piece_type == mover)
+        empty = [cell for cell in CELLS if cell not in board]
+        position = self.rng.choice(own)
+        for destination in ((0, 0), (16, 8), self.rng.choice(empty), None):
+            forged = dict(board)
+            del forged[position]
+            if destination is not None:
+                forged[destination] = mover
+            candidates.append(Action(state, tampered(next_state, players, forged)))
+        return candidates
+
+    def test_matches_possible_actions(self) -> None:
+        for config in INITIAL_BOARDS:
+            state = initial_state(self.players, config)
+            while not state.is_done() and state.get_step() < 30:
+                actions = list(state.generate_possible_actions())
+                legal = {outcome(action.get_next_game_state()) for action in actions}
+                for action in self.candidate_actions(state, actions):
+                    expected = outcome(action.get_next_game_state()) in legal
+                    self.assertEqual(state.check_action(action), expected,
+                                     (config, state.get_step(), board_types(action.get_next_game_state())))
+                state = self.rng.choice(actions).get_next_game_state()
+
+
+if __name__ == "__main__":
+    unittest.main()
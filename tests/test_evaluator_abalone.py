@@ -0,0 +1,86 @@
+"""
+Authors: Yann Roberge (1802531)
+         Karl Gharios (2143102)
+
+Incremental feature updates, as used by the search, must give the same accumulators
+and values as full computations.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+import random
+import unittest
+
+from board_abalone import INITIAL_BOARDS
+from player_abalone import PlayerAbalone
+
+from _1802531_2143102.board_tables_abalone import cell_changes, cells_from_env
+from _1802531_2143102.evaluator_abalone import FEATURE_REGISTRY, EvaluatorAbalone, IncrementalEvaluationAbalone
+from _1802531_2143102.replay_abalone import restore
+
+
+def initial_state(players: dict, config: str):
+    board = {(i, j): "W" if content == 1 else "B" for i, row in enumerate(INITIAL_BOARDS[config])
+             for j, content in enumerate(row) if content in (1, 2)}
+    return restore((board, {"W": 0, "B": 0}, 0, "W"), players)
+
+
+class IncrementalEvaluationTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.players = {"W": PlayerAbalone("W", name="white"), "B": PlayerAbalone("B", name="black")}
+        self.rng = random.Random(0)
+        # Every registered feature active
+        self.evaluator = EvaluatorAbalone({name: 1.0 for name in FEATURE_REGISTRY})
+
+    def random_games(self):
+        """
+        Yield (parent, child) state pairs along random games from both starting boards.
+        """
+        for config in INITIAL_BOARDS:
+            for _ in range(3):
+                state = initial_state(self.players, config)
+                while not state.is_done():
+                    child = self.rng.choice(list(state.generate_possible_actions())).get_next_game_state()
+                    yield state, child
+                    state = child
+
+    def test_update_matches_accumulate(self) -> None:
+        evaluator = self.evaluator
+        for player in self.players.values():
+            player_id = player.get_id()
+            for parent, child in self.random_games():
+                parent_cells = cells_from_env(parent.get_rep().get_env(), player_id)
+                cells = cells_from_env(child.get_rep().get_env(), player_id)
+                parent_scores = evaluator.state_scores(parent, player_id)
+                scores = evaluator.state_scores(child, player_id)
+                changes = cell_changes(parent_cells, cells)
+                for feature in evaluator.features:
+                    updated = feature.update(feature.accumulate(parent_cells, parent_scores), changes, cells, scores)
+                    self.assertEqual(updated, feature.accumulate(cells, scores), (feature.name, child.get_step()))
+
+    def test_antisymmetric(self) -> None:
+        # Transposition table files are reused by the other player with the opposite values
+        evaluator = self.evaluator
+        self.assertTrue(evaluator.antisymmetric)
+        white, black = (self.players[piece_type].get_id() for piece_type in ("W", "B"))
+        for _, state in self.random_games():
+            for name, white_value, black_value in zip(FEATURE_REGISTRY, evaluator.feature_values(state, white),
+                                                      evaluator.feature_values(state, black)):
+                self.assertAlmostEqual(white_value, -black_value, places=9, msg=(name, state.get_step()))
+
+    def test_incremental_evaluation_matches_full(self) -> None:
+        evaluator = self.evaluator
+        player_id = self.players["W"].get_id()
+        evaluation = IncrementalEvaluationAbalone(evaluator, player_id)
+        node = None
+        for parent, child in self.random_games():
+            if node is None or node[1] is not parent:
+                node = evaluation.node(parent)
+            node = evaluation.node(child, node)
+            self.assertAlmostEqual(evaluation.evaluate(node), evaluator.evaluate_state(child, player_id),
+                                   places=9, msg=child.get_step())
+
+
+if __name__ == "__main__":
+    unittest.main()